@@ -1,14 +1,20 @@
 import time
+STARTUP_STARTED = time.perf_counter()  # for the startup timing report (STARTUP_TIMING_ENV)
 import tkinter as tk
-from tkinter import messagebox, Scrollbar, Canvas, Frame, simpledialog
 from collections import defaultdict
-import win32gui
-import win32api
 import json
 import os
-import ctypes
-import re
+import threading
 from datetime import datetime, timezone
+from bucket_history import period_range
+from classifier import Classifier, DEFAULT_NORMALIZE_RULES, GROUP_RULES
+from instrumentation import Instrumentation
+from persistence import TrackerStore
+from retention import RetentionPolicy
+from scheduler import AdaptiveScheduler
+from tracker import Tracker
+from virtual_list import VirtualList
+from window_sources import Win32WindowSource, ReplayWindowSource, load_events
 
 # exe instructions
 # cd "C:\{WHATEVER_PATH_TO_TIMEKEEPER}\TimeKeeper"
@@ -21,53 +27,76 @@ from datetime import datetime, timezone
 # Config / Defaults (will be overwritten by settings file if present)
 AFK_TIMEOUT = 60  # seconds; count at AFK if inactive for this long
 SAVE_FILE = "window_times.json"
+SNAPSHOT_FORMAT = "json"  # "json" (SAVE_FILE) or "binary" (memory-mapped window_times.tksnap, opt-in); migrated on change
 SETTINGS_FILE = "timekeeper_settings.json"
+JOURNAL_FILE = "window_times.journal"  # focus intervals appended between snapshots of SAVE_FILE
 SAVE_TIME = 60  # seconds between saving to file
 MIN_DISPLAY_TIME = 60  # Seconds threshold for displaying individual entries
 TOP_PER_GROUP = 5  # # of entries to show per category
 PURGE_THRESHOLD = 10  # seconds; purge entries below this when requested
 TITLE_TRUNCATE = 50  # characters for display truncation
-
-# Dictionary to store window time tracking
-window_times = defaultdict(float)  # key: canonical_title, value: seconds
-window_original_titles = {}  # canonical_title -> representative original title (for nicer display)
-window_groups = defaultdict(dict)
-current_window = None
-last_switch_time = time.time()
-AFK_time = 0.0
-RESET_DATE = datetime.now(timezone.utc).isoformat()  # saved/loaded
-last_input_time = time.time()
+TITLE_CACHE_SIZE = 50000  # max memoized titles for normalize/classify
+NORMALIZE_RULES = DEFAULT_NORMALIZE_RULES  # ordered title rewrite rules, edited in SETTINGS_FILE (see classifier.py)
+RECORD_HISTORY = 0  # 1 = also keep every focus interval in HISTORY_DB_FILE (SQLite)
+RETENTION_DAYS = 0  # opt-in: fold entries unseen for this many days into their group's rollup (0 = keep everything)
+RETENTION_THRESHOLD = 60  # seconds; only entries with less total time than this are folded
+RETENTION_INTERVAL = 5  # seconds between incremental retention batches
+HISTORY_DB_FILE = "timekeeper_history.sqlite3"
+REPLAY_ENV = "TIMEKEEPER_REPLAY"  # set to a recorded events file to replay it instead of reading Win32
+STARTUP_TIMING_ENV = "TIMEKEEPER_STARTUP_TIMING"  # set to print time-to-first-paint/fully-loaded; "exit" quits after
+LOAD_POLL_INTERVAL = 0.02  # seconds between checks for the background load finishing
+TICK_INTERVAL = 0.5  # seconds between tracker samples when polling
+REFRESH_INTERVAL = 0.5  # seconds between display refreshes while the user is active
+SLOW_TICK_INTERVAL = 2  # polling backs off to this while idle/AFK (bounds how late a switch is noticed)
+SLOW_REFRESH_INTERVAL = 5  # refresh backs off to this while idle/AFK; paused entirely while minimized
+IDLE_AFTER = 30  # seconds without a window switch before the idle back-off starts
+INSTRUMENT = 0  # 1 = record call latencies and timer drift (see Diagnostics)
+DIAGNOSTICS_FILE = "timekeeper_diagnostics.json"
+EVENT_DRIVEN = 1  # 1 = let the window source push focus/idle changes; falls back to polling if it can't
 
 # Collapsed state for groups (in-memory)
 collapsed_groups = defaultdict(lambda: False)
-group_widgets = {}
-
-# Define grouping rules. Strictly an 'ends with' type deal.
-GROUP_RULES = {
-    "Office": [" - Word", " - PowerPoint", " - Excel", "- Adobe Acrobat Reader (64-bit)",
-               " — LibreOffice Writer", " - Google Docs — Mozilla Firefox", " - Notepad", " - Obsidian"],
-    "Work": [" - Visual Studio Code", ".pdf", " - Arizona State University Mail — Mozilla Firefox"],
-    "Unimportant": [" - YouTube — Mozilla Firefox", "YouTube — Mozilla Firefox", "Bluesky — Mozilla Firefox"],
-    "Social": [" - Discord", " - Slack"]
-}
 
-# region global helpers
-# Structure to query last input time
-class LASTINPUTINFO(ctypes.Structure):
-    _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+# What the list shows: lifetime totals, or today / this week / this month from the bucketed history
+VIEW_PERIODS = ("all", "day", "week", "month")
+VIEW_LABELS = {"all": "All time", "day": "Today", "week": "This week", "month": "This month"}
+view_period = "all"
+
+# Rows are shown in a virtualized list (built with the UI below); only header labels keep state here
+label_state = {}  # label key -> (text, bg) last applied
+render_stats = {"last": 0, "total": 0, "refreshes": 0}  # Tk widget operations (config/place/forget)
+ROW_HEIGHT = 28  # pixels per list row
+
+# Grouping rules live in classifier.GROUP_RULES so the headless tracker uses the same ones
+classifier = Classifier(GROUP_RULES, TITLE_TRUNCATE, TITLE_CACHE_SIZE)
 
-def get_active_window_title():
-    hwnd = win32gui.GetForegroundWindow()
-    return win32gui.GetWindowText(hwnd)
+last_settings_payload = None  # what was last written to SETTINGS_FILE
+history_db = None  # HistoryDB when RECORD_HISTORY is on
+last_tracker_event = {"event": None, "count": 0}  # written by on_tracker_event
+instruments = Instrumentation(INSTRUMENT)  # latency histograms for tick/refresh/save/load
+startup = {"first_paint": None, "loaded": None}  # seconds from STARTUP_STARTED
+loader = None  # background thread running load_data
+data_loaded = False  # set by finish_loading; until then only the cached totals are on screen
+settings_reset_date = None  # RESET_DATE from the settings file, applied over the snapshot's once it is loaded
+
+# region global helpers
+def default_window_source():
+    """Win32 on the desktop; a realtime replay of a recorded stream if REPLAY_ENV is set."""
+    replay_file = os.environ.get(REPLAY_ENV)
+    if replay_file:
+        return ReplayWindowSource(load_events(replay_file), realtime=True)
+    return Win32WindowSource()
+
+# The tracking state lives in the tracker; the UI only reads it (under tracker.lock)
+tracker = Tracker(default_window_source(), classifier, afk_timeout=AFK_TIMEOUT, min_display_time=MIN_DISPLAY_TIME)
+store = TrackerStore(tracker, SAVE_FILE, JOURNAL_FILE, background=True, snapshot_format=SNAPSHOT_FORMAT)  # writes happen on a writer thread
+retention = RetentionPolicy(tracker, RETENTION_THRESHOLD, RETENTION_DAYS * 86400)
+window_times = tracker.window_times
+window_original_titles = tracker.window_original_titles
+aggregates = tracker.aggregates
 
 def is_afk():
-    lii = LASTINPUTINFO()
-    lii.cbSize = ctypes.sizeof(LASTINPUTINFO)
-    if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(lii)):
-        elapsed_s = (win32api.GetTickCount() - lii.dwTime) / 1000.0
-    else:
-        elapsed_s = 0.0
-    return elapsed_s > AFK_TIMEOUT
+    return tracker.is_afk()
 
 def format_time(seconds):
     seconds = int(seconds)
@@ -81,321 +110,265 @@ def format_time(seconds):
         s = seconds % 60
         return f"{h}:{m:02d}:{s:02d}"
 
-# Normalizer function for Obsidian dynamicness and unsaved markers
-def normalize_title(raw_title: str) -> str:
-    """Return a canonical title used as the key in window_times."""
-    if not raw_title:
-        return "Unknown"
-    title = raw_title.strip()
-
-    # Remove leading bullet or unsaved marker "● " or similar
-    title = re.sub(r'^[\u25CF\u2022\*\s]+', '', title).strip()
-
-    # Normalize Obsidian versions like "Obsidian v1.11.4" or "Obsidian 1.11.4"
-    title = re.sub(r'\b(Obsidian)(?:\s*v?\d+(\.\d+)*)', r'\1', title, flags=re.IGNORECASE)
-
-    # Remove version numbers for other apps that append versions e.g. "AppName v1.2.3" or "AppName 1.2.3"
-    title = re.sub(r'\s+v?\d+(\.\d+){1,}(?:\S*)?$', '', title)
-    title = title.strip()
-    return title
-
-def truncate_display(s: str) -> str:
-    if not s:
-        return s
-    if len(s) <= TITLE_TRUNCATE:
-        return s
-    return s[:TITLE_TRUNCATE - 3].rstrip() + "..."
-
 def total_tracked_time():
-    return sum(window_times.values())
+    return aggregates.total
 
 # endregion
 
 def classify_window_by_group(canonical_title: str):
     """Return (group, clean_title) for the canonical title. clean_title is truncated for display."""
-    if not canonical_title:
-        # ruh roh, oh well
-        return "Unknown", "Unknown"
-
-    # Check group suffix rules
-    for group, suffixes in GROUP_RULES.items():
-        for suffix in suffixes:
-            if canonical_title.endswith(suffix):
-                # remove the suffix from display name
-                clean_title = canonical_title.replace(suffix, "").strip()
-                # Truncate clean titles to TITLE_TRUNCATE chars for display
-                clean_title_disp = truncate_display(clean_title or canonical_title)
-                return group, clean_title_disp
-
-    # Otherwise, it's in the Uncategorized Group
-    return "Uncategorized", truncate_display(canonical_title)
-
-def update_window_time():
-    global current_window, last_switch_time, AFK_time
-
-    raw_title = get_active_window_title()
-    canonical = normalize_title(raw_title)
-    now = time.time()
-
-    # Determine group early for AFK logic
-    group, clean_title = classify_window_by_group(canonical)
-
-    if is_afk() and group != "Unimportant":
-        # Unimportant implies watching a video, so AFK is irrelevant
-        AFK_time += now - last_switch_time
-        last_switch_time = now  # Reset tracking if AFK and not on an 'unimportant' window
-    else:
-        if current_window:
-            window_times[current_window] += now - last_switch_time
-
-        # When window changed, ensure canonical key exists in mapping
-        if canonical and canonical != current_window:
-            current_window = canonical
-            if canonical not in window_original_titles or (raw_title and len(raw_title) < len(window_original_titles.get(canonical, ""))):
-                window_original_titles[canonical] = raw_title or canonical
-            # ensure key exists in window_times (so it appears in grouped lists even with 0 time)
-            _ = window_times[current_window]  # default dict ensures key exists
-
-        last_switch_time = now
-
-    root.after(500, update_window_time)  # Update per 0.5 seconds
+    return classifier.classify(canonical_title)
 
 def purge_insignificant():
     """Remove entries below PURGE_THRESHOLD seconds after confirmation."""
-    insignificant_keys = [k for k, v in window_times.items() if v < PURGE_THRESHOLD]
+    from tkinter import messagebox
+    with tracker.lock:
+        insignificant_keys = [k for k, v in window_times.items() if v < PURGE_THRESHOLD]
     if not insignificant_keys:
         messagebox.showinfo("Purge", f"No entries under {PURGE_THRESHOLD}s to purge.")
         return
     if not messagebox.askyesno("Confirm Purge", f"Purge {len(insignificant_keys)} entries below {PURGE_THRESHOLD}s? This cannot be undone."):
         return
-    for k in insignificant_keys:
-        window_times.pop(k, None)
-        window_original_titles.pop(k, None)
-    save_data()
+    tracker.remove(insignificant_keys)
+    # removals can't be journaled; write a fresh snapshot
+    store.compact()
     refresh_display()
 
 def toggle_group(group_name: str):
     collapsed_groups[group_name] = not collapsed_groups[group_name]
     refresh_display()
 
-def _make_header_widget(group_name):
-    """Create header label and bind toggle; store in group_widgets."""
-    header = tk.Label(frame, text="", bg="gray40", fg="white", font=("Arial", 12, "bold"), anchor='w', cursor="hand2")
-    header.bind("<Button-1>", lambda e, g=group_name: toggle_group(g))
-    return header
+def cycle_view_period():
+    """Switch the list between all time, today, this week and this month."""
+    global view_period
+    view_period = VIEW_PERIODS[(VIEW_PERIODS.index(view_period) + 1) % len(VIEW_PERIODS)]
+    period_button.config(text=VIEW_LABELS[view_period])
+    refresh_display()
 
-def _make_item_widget():
-    """Factory for item labels."""
-    return tk.Label(frame, text="", bg="gray30", fg="white", font=("Arial", 13), anchor='w', relief='solid', bd=1)
+# row kind -> label styling in the list
+ROW_STYLES = {
+    "header": dict(font=("Arial", 12, "bold"), cursor="hand2", gap=4),
+    "collapsed": dict(font=("Arial", 10, "italic"), indent=12, cursor="hand2"),
+    "item": dict(font=("Arial", 13), indent=10, relief='solid', bd=1),
+    "other": dict(font=("Arial", 13, "italic"), indent=10, relief='solid', bd=1),
+    "global_other": dict(font=("Arial", 13, "italic"), relief='solid', bd=1),
+}
+
+def on_row_click(row_id):
+    """Headers and collapsed markers toggle their group."""
+    kind, group, _ = row_id
+    if kind in ("header", "collapsed"):
+        toggle_group(group)
+
+def _set_label(key, widget, text, bg=None):
+    """config() the widget only if its text/bg differ from what was last applied. Returns ops done."""
+    state = (text, bg)
+    if label_state.get(key) == state:
+        return 0
+    label_state[key] = state
+    if bg is None:
+        widget.config(text=text)
+    else:
+        widget.config(text=text, bg=bg)
+    return 1
+
+def _set_status_label(text):
+    """The second header line shows `text`, or the last save error while writes are failing."""
+    error = store.last_error
+    if error is not None:
+        return _set_label("_total_bottom", total_time_label_bottom, f"Saving failed: {error}", "darkred")
+    return _set_label("_total_bottom", total_time_label_bottom, text, "gray30")
+
+def render_rows(rows):
+    """Show `rows` [(row_id, text, bg), ...]; only rows in the viewport have labels. Returns Tk widget ops."""
+    return row_list.set_rows(rows)
 
-def _make_italic_widget():
-    return tk.Label(frame, text="", bg="gray30", fg="white", font=("Arial", 13, "italic"), anchor='w', relief='solid', bd=1)
+def _row_bg(is_current, afk, idle_bg="gray30"):
+    return "darkred" if (is_current and afk) else ("darkgreen" if is_current else idle_bg)
 
 def refresh_display():
+    if not data_loaded:
+        return  # still showing the cached totals; finish_loading() draws the real list
+    with tracker.lock:
+        rows, ops = _build_rows()
+    ops += render_rows(rows)
+    render_stats["last"] = ops
+    render_stats["total"] += ops
+    render_stats["refreshes"] += 1
+
+def _build_rows():
+    """Update the header labels and return (desired rows, widget ops spent). Caller holds tracker.lock."""
+    # bring the current window's time up to date (between events nothing else does)
+    tracker.settle()
+    # Rule edits regroup just the titles they affect; a new display threshold still rebuilds
+    tracker.reclassify()
+    aggregates.validate(MIN_DISPLAY_TIME, MIN_DISPLAY_TIME)
+    if view_period != "all":
+        return _build_period_rows()
+    current_window = tracker.current_window
+
     # Compute days since reset and average hours/day
     try:
-        reset_dt = datetime.fromisoformat(RESET_DATE)
+        reset_dt = datetime.fromisoformat(tracker.reset_date)
     except Exception:
         reset_dt = datetime.now(timezone.utc)
     delta_days = max(1.0, (datetime.now(timezone.utc) - reset_dt).total_seconds() / 86400.0)
     avg_hours_per_day = (total_tracked_time() / 3600.0) / delta_days
+    afk = is_afk()
 
     # header labels update
     total_count = len(window_times)
-    insignificant_count = sum(1 for _, v in window_times.items() if v < MIN_DISPLAY_TIME)
-    total_time_top = f"Active: {format_time(total_tracked_time())} | AFK: {format_time(AFK_time)}"
+    insignificant_count = aggregates.insignificant_count
+    total_time_top = f"Active: {format_time(total_tracked_time())} | AFK: {format_time(tracker.AFK_time)}"
     total_time_bottom = f"Since {reset_dt.date()}, Active {avg_hours_per_day:.2f} hrs/day | Total entries: {total_count}"
-    total_time_label_top.config(text=total_time_top)
-    total_time_label_bottom.config(text=total_time_bottom)
-
-    # Build grouped_items (desired data)
-    grouped_items = defaultdict(list)
-    other_global_time = 0.0
-    for canonical, duration in window_times.items():
-        group, clean_title_disp = classify_window_by_group(canonical)
-        if duration < MIN_DISPLAY_TIME:
-            other_global_time += duration
-            continue
-        grouped_items[group].append((canonical, clean_title_disp, duration))
+    ops = _set_label("_total_top", total_time_label_top, total_time_top)
+    ops += _set_status_label(total_time_bottom)
+
+    # Below-threshold entries all go to the global bucket
+    other_global_time = aggregates.insignificant_total if insignificant_count else 0.0
 
     # compute current_group for highlighting
     current_group = classify_window_by_group(current_window)[0] if current_window else None
 
-    # ensure group_widgets entries exist for groups we'll display
-    groups_sorted = sorted(grouped_items.keys())
-    # remove groups no longer present (cleanup)
-    for g in list(group_widgets.keys()):
-        if g not in groups_sorted:
-            # remove/destroy all widgets for that group
-            gw = group_widgets.pop(g)
-            for w in ([gw.get("header"), gw.get("collapsed"), gw.get("other")] + list(gw.get("items", {}).values())):
-                if w:
-                    w.destroy()
-
-    # We'll repack in order. Use pack_forget to re-order existing widgets; pack new widgets fresh.
-    # Start by forgetting all widgets so the repack will produce exact desired order.
-    for w in frame.winfo_children():
-        w.pack_forget()
-
-    # Iterate groups in sorted order and layout header, items, others
-    for group in groups_sorted:
-        items = grouped_items[group]
-        if not items:
-            continue
-
-        # totals and sorting
-        group_total = sum(d for (_, _, d) in items)
-        items_sorted = sorted(items, key=lambda x: x[2], reverse=True)
-        top = items_sorted[:TOP_PER_GROUP]
-        others = items_sorted[TOP_PER_GROUP:]
-        others_time = sum(d for (_, _, d) in others)
-        others_canonicals = {c for (c, _, _) in others}
-
-        # create or reuse group widget container
-        gw = group_widgets.get(group)
-        if gw is None:
-            gw = {"items": {}}
-            gw["header"] = _make_header_widget(group)
-            gw["collapsed"] = None
-            gw["other"] = None
-            group_widgets[group] = gw
-
-        # update header text & bg
-        header_text = f"{group} — {format_time(group_total)}"
+    # Build the desired row list: header, then collapsed marker or top items + 'other', per group
+    rows = []
+    for group in sorted(aggregates.groups()):
+        item_count = aggregates.group_counts[group]
+        group_total = aggregates.group_totals[group]
         is_current_in_group = (current_group == group)
-        header_bg = "darkred" if (is_current_in_group and is_afk()) else ("darkgreen" if is_current_in_group else "gray40")
-        gw["header"].config(text=header_text, bg=header_bg)
-        gw["header"].pack(fill='x', pady=2)
+        rows.append((("header", group, None), f"{group} — {format_time(group_total)}",
+                     _row_bg(is_current_in_group, afk, "gray40")))
 
-        # If collapsed, show collapsed marker (create if necessary)
         if collapsed_groups.get(group, False):
-            if gw.get("collapsed") is None:
-                gw["collapsed"] = tk.Label(frame, text=f"[{len(items)} entries] (click to expand)", bg="gray25", fg="white", font=("Arial", 10, "italic"), anchor='w', cursor="hand2")
-                gw["collapsed"].bind("<Button-1>", lambda e, g=group: toggle_group(g))
-            gw["collapsed"].config(text=f"[{len(items)} entries] (click to expand)")
-            gw["collapsed"].pack(fill='x', padx=12, pady=1)
-            # ensure any visible individual item widgets are hidden (but not destroyed)
-            for c, lbl in list(gw["items"].items()):
-                lbl.pack_forget()
-            # also hide any 'other' aggregated label
-            if gw.get("other"):
-                gw["other"].pack_forget()
+            rows.append((("collapsed", group, None), f"[{item_count} entries] (click to expand)", "gray25"))
             continue
 
-        # not collapsed: ensure collapsed marker hidden
-        if gw.get("collapsed"):
-            gw["collapsed"].pack_forget()
-
-        # Show top items in order, reusing or creating labels
-        # Keep set of required canonicals for this group
-        needed = set()
-        for canonical, title, duration in top:
-            needed.add(canonical)
-            lbl = gw["items"].get(canonical)
-            # determine bg for this row
-            row_bg = "darkred" if (canonical == current_window and is_afk()) else ("darkgreen" if canonical == current_window else "gray30")
-
-            if lbl is None:
-                lbl = _make_item_widget()
-                gw["items"][canonical] = lbl
-            lbl.config(text=f"{title}: {format_time(duration)}", bg=row_bg)
-            lbl.pack(fill='x', pady=1, padx=10)
-
-        # If there are existing item widgets that are no longer in 'top', keep them hidden or remove them.
-        # We'll remove labels that are not in needed and not part of 'others' (they might be older top rows).
-        for c in list(gw["items"].keys()):
-            if c not in needed:
-                gw["items"][c].pack_forget()
-                # keep the widget instance to reuse later if it returns to top; we don't destroy here.
+        # top entries; only the visible rows get classified for their display title
+        top = aggregates.top(group, TOP_PER_GROUP)
+        for canonical, duration in top:
+            title = classify_window_by_group(canonical)[1]
+            rows.append((("item", group, canonical), f"{title}: {format_time(duration)}",
+                         _row_bg(canonical == current_window, afk)))
 
         # aggregated 'others' row
-        if others_time > 0:
-            if gw.get("other") is None:
-                gw["other"] = _make_italic_widget()
-            is_current_in_others = (current_window in others_canonicals)
-            other_bg = "darkred" if (is_current_in_others and is_afk()) else ("darkgreen" if is_current_in_others else "gray30")
-            gw["other"].config(text=f"[{group} Other]: {format_time(others_time)} ({len(others)} entries)", bg=other_bg)
-            gw["other"].pack(fill='x', pady=1, padx=10)
-        else:
-            if gw.get("other"):
-                gw["other"].pack_forget()
+        others_count = item_count - len(top)
+        others_time = group_total - sum(d for (_, d) in top)
+        if others_count > 0 and others_time > 0:
+            is_current_in_others = (is_current_in_group and all(c != current_window for c, _ in top)
+                                    and window_times.get(current_window, 0.0) >= MIN_DISPLAY_TIME)
+            rows.append((("other", group, None), f"[{group} Other]: {format_time(others_time)} ({others_count} entries)",
+                         _row_bg(is_current_in_others, afk)))
 
     # After groups, show Global Insignificant Other if any
     if other_global_time > 0:
-        # ensure a global_other widget exists (we can store it under a special key)
-        gw = group_widgets.get("_global_other")
-        if gw is None:
-            gw = {}
-            gw["other"] = _make_italic_widget()
-            group_widgets["_global_other"] = gw
         current_duration = window_times.get(current_window, 0.0)
         is_current_insignificant = current_duration < MIN_DISPLAY_TIME and current_duration > 0
-        color = "darkred" if (is_current_insignificant and is_afk()) else ("darkgreen" if is_current_insignificant else "gray30")
-        gw["other"].config(text=f"[Global Insignificant Other]: {format_time(other_global_time)} ({insignificant_count} entries)", bg=color)
-        gw["other"].pack(fill='x', pady=1)
-    else:
-        # hide/destroy global_other if exists
-        if "_global_other" in group_widgets:
-            gw = group_widgets["_global_other"]
-            if gw.get("other"):
-                gw["other"].pack_forget()
-
-    # schedule next refresh
-    root.after(500, refresh_display)
+        rows.append((("global_other", None, None),
+                     f"[Global Insignificant Other]: {format_time(other_global_time)} ({insignificant_count} entries)",
+                     _row_bg(is_current_insignificant, afk)))
+    return rows, ops
+
+def _build_period_rows():
+    """Like _build_rows, for view_period's range out of tracker.buckets. Caller holds tracker.lock."""
+    current_window = tracker.current_window
+    afk = is_afk()
+    start, end = period_range(view_period)
+    summary = tracker.buckets.summary(start, end, TOP_PER_GROUP)
+    elapsed_days = max(1.0, (min(end, time.time()) - start) / 86400.0)
+    total_count = sum(summary["counts"].values())
+    total_time_top = f"{VIEW_LABELS[view_period]}: {format_time(summary['total'])}"
+    total_time_bottom = (f"Since {datetime.fromtimestamp(start).date()}, Active "
+                         f"{summary['total'] / 3600.0 / elapsed_days:.2f} hrs/day | Entries: {total_count}")
+    ops = _set_label("_total_top", total_time_label_top, total_time_top)
+    ops += _set_status_label(total_time_bottom)
 
-def save_data():
-    payload = {
-        "window_times": dict(window_times),
-        "AFK_time": AFK_time,
-        "reset_date": RESET_DATE,
-        "window_original_titles": window_original_titles
+    current_group = classify_window_by_group(current_window)[0] if current_window else None
+    rows = []
+    for group in sorted(summary["groups"]):
+        item_count = summary["counts"][group]
+        group_total = summary["groups"][group]
+        is_current_in_group = (current_group == group)
+        rows.append((("header", group, None), f"{group} — {format_time(group_total)}",
+                     _row_bg(is_current_in_group, afk, "gray40")))
+        if collapsed_groups.get(group, False):
+            rows.append((("collapsed", group, None), f"[{item_count} entries] (click to expand)", "gray25"))
+            continue
+        top = summary["top"][group]
+        for canonical, duration in top:
+            title = classify_window_by_group(canonical)[1]
+            rows.append((("item", group, canonical), f"{title}: {format_time(duration)}",
+                         _row_bg(canonical == current_window, afk)))
+        others_count = item_count - len(top)
+        others_time = group_total - sum(d for (_, d) in top)
+        if others_count > 0 and others_time > 0:
+            is_current_in_others = is_current_in_group and all(c != current_window for c, _ in top)
+            rows.append((("other", group, None), f"[{group} Other]: {format_time(others_time)} ({others_count} entries)",
+                         _row_bg(is_current_in_others, afk)))
+    return rows, ops
+
+def save_settings():
+    """Persist settings, skipping the write if nothing changed since the last one."""
+    global last_settings_payload
+    settings_payload = {
+        "AFK_TIMEOUT": AFK_TIMEOUT,
+        "SAVE_TIME": SAVE_TIME,
+        "MIN_DISPLAY_TIME": MIN_DISPLAY_TIME,
+        "TOP_PER_GROUP": TOP_PER_GROUP,
+        "PURGE_THRESHOLD": PURGE_THRESHOLD,
+        "TITLE_TRUNCATE": TITLE_TRUNCATE,
+        "RECORD_HISTORY": RECORD_HISTORY,
+        "RETENTION_DAYS": RETENTION_DAYS,
+        "RETENTION_THRESHOLD": RETENTION_THRESHOLD,
+        "INSTRUMENT": INSTRUMENT,
+        "SNAPSHOT_FORMAT": SNAPSHOT_FORMAT,
+        "NORMALIZE_RULES": NORMALIZE_RULES,
+        "RESET_DATE": tracker.reset_date
     }
+    if settings_payload == last_settings_payload:
+        return
     try:
-        with open(SAVE_FILE, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
-    except Exception as e:
-        print("Error saving:", e)
-
-    # also persist settings
-    try:
-        settings_payload = {
-            "AFK_TIMEOUT": AFK_TIMEOUT,
-            "SAVE_TIME": SAVE_TIME,
-            "MIN_DISPLAY_TIME": MIN_DISPLAY_TIME,
-            "TOP_PER_GROUP": TOP_PER_GROUP,
-            "PURGE_THRESHOLD": PURGE_THRESHOLD,
-            "TITLE_TRUNCATE": TITLE_TRUNCATE,
-            "RESET_DATE": RESET_DATE
-        }
         with open(SETTINGS_FILE, "w", encoding="utf-8") as sf:
             json.dump(settings_payload, sf, indent=2)
+        last_settings_payload = settings_payload
     except Exception as e:
         print("Error saving settings:", e)
 
-    root.after(int(SAVE_TIME*1000), save_data)
-
-def load_data():
-    global window_times, AFK_time, RESET_DATE, window_original_titles
-    if os.path.exists(SAVE_FILE):
+def sync_history_db():
+    """Open or close the interval history database to match RECORD_HISTORY."""
+    global history_db
+    if RECORD_HISTORY and history_db is None:
         try:
-            with open(SAVE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                wt = data.get("window_times", {})
-                # ensure numeric values
-                for k, v in wt.items():
-                    window_times[k] = float(v)
-                AFK_time = float(data.get("AFK_time", 0.0))
-                RESET_DATE = data.get("reset_date", RESET_DATE)
-                window_original_titles.update(data.get("window_original_titles", {}))
+            from history_db import HistoryDB
+            history_db = HistoryDB(HISTORY_DB_FILE)
         except Exception as e:
-            print("Error loading save file:", e)
+            print("Error opening history database:", e)
+    elif not RECORD_HISTORY and history_db is not None:
+        with tracker.lock:
+            tracker.history_db = None
+        # let queued inserts finish before closing the connection under them
+        store.drain()
+        history_db.close()
+        history_db = None
+    tracker.history_db = history_db
+
+def save_data():
+    # credit the current window up to now so the journal has it (nothing else does between events)
+    tracker.settle()
+    store.save()
+
+    # also persist settings
+    save_settings()
 
-    # load settings if present
-    global AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE
+def load_settings():
+    """Read SETTINGS_FILE into the globals. Cheap, so it runs before the window is built."""
+    global SNAPSHOT_FORMAT, AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE
+    global RECORD_HISTORY, RETENTION_DAYS, RETENTION_THRESHOLD, INSTRUMENT, NORMALIZE_RULES, settings_reset_date
     if os.path.exists(SETTINGS_FILE):
         try:
             with open(SETTINGS_FILE, "r", encoding="utf-8") as sf:
                 s = json.load(sf)
+                # the snapshot format decides which file gets loaded
+                SNAPSHOT_FORMAT = str(s.get("SNAPSHOT_FORMAT", SNAPSHOT_FORMAT))
                 AFK_TIMEOUT = int(s.get("AFK_TIMEOUT", AFK_TIMEOUT))
                 SAVE_TIME = int(s.get("SAVE_TIME", SAVE_TIME))
                 MIN_DISPLAY_TIME = int(s.get("MIN_DISPLAY_TIME", MIN_DISPLAY_TIME))
@@ -403,31 +376,84 @@ def load_data():
                 TOP_PER_GROUP = int(TOP_PERGroup_val)
                 PURGE_THRESHOLD = int(s.get("PURGE_THRESHOLD", PURGE_THRESHOLD))
                 TITLE_TRUNCATE = int(s.get("TITLE_TRUNCATE", TITLE_TRUNCATE))
+                RECORD_HISTORY = int(s.get("RECORD_HISTORY", RECORD_HISTORY))
+                RETENTION_DAYS = int(s.get("RETENTION_DAYS", RETENTION_DAYS))
+                RETENTION_THRESHOLD = int(s.get("RETENTION_THRESHOLD", RETENTION_THRESHOLD))
+                INSTRUMENT = int(s.get("INSTRUMENT", INSTRUMENT))
+                NORMALIZE_RULES = list(s.get("NORMALIZE_RULES", NORMALIZE_RULES))
                 # allow reset_date override if present
-                RESET_DATE = s.get("RESET_DATE", RESET_DATE)
+                settings_reset_date = s.get("RESET_DATE")
         except Exception as e:
             print("Error loading settings:", e)
 
+def load_data():
+    """Load the saved state. Runs on the loader thread while the window shows the cached totals."""
+    started = time.perf_counter()
+    store.load()
+    if settings_reset_date:
+        with tracker.lock:
+            tracker.reset_date = settings_reset_date
+    # have the window source's platform modules imported here rather than on the Tk thread
+    tracker.source.prepare()
+    instruments.record("load", time.perf_counter() - started)
+
+def apply_settings():
+    """Push settings the tracker/classifier care about into them."""
+    tracker.afk_timeout = AFK_TIMEOUT
+    classifier.title_truncate = TITLE_TRUNCATE
+    classifier.set_normalize_rules(NORMALIZE_RULES)
+    instruments.enabled = bool(INSTRUMENT)
+    retention.threshold = RETENTION_THRESHOLD
+    retention.max_age = RETENTION_DAYS * 86400
+    scheduler.set_interval("save", SAVE_TIME, afk_interval=SAVE_TIME * 5)
+    try:
+        store.set_format(SNAPSHOT_FORMAT)
+    except ValueError as e:
+        print("Error applying settings:", e)
+
+def on_tracker_event(event, _tracker):
+    """Tracker listener. May run on the tracker thread, so it must not touch Tk; it only records the event."""
+    last_tracker_event["event"] = event
+    last_tracker_event["count"] += 1
+    if event in ("switch", "active"):
+        scheduler.activity()
+
+def on_close():
+    """Detach the UI from the tracker, stop it and save before exiting."""
+    if loader is not None:
+        loader.join()  # closing mid-load must not save a half-loaded state over the real one
+    tracker.unsubscribe(on_tracker_event)
+    tracker.stop()
+    tracker.settle()
+    store.close()  # waits for the writer thread to finish
+    save_settings()
+    root.destroy()
+
 def open_file_manager():
-    os.system(f'explorer {os.path.abspath(SAVE_FILE)}')
+    path = os.path.abspath(store.save_file)
+    if store.snapshot_format == "binary":
+        # a .tksnap isn't readable as text: show it in its folder instead (query.py and export.py read it)
+        os.system(f'explorer /select,"{path}"')
+    else:
+        os.system(f'explorer "{path}"')
 
 def clear_data():
+    from tkinter import messagebox
     if messagebox.askyesno("Confirm", "Are you sure you want to clear all tracked data? This will reset the tracked history and reset date."):
-        global window_times, AFK_time, RESET_DATE, window_original_titles
-        window_times.clear()
-        window_original_titles.clear()
-        AFK_time = 0.0
-        RESET_DATE = datetime.now(timezone.utc).isoformat()
-        save_data()
+        tracker.clear()
+        store.compact()
+        save_settings()
         refresh_display()
 
 def open_settings_dialog():
     """Open a simple settings dialog allowing edits to numeric constants."""
-    global AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE
+    global AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE, RECORD_HISTORY
+    global RETENTION_DAYS, RETENTION_THRESHOLD
+    from tkinter import messagebox
 
     dlg = tk.Toplevel(root)
     dlg.title("Settings")
-    dlg.geometry("360x320")
+    dlg.geometry("360x440")
     dlg.transient(root)
     dlg.grab_set()
 
@@ -447,9 +473,13 @@ def open_settings_dialog():
     add_row("Top per group:", "TOP_PER_GROUP", 3, TOP_PER_GROUP)
     add_row("Purge threshold (s):", "PURGE_THRESHOLD", 4, PURGE_THRESHOLD)
     add_row("Title truncate (chars):", "TITLE_TRUNCATE", 5, TITLE_TRUNCATE)
+    add_row("Record history (0/1):", "RECORD_HISTORY", 6, RECORD_HISTORY)
+    add_row("Retention (days, 0=off):", "RETENTION_DAYS", 7, RETENTION_DAYS)
+    add_row("Retention threshold (s):", "RETENTION_THRESHOLD", 8, RETENTION_THRESHOLD)
 
     def on_save():
-        global AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE
+        global AFK_TIMEOUT, SAVE_TIME, MIN_DISPLAY_TIME, TOP_PER_GROUP, PURGE_THRESHOLD, TITLE_TRUNCATE, RECORD_HISTORY
+        global RETENTION_DAYS, RETENTION_THRESHOLD
         nonlocal entries
         try:
             AFK_TIMEOUT = int(entries["AFK_TIMEOUT"].get())
@@ -458,17 +488,155 @@ def open_settings_dialog():
             TOP_PER_GROUP = int(entries["TOP_PER_GROUP"].get())
             PURGE_THRESHOLD = int(entries["PURGE_THRESHOLD"].get())
             TITLE_TRUNCATE = int(entries["TITLE_TRUNCATE"].get())
+            RECORD_HISTORY = int(entries["RECORD_HISTORY"].get())
+            RETENTION_DAYS = int(entries["RETENTION_DAYS"].get())
+            RETENTION_THRESHOLD = int(entries["RETENTION_THRESHOLD"].get())
         except ValueError:
             messagebox.showerror("Invalid", "Please enter valid integer values.")
             return
-        save_data()
+        apply_settings()
+        save_settings()
+        sync_history_db()
         dlg.destroy()
         refresh_display()
 
     save_btn = tk.Button(dlg, text="Save", command=on_save)
-    save_btn.grid(row=6, column=0, padx=8, pady=12)
+    save_btn.grid(row=9, column=0, padx=8, pady=12)
     cancel_btn = tk.Button(dlg, text="Cancel", command=dlg.destroy)
-    cancel_btn.grid(row=6, column=1, padx=8, pady=12)
+    cancel_btn.grid(row=9, column=1, padx=8, pady=12)
+
+def _diagnostics_extra():
+    """Scheduler rates and renderer counters shown alongside the latency table."""
+    rates = scheduler.rates()
+    extra = {"scheduler": f"{rates['state']}{' (hidden)' if rates['hidden'] else ''}, "
+                          f"{rates['wakeups']} wakeups ({rates['wakeups_per_s']:.2f}/s)"}
+    for name in scheduler.jobs:
+        job = rates[name]
+        extra[name] = ("paused" if job["paused"] else f"every {job['interval_s']:.2f}s") + \
+            f", {job['runs']} runs ({job['measured_hz']:.2f}/s)"
+    extra["tracker"] = f"{'events' if tracker.event_driven else 'polling'}, {tracker.wakeups()} wakeups"
+    if startup["loaded"] is not None:
+        extra["startup"] = f"first paint {startup['first_paint'] * 1000:.0f} ms, fully loaded {startup['loaded'] * 1000:.0f} ms"
+    extra["render ops"] = f"last {render_stats['last']}, total {render_stats['total']} over {render_stats['refreshes']} refreshes"
+    extra["list"] = f"{len(row_list.rows)} rows, {row_list.visible_count()} labels"
+    with tracker.lock:
+        usage = tracker.titles.memory_usage()
+        bucket_stats = tracker.buckets.stats()
+    retention_stats = retention.stats()
+    extra["retention"] = (f"{retention_stats['folded']} folded ({format_time(retention_stats['folded_seconds'])}), "
+                          f"{retention_stats['sweeps']} sweeps, {retention_stats['rollup_groups']} rollups")
+    save_stats = store.stats()
+    writer = save_stats.get("writer", {})
+    extra["saves"] = (f"{save_stats['saves']} ({save_stats['skipped']} unchanged), lock held {save_stats['capture_ms']:.2f} ms; "
+                      f"writer last {writer.get('last_ms', 0.0):.1f} ms / {writer.get('last_bytes', 0)} B, "
+                      f"max {writer.get('max_ms', 0.0):.1f} ms, {writer.get('bytes_written', 0)} B total")
+    extra["titles"] = (f"{usage['titles']} interned, {usage['total'] / 1e6:.1f} MB "
+                       f"(plain dicts ~{usage['plain_dicts_estimate'] / 1e6:.1f} MB)")
+    extra["history buckets"] = (f"{bucket_stats['hours']} hours, {bucket_stats['days']} days, "
+                                f"{bucket_stats['months']} months, {bucket_stats['entries']} entries")
+    normalize = classifier.normalize_stats()
+    extra["normalize"] = (f"{normalize['changed']} of {normalize['titles']} titles rewritten; " +
+                          ", ".join(f"{r['name']} {r['hits']}" for r in normalize["rules"]))
+    last = tracker.reclassifier.last
+    if last is not None:
+        extra["reclassify"] = (f"last: {last['moved']} moved of {last['checked']} checked "
+                               f"({last['rules']} rules changed) in {last['ms']:.1f} ms; "
+                               f"{tracker.reclassifier.total_moved} moved in {tracker.reclassifier.runs} runs")
+    return extra
+
+def open_diagnostics():
+    """Live view of call latencies, timer drift and scheduler rates, with a dump to DIAGNOSTICS_FILE."""
+    from tkinter import messagebox
+    dlg = tk.Toplevel(root)
+    dlg.title("Diagnostics")
+    dlg.geometry("560x420")
+    dlg.transient(root)
+
+    text = tk.Text(dlg, font=("Courier", 9), bg="gray15", fg="white", wrap="none")
+    text.pack(fill="both", expand=True)
+    buttons = tk.Frame(dlg)
+    buttons.pack(fill="x")
+    enabled_var = tk.IntVar(value=INSTRUMENT)
+
+    def toggle():
+        global INSTRUMENT
+        INSTRUMENT = enabled_var.get()
+        apply_settings()
+        save_settings()
+
+    def dump():
+        try:
+            instruments.dump(DIAGNOSTICS_FILE, {"scheduler": scheduler.rates(), "render": dict(render_stats)})
+            messagebox.showinfo("Diagnostics", f"Wrote {os.path.abspath(DIAGNOSTICS_FILE)}", parent=dlg)
+        except Exception as e:
+            messagebox.showerror("Diagnostics", f"Could not write diagnostics: {e}", parent=dlg)
+
+    def update():
+        if not dlg.winfo_exists():
+            return
+        text.delete("1.0", "end")
+        text.insert("end", instruments.format_report(_diagnostics_extra()))
+        dlg.after(1000, update)
+
+    tk.Checkbutton(buttons, text="Record timings", variable=enabled_var, command=toggle).pack(side="left", padx=5, pady=5)
+    tk.Button(buttons, text="Reset", command=instruments.reset).pack(side="left", padx=5, pady=5)
+    tk.Button(buttons, text="Dump to file", command=dump).pack(side="left", padx=5, pady=5)
+    tk.Button(buttons, text="Close", command=dlg.destroy).pack(side="right", padx=5, pady=5)
+    update()
+
+# region Startup
+def show_cached_totals():
+    """First paint: header and group totals cached with the last snapshot (store.read_totals) while load_data runs."""
+    cached = store.read_totals()
+    if cached is None:
+        total_time_label_top.config(text="Loading...")
+        return
+    totals = cached["totals"]
+    total_time_label_top.config(text=f"Active: {format_time(totals['total'])} | AFK: {format_time(cached.get('AFK_time', 0.0))}")
+    total_time_label_bottom.config(text=f"Loading {cached['count']} entries...")
+    render_rows([(("header", group, None), f"{group} — {format_time(seconds)}", "gray40")
+                 for group, seconds in sorted(totals["group_totals"].items())])
+
+def start_loading():
+    """Run load_data on a background thread; finish_loading() picks up on the Tk thread once it is done."""
+    global loader
+    loader = threading.Thread(target=load_data, name="loader", daemon=True)
+    loader.start()
+
+    def poll():
+        if loader.is_alive():
+            root.after(int(LOAD_POLL_INTERVAL * 1000), poll)
+        else:
+            finish_loading()
+    root.after(int(LOAD_POLL_INTERVAL * 1000), poll)
+
+def finish_loading():
+    """Start tracking, saving and refreshing now that the saved state is in."""
+    global loader, data_loaded
+    loader = None
+    data_loaded = True
+    sync_history_db()
+    tracker.subscribe(on_tracker_event)
+    if not (EVENT_DRIVEN and tracker.start_events(fallback_interval=None)):
+        scheduler.add("tick", tracker.tick, TICK_INTERVAL, idle_interval=SLOW_TICK_INTERVAL,
+                      afk_interval=SLOW_TICK_INTERVAL)
+    for button in (purge_button, settings_button, diagnostics_button, period_button, clear_button):
+        button.config(state="normal")
+    refresh_display()
+    root.update_idletasks()
+    startup["loaded"] = time.perf_counter() - STARTUP_STARTED
+    report_startup()
+    scheduler.start()
+
+def report_startup():
+    timing = os.environ.get(STARTUP_TIMING_ENV)
+    if not timing:
+        return
+    print(f"Startup: first paint {startup['first_paint'] * 1000:.0f} ms, "
+          f"fully loaded {startup['loaded'] * 1000:.0f} ms ({len(window_times)} entries)")
+    if timing == "exit":
+        root.after(0, on_close)
+# endregion
 
 # region Tkinter Build
 # Initialize GUI
@@ -482,11 +650,15 @@ toolbar = tk.Frame(root, bg="gray30")
 toolbar.pack(fill='x')
 file_button = tk.Button(toolbar, text="Open Save File", command=open_file_manager)
 file_button.pack(side='left', padx=5, pady=5)
-purge_button = tk.Button(toolbar, text=f"Purge...", command=purge_insignificant)
+purge_button = tk.Button(toolbar, text=f"Purge...", command=purge_insignificant, state="disabled")
 purge_button.pack(side='left', padx=5, pady=5)
-settings_button = tk.Button(toolbar, text="Settings", command=open_settings_dialog)
+settings_button = tk.Button(toolbar, text="Settings", command=open_settings_dialog, state="disabled")
 settings_button.pack(side='left', padx=5, pady=5)
-clear_button = tk.Button(toolbar, text="Clear Data", command=clear_data)
+diagnostics_button = tk.Button(toolbar, text="Diagnostics", command=open_diagnostics, state="disabled")
+diagnostics_button.pack(side='left', padx=5, pady=5)
+period_button = tk.Button(toolbar, text=VIEW_LABELS[view_period], command=cycle_view_period, state="disabled")
+period_button.pack(side='left', padx=5, pady=5)
+clear_button = tk.Button(toolbar, text="Clear Data", command=clear_data, state="disabled")
 clear_button.pack(side='right', padx=5, pady=5)
 
 # Create Header Objects (two lines)
@@ -495,29 +667,43 @@ total_time_label_top.pack(fill='x')
 total_time_label_bottom = tk.Label(root, text="", bg="gray30", fg="white", font=("Arial", 11))
 total_time_label_bottom.pack(fill='x')
 
-# Create a frame with a canvas and scrollbar
-canvas = Canvas(root, bg="gray20")
-scrollbar = Scrollbar(root, orient="vertical", command=canvas.yview)
-frame = Frame(canvas, bg="gray20")
-
-frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-
-canvas.create_window((0, 0), window=frame, anchor="nw")
-canvas.configure(yscrollcommand=scrollbar.set)
-
-canvas.pack(side="left", fill="both", expand=True)
-scrollbar.pack(side="right", fill="y")
+# Virtualized list: labels exist only for the rows in view, recycled as it scrolls
+row_list = VirtualList(root, ROW_STYLES, ROW_HEIGHT, on_click=on_row_click)
+row_list.pack()
 
 # Enable scrolling with mouse wheel
 def _on_mouse_wheel(event):
-    canvas.yview_scroll(-1 * (event.delta // 120), "units")
-
-canvas.bind_all("<MouseWheel>", _on_mouse_wheel)
-
-load_data()
-update_window_time()
-refresh_display()
-save_data()
+    row_list.scroll("scroll", -1 * (event.delta // 120), "units")
+
+root.bind_all("<MouseWheel>", _on_mouse_wheel)
+
+def _window_hidden():
+    return root.state() == "iconic" or not root.winfo_viewable()
+
+# One timer drives polling, refresh and save; see scheduler.rates() for the effective rates
+scheduler = AdaptiveScheduler(lambda delay, fn: root.after(int(delay * 1000), fn), root.after_cancel,
+                              probe=lambda: (tracker.afk, _window_hidden()), idle_after=IDLE_AFTER,
+                              instruments=instruments)
+scheduler.add("refresh", instruments.wrap("refresh", refresh_display), REFRESH_INTERVAL, idle_interval=SLOW_REFRESH_INTERVAL,
+              afk_interval=SLOW_REFRESH_INTERVAL, pause_when_hidden=True)
+scheduler.add("save", instruments.wrap("save", save_data), SAVE_TIME, afk_interval=SAVE_TIME * 5)
+scheduler.add("retention", retention.step, RETENTION_INTERVAL)
+# redraw right away when un-minimized instead of at the next save
+root.bind("<Map>", lambda e: scheduler.wake() if e.widget is root and data_loaded else None)
+
+# time the tracker's work whichever way it is driven (tick() polls, handle_event() gets pushed changes)
+tracker.tick = instruments.wrap("tick", tracker.tick)
+tracker.handle_event = instruments.wrap("event", tracker.handle_event)
+
+load_settings()
+apply_settings()
+root.protocol("WM_DELETE_WINDOW", on_close)
+
+# paint the cached totals first, then load everything else in the background (finish_loading starts the rest)
+show_cached_totals()
+root.update()
+startup["first_paint"] = time.perf_counter() - STARTUP_STARTED
+start_loading()
 
 root.mainloop()
 # endregion
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Live aggregate index over window_times.
+
+refresh_display used to re-sum, re-group and re-sort every tracked title twice a
+second. AggregateIndex keeps those answers up to date as time is credited instead:
+global totals, per-group totals/counts for entries at or above the display
+threshold, the below-threshold bucket, and a lazy max-heap per group for top-N.
+Crediting a title is O(log n); reading the top N of a group costs O(N log n) plus
+whatever stale heap entries it discards on the way.
+"""
+import heapq
+
+
+class AggregateIndex:
+    """Incrementally maintained totals for a {canonical_title: seconds} mapping.
+
+    `times` is the mapping itself (shared with the caller, mutated through credit());
+    `group_of` maps a canonical title to its group name. `groups` is an optional
+    mapping to keep the key -> group assignments in (e.g. a title_store.GroupsView).
+    `rollups` maps group -> [seconds, entries] folded out of `times` by retention; they
+    count towards the totals and their group's count but have no entries of their own.
+    """
+
+    def __init__(self, times, group_of, min_display_time=60, groups=None, rollups=None):
+        self.times = times
+        self.rollups = rollups if rollups is not None else {}
+        self._groups = groups if groups is not None else {}  # canonical -> group
+        self.group_of = group_of
+        self.min_display_time = min_display_time
+        self.token = None
+        self.on_rebuild = None  # optional callable, told after every rebuild (e.g. a reclassify.Reclassifier)
+        self.rebuild()
+
+    # region maintenance
+    def rebuild(self):
+        """Recompute everything from `times` (after load, clear, or a rule/threshold change)."""
+        self.total = 0.0
+        self.insignificant_total = 0.0
+        self.insignificant_count = 0
+        self.group_totals = {}  # group -> seconds of displayable entries
+        self.group_counts = {}  # group -> number of displayable entries
+        self._groups.clear()
+        self._heaps = {}  # group -> [(-seconds, canonical), ...] (may hold stale entries)
+        for key, seconds in self.times.items():
+            group = self.group_of(key)
+            self._groups[key] = group
+            self.total += seconds
+            if seconds < self.min_display_time:
+                self.insignificant_total += seconds
+                self.insignificant_count += 1
+            else:
+                self._add_significant(group, key, seconds)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        for group, (seconds, count) in self.rollups.items():
+            self._add_rolled_up(group, seconds, count)
+        if self.on_rebuild is not None:
+            self.on_rebuild()
+
+    def validate(self, token, min_display_time=None):
+        """Rebuild if `token` (e.g. rule version + threshold) changed since the last build."""
+        if min_display_time is not None:
+            self.min_display_time = min_display_time
+        if token != self.token:
+            self.token = token
+            self.rebuild()
+
+    def _add_significant(self, group, key, seconds):
+        self.group_totals[group] = self.group_totals.get(group, 0.0) + seconds
+        self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        self._heaps.setdefault(group, []).append((-seconds, key))
+
+    def _add_rolled_up(self, group, seconds, count):
+        self.total += seconds
+        self.group_totals[group] = self.group_totals.get(group, 0.0) + seconds
+        self.group_counts[group] = self.group_counts.get(group, 0) + count
+
+    def _adopt(self, key, seconds):
+        """Start tracking a key that is new (or was added to `times` behind our back)."""
+        group = self._groups[key] = self.group_of(key)
+        self.times[key] = seconds
+        self.total += seconds
+        if seconds < self.min_display_time:
+            self.insignificant_total += seconds
+            self.insignificant_count += 1
+        else:
+            self.group_totals[group] = self.group_totals.get(group, 0.0) + seconds
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+            heapq.heappush(self._heaps.setdefault(group, []), (-seconds, key))
+        return group
+
+    def _drop_significant(self, group, seconds):
+        count = self.group_counts[group] - 1
+        if count:
+            self.group_counts[group] = count
+            self.group_totals[group] -= seconds
+        else:
+            # drop empty groups entirely so they stop being displayed
+            del self.group_counts[group]
+            del self.group_totals[group]
+            self._heaps.pop(group, None)
+    # endregion
+
+    def touch(self, key):
+        """Make sure `key` is tracked (with 0s if new)."""
+        if key not in self._groups:
+            self._adopt(key, self.times.get(key, 0.0))
+
+    def credit(self, key, seconds):
+        """Add `seconds` to `key` in `times` and in every aggregate."""
+        group = self._groups.get(key)
+        if group is None:
+            group = self._adopt(key, self.times.get(key, 0.0))
+        old = self.times[key]
+        new = old + seconds
+        self.times[key] = new
+        self.total += seconds
+
+        threshold = self.min_display_time
+        if old < threshold:
+            if new < threshold:
+                self.insignificant_total += seconds
+                return
+            # crossed the display threshold
+            self.insignificant_total -= old
+            self.insignificant_count -= 1
+            self.group_totals[group] = self.group_totals.get(group, 0.0) + new
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        else:
+            self.group_totals[group] += seconds
+        heap = self._heaps.setdefault(group, [])
+        heapq.heappush(heap, (-new, key))
+        # stale entries pile up as durations grow; compact once they dominate
+        if len(heap) > 2 * self.group_counts[group] + 64:
+            self._compact(group)
+
+    def remove(self, key):
+        """Forget `key` (e.g. purge). Removes it from `times` as well. Returns its seconds, or None."""
+        seconds = self.times.pop(key, None)
+        group = self._groups.pop(key, None)
+        if seconds is None or group is None:
+            return seconds
+        self.total -= seconds
+        if seconds < self.min_display_time:
+            self.insignificant_total -= seconds
+            self.insignificant_count -= 1
+        else:
+            self._drop_significant(group, seconds)
+        return seconds
+
+    def regroup(self, key, group):
+        """Move `key` to `group` (after a rule change). Returns its previous group, or None if untracked."""
+        old = self._groups.get(key)
+        if old is None or old == group:
+            return old
+        self._groups[key] = group
+        seconds = self.times[key]
+        if seconds >= self.min_display_time:
+            # the entry left in the old group's heap is stale now (_is_live checks the group)
+            self._drop_significant(old, seconds)
+            self.group_totals[group] = self.group_totals.get(group, 0.0) + seconds
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+            heapq.heappush(self._heaps.setdefault(group, []), (-seconds, key))
+        return old
+
+    def add_rollup(self, group, seconds, count=1):
+        """Fold `count` entries worth `seconds` (already removed from `times`) into `group`'s rollup."""
+        rollup = self.rollups.setdefault(group, [0.0, 0])
+        rollup[0] += seconds
+        rollup[1] += count
+        self._add_rolled_up(group, seconds, count)
+
+    def _compact(self, group):
+        # every live entry's latest value is in the heap, so filtering it is enough
+        live = {}
+        for neg_seconds, key in self._heaps[group]:
+            if self._is_live(group, neg_seconds, key):
+                live[key] = neg_seconds
+        heap = [(neg_seconds, key) for key, neg_seconds in live.items()]
+        heapq.heapify(heap)
+        self._heaps[group] = heap
+
+    def _is_live(self, group, neg_seconds, key):
+        seconds = self.times.get(key)
+        return (seconds is not None and seconds == -neg_seconds and seconds >= self.min_display_time
+                and self._groups.get(key) == group)
+
+    # region queries
+    def groups(self):
+        """Groups that currently have at least one displayable entry."""
+        return self.group_totals.keys()
+
+    def group_of_key(self, key):
+        return self._groups.get(key)
+
+    def top(self, group, n):
+        """Return the `n` largest (canonical, seconds) entries of `group`, largest first."""
+        heap = self._heaps.get(group)
+        if not heap or n <= 0:
+            return []
+        result = []
+        seen = set()
+        popped = []
+        while heap and len(result) < n:
+            entry = heapq.heappop(heap)
+            neg_seconds, key = entry
+            if key in seen or not self._is_live(group, neg_seconds, key):
+                continue  # stale: discard for good
+            seen.add(key)
+            popped.append(entry)
+            result.append((key, -neg_seconds))
+        for entry in popped:
+            heapq.heappush(heap, entry)
+        return result
+    # endregion
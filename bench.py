@@ -0,0 +1,312 @@
+"""Headless benchmarks for the hot paths, on synthetic histories of 1k..1M titles.
+
+Times normalize_title, classification, the grouping/sorting behind refresh_display
+(cold rebuild and the per-refresh top-N read), save/load round trips and the
+memory held by the title store. Runs
+anywhere: no Tk, no Win32. Each run appends one JSON line to --output so results
+from different versions can be compared.
+
+    python bench.py                      # 1k, 10k, 100k titles
+    python bench.py --sizes 1000 1000000 --label my-branch
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import tempfile
+import time
+
+import export
+from bucket_history import PERIODS, BucketHistory, period_range
+from classifier import Classifier, GROUP_RULES, normalize_title
+from rules import RULE_KINDS, RuleEngine, parse_rule
+from persistence import SNAPSHOT_FORMATS, TrackerStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_RULE_COUNTS = (10, 100, 500, 1000)
+TOP_PER_GROUP = 5
+MIN_DISPLAY_TIME = 60
+
+
+def synthetic_rules(extra_groups, suffixes_per_group, seed=0):
+    """GROUP_RULES plus `extra_groups` made-up groups of `suffixes_per_group` suffixes each."""
+    rng = random.Random(seed)
+    rules = {group: list(suffixes) for group, suffixes in GROUP_RULES.items()}
+    for g in range(extra_groups):
+        rules[f"Group{g}"] = [f" - App{g}x{s}{rng.randrange(1000)}" for s in range(suffixes_per_group)]
+    return rules
+
+
+def synthetic_titles(count, rules, seed=0):
+    """`count` distinct raw titles: ~60% end in a rule suffix, some carry unsaved markers or version numbers."""
+    rng = random.Random(seed)
+    suffixes = [s for group in rules.values() for s in group if isinstance(s, str)]
+    titles = []
+    for i in range(count):
+        title = f"Document {i} {rng.choice(('notes', 'draft', 'report', 'chat', 'video'))}"
+        roll = rng.random()
+        if roll < 0.6:
+            title += rng.choice(suffixes)
+        elif roll < 0.7:
+            title += f" v{rng.randrange(10)}.{rng.randrange(30)}.{rng.randrange(100)}"
+        if rng.random() < 0.1:
+            title = "● " + title
+        titles.append(title)
+    return titles
+
+
+def synthetic_mixed_rules(count, seed=0):
+    """`count` rules in groups of 10, cycling through every rule kind (suffix, prefix, contains, regex, process)."""
+    rng = random.Random(seed)
+    rules = {}
+    for i in range(count):
+        word = f"app{i}x{rng.randrange(1000)}"
+        kind = RULE_KINDS[i % len(RULE_KINDS)]
+        if kind == "suffix":
+            rule = f" - {word}"
+        elif kind == "regex":
+            rule = ("regex", rf"\b{word}\b.*\(\d+\)$")
+        elif kind == "process":
+            rule = ("process", f"{word}.exe")
+        else:
+            rule = (kind, word)
+        rules.setdefault(f"Group{i // 10}", []).append(rule)
+    return rules
+
+
+def mixed_rule_titles(count, rules, seed=0):
+    """`count` (title, process) pairs; about half hit some rule, of any kind."""
+    rng = random.Random(seed)
+    entries = [parse_rule(rule) for group in rules.values() for rule in group]
+    titles = []
+    for i in range(count):
+        title, process = f"Document {i} {rng.choice(('notes', 'draft', 'report'))}", "explorer.exe"
+        if rng.random() < 0.5:
+            kind, pattern = rng.choice(entries)
+            if kind == "suffix":
+                title += pattern
+            elif kind == "prefix":
+                title = pattern + " " + title
+            elif kind == "contains":
+                title = f"{title} {pattern} page"
+            elif kind == "regex":
+                title = f"{title} {pattern[2:].split(chr(92))[0]} ({i})"
+            else:
+                process = pattern
+        titles.append((title, process))
+    return titles
+
+
+def linear_match(rules, title, process=""):
+    """The rule-at-a-time scan the compiled RuleEngine replaces; the baseline for bench_rules."""
+    for group, group_rules in rules.items():
+        for rule in group_rules:
+            kind, pattern = parse_rule(rule)
+            if ((kind == "suffix" and title.endswith(pattern))
+                    or (kind == "prefix" and title.startswith(pattern))
+                    or (kind == "contains" and pattern in title)
+                    or (kind == "regex" and re.search(pattern, title))
+                    or (kind == "process" and process.lower() == pattern.lower())):
+                return group, kind, pattern
+    return None
+
+
+def bench_rules(rule_counts, titles=2000, repeat=3):
+    """RuleEngine.match vs the linear scan as the number of rules grows (size = rule count)."""
+    results = []
+    for count in rule_counts:
+        rules = synthetic_mixed_rules(count, seed=count)
+        samples = mixed_rule_titles(titles, rules, seed=count)
+        engine = RuleEngine(rules)
+        for title, process in samples[:200]:
+            assert engine.match(title, process) == linear_match(rules, title, process), title
+        results.append(_result("match_compiled", count, _time(lambda: [engine.match(t, p) for t, p in samples], repeat),
+                               len(samples)))
+        results.append(_result("match_linear", count, _time(lambda: [linear_match(rules, t, p) for t, p in samples], repeat),
+                               len(samples)))
+    return results
+
+
+def synthetic_durations(count, seed=0):
+    """Heavy-tailed durations: most titles are seen briefly, a few for hours."""
+    rng = random.Random(seed)
+    return [rng.paretovariate(1.2) * 5.0 for _ in range(count)]
+
+
+def _time(func, repeat=3):
+    """Best-of-`repeat` wall time of func() in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _result(name, size, seconds, ops, **extra):
+    out = {"name": name, "size": size, "seconds": seconds, "ops": ops,
+           "us_per_op": seconds / ops * 1e6 if ops else None}
+    out.update(extra)
+    return out
+
+
+def _make_tracker(classifier):
+    return Tracker(ReplayWindowSource([]), classifier, min_display_time=MIN_DISPLAY_TIME)
+
+
+def bench_size(size, rules, workdir, repeat=3):
+    raw_titles = synthetic_titles(size, rules, seed=size)
+    durations = synthetic_durations(size, seed=size)
+    results = []
+
+    # normalize_title (uncached) and the memoized Classifier path, cold and warm
+    results.append(_result("normalize_title", size, _time(lambda: [normalize_title(t) for t in raw_titles], repeat), size))
+    canonical = [normalize_title(t) for t in raw_titles]
+
+    def classify_cold():
+        c = Classifier(rules, cache_size=size)
+        for t in canonical:
+            c.classify(t)
+    results.append(_result("classify_cold", size, _time(classify_cold, repeat), size))
+    classifier = Classifier(rules, cache_size=size)
+    for t in canonical:
+        classifier.classify(t)
+    results.append(_result("classify_warm", size, _time(lambda: [classifier.classify(t) for t in canonical], repeat), size))
+
+    # grouping/sorting behind refresh_display
+    tracker = _make_tracker(classifier)
+    tracker.window_times.update(zip(canonical, durations))
+    for raw, key in zip(raw_titles, canonical):
+        tracker.window_original_titles.setdefault(key, raw)
+    aggregates = tracker.aggregates
+    usage = tracker.titles.memory_usage()
+    results.append({"name": "memory", "size": size, "bytes": usage["total"],
+                    "plain_dicts_estimate": usage["plain_dicts_estimate"]})
+    results.append(_result("refresh_rebuild", size, _time(aggregates.rebuild, repeat), size))
+    aggregates.rebuild()
+
+    rng = random.Random(size)
+    credits = [(rng.choice(canonical), rng.uniform(0.5, 5.0)) for _ in range(1000)]
+
+    def refresh_reads():
+        # one refresh per credited tick: update a title, then read every group's top N
+        for key, seconds in credits:
+            aggregates.credit(key, seconds)
+            for group in sorted(aggregates.groups()):
+                for key_, _ in aggregates.top(group, TOP_PER_GROUP):
+                    classifier.classify(key_)
+    results.append(_result("refresh_incremental", size, _time(refresh_reads, repeat), len(credits),
+                           groups=len(aggregates.groups())))
+
+    # rule edit: move one suffix into an earlier group and back; compare with refresh_rebuild
+    moved_suffix = next(s for group, entries in rules.items() if group.startswith("Group") for s in entries)
+    moves = []
+
+    def reclassify_edit():
+        rules["Office"].append(moved_suffix)
+        moves.append(tracker.reclassify())
+        rules["Office"].pop()
+        moves.append(tracker.reclassify())
+    results.append(_result("reclassify_edit", size, _time(reclassify_edit, repeat), 2, moved=moves[-2]))
+
+    # range views from the bucketed history: a year of activity, then day/week/month/year queries
+    buckets = BucketHistory(tracker.group_of)
+    now = time.time()
+    year = 365 * 86400
+    t = now - year
+    step = year / max(1, size * 4)
+    for i in range(size * 4):
+        buckets.credit(canonical[rng.randrange(size)], t, t + step * 0.8)
+        t += step
+    for period in PERIODS:
+        start, end = period_range(period, now)
+        results.append(_result(f"range_{period}", size, _time(lambda: buckets.summary(start, end, TOP_PER_GROUP), repeat), 1,
+                               pieces=len(buckets._cover(start, end))))
+    results.append(_result("range_year", size, _time(lambda: buckets.group_totals(now - year, now), repeat), 1,
+                           pieces=len(buckets._cover(now - year, now))))
+
+    # streaming export of every title
+    for fmt in ("csv", "tkcol"):
+        out = os.path.join(workdir, f"bench_{size}.{fmt}")
+        results.append(_result(f"export_titles_{fmt}", size,
+                               _time(lambda: export.export(out, export.TITLE_COLUMNS, export.title_rows(tracker), fmt),
+                                     repeat), size, bytes=os.path.getsize(out) if os.path.exists(out) else 0))
+
+    # persistence: full snapshot in each format, journal append of new activity, load (snapshot + journal replay)
+    save_file = os.path.join(workdir, f"bench_{size}.json")
+    for fmt in SNAPSHOT_FORMATS:
+        journal_file = os.path.join(workdir, f"bench_{size}_{fmt}.journal")
+        store = TrackerStore(tracker, save_file, journal_file, snapshot_format=fmt)
+        results.append(_result(f"save_snapshot_{fmt}", size, _time(store.compact, repeat), 1,
+                               bytes=os.path.getsize(store.save_file)))
+
+        def load():
+            fresh = _make_tracker(classifier)
+            TrackerStore(fresh, save_file, journal_file, snapshot_format=fmt).load()
+            assert len(fresh.window_times) == len(tracker.window_times)
+        results.append(_result(f"load_{fmt}", size, _time(load, repeat), 1))
+    # what the window can show before anything else is loaded
+    results.append(_result("read_totals_binary", size, _time(store.read_totals, repeat), 1))
+
+    def journal_save():
+        t = 0.0
+        for key, seconds in credits:
+            tracker._credit(key, t, t + seconds)
+            t += seconds
+        store.save()
+    results.append(_result("save_journal", size, _time(journal_save, repeat), len(credits)))
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, extra_groups=12, suffixes_per_group=8, repeat=3, label=None,
+        rule_counts=DEFAULT_RULE_COUNTS):
+    rules = synthetic_rules(extra_groups, suffixes_per_group)
+    workdir = tempfile.mkdtemp(prefix="timekeeper_bench_")
+    try:
+        results = []
+        for size in sizes:
+            results.extend(bench_size(size, rules, workdir, repeat))
+        results.extend(bench_rules(rule_counts, repeat=repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "label": label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rules": sum(len(v) for v in rules.values()),
+        "groups": len(rules),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TimeKeeper's hot paths headless.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="numbers of titles")
+    parser.add_argument("--extra-groups", type=int, default=12, help="synthetic groups added to GROUP_RULES")
+    parser.add_argument("--suffixes-per-group", type=int, default=8)
+    parser.add_argument("--rule-counts", type=int, nargs="+", default=list(DEFAULT_RULE_COUNTS),
+                        help="numbers of mixed-kind rules for the matcher benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    parser.add_argument("--label", help="tag for this run, e.g. a version or branch")
+    parser.add_argument("--output", default="bench_output.txt", help="JSON lines file to append the run to")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.extra_groups, args.suffixes_per_group, args.repeat, args.label, args.rule_counts)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+    for r in report["results"]:
+        if "seconds" not in r:
+            print(f"{r['name']:<20} {r['size']:>8}  {r['bytes'] / 1e6:10.2f} MB  (plain dicts ~{r['plain_dicts_estimate'] / 1e6:.2f} MB)")
+            continue
+        size_note = f"  {r['bytes'] / 1e6:8.2f} MB on disk" if "bytes" in r else ""
+        print(f"{r['name']:<20} {r['size']:>8}  {r['seconds'] * 1000:10.2f} ms  {r['us_per_op']:10.2f} us/op{size_note}")
+
+
+if __name__ == "__main__":
+    main()
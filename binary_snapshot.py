@@ -0,0 +1,199 @@
+"""Binary snapshot format: small header with the totals, then packed columns.
+
+The JSON snapshot has to be parsed completely before anything is known. This
+format puts what the UI needs first (totals, AFK time, reset date, rollups) in a
+small JSON meta block right after a fixed header, followed by columns that can be
+used straight from a memory map:
+
+    header   MAGIC, then uint64: count, meta_off, meta_len, durations_off,
+             last_seen_off, title_index_off, original_index_off, blob_off, processes_off
+    meta     UTF-8 JSON (journal_gen, AFK_time, reset_date, rollups, totals, processes)
+    durations      count float64
+    last_seen      count float64
+    processes      count int16 indexes into meta["processes"], -1 for none (padded to 8 bytes)
+    title_index    count + 1 uint64 offsets into the blob (title i is blob[idx[i]:idx[i+1]])
+    original_index count + 1 uint64 offsets; an empty original means "same as the title"
+    blob     UTF-8 titles, then originals
+
+All numbers are little-endian; columns are 8-byte aligned. Version 1 files (no
+processes column) are still read.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b"TKSNAP\x00\x02"
+_MAGIC_V1 = b"TKSNAP\x00\x01"
+_HEADER = struct.Struct("<8s9Q")
+_HEADER_V1 = struct.Struct("<8s8Q")
+
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+
+def _le_array(typecode, values):
+    a = array(typecode, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+def encode(payload):
+    """Serialize a TrackerStore snapshot payload to bytes."""
+    times = payload["window_times"]
+    originals = payload.get("window_original_titles", {})
+    last_seen = payload.get("last_seen", {})
+    processes = payload.get("window_processes", {})
+    titles = list(times)
+    count = len(titles)
+
+    columns = ("window_times", "window_original_titles", "last_seen", "window_processes")
+    meta = {k: v for k, v in payload.items() if k not in columns}
+    process_names = sorted(set(processes.values()))
+    meta["processes"] = process_names
+    process_index = {name: i for i, name in enumerate(process_names)}
+    meta_bytes = json.dumps(meta).encode("utf-8")
+
+    encoded_titles = [t.encode("utf-8") for t in titles]
+    encoded_originals = []
+    for t in titles:
+        original = originals.get(t, t)
+        encoded_originals.append(b"" if original == t else original.encode("utf-8"))
+
+    title_index = [0]
+    for b in encoded_titles:
+        title_index.append(title_index[-1] + len(b))
+    original_index = [title_index[-1]]
+    for b in encoded_originals:
+        original_index.append(original_index[-1] + len(b))
+
+    meta_off = _HEADER.size
+    durations_off = meta_off + len(meta_bytes) + _pad(meta_off + len(meta_bytes))
+    last_seen_off = durations_off + 8 * count
+    title_index_off = last_seen_off + 8 * count
+    original_index_off = title_index_off + 8 * (count + 1)
+    processes_off = original_index_off + 8 * (count + 1)
+    blob_off = processes_off + 2 * count + _pad(2 * count)
+
+    parts = [
+        _HEADER.pack(MAGIC, count, meta_off, len(meta_bytes), durations_off, last_seen_off,
+                     title_index_off, original_index_off, blob_off, processes_off),
+        meta_bytes,
+        b"\0" * (durations_off - meta_off - len(meta_bytes)),
+        _le_array("d", (float(times[t]) for t in titles)).tobytes(),
+        _le_array("d", (float(last_seen.get(t, 0.0)) for t in titles)).tobytes(),
+        _le_array("Q", title_index).tobytes(),
+        _le_array("Q", original_index).tobytes(),
+        _le_array("h", (process_index[processes[t]] if t in processes else -1 for t in titles)).tobytes(),
+        b"\0" * _pad(2 * count),
+    ]
+    parts.extend(encoded_titles)
+    parts.extend(encoded_originals)
+    return b"".join(parts)
+
+
+def is_binary_snapshot(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) in (MAGIC, _MAGIC_V1)
+    except OSError:
+        return False
+
+
+def read_meta(path):
+    """Just the meta block (totals, AFK time, reset date, rollups, journal_gen) plus "count"; reads a few KB."""
+    with open(path, "rb") as f:
+        magic, count, meta_off, meta_len, *_ = _HEADER_V1.unpack(f.read(_HEADER_V1.size))
+        if magic not in (MAGIC, _MAGIC_V1):
+            raise ValueError(f"{path} is not a binary snapshot")
+        f.seek(meta_off)
+        meta = json.loads(f.read(meta_len).decode("utf-8"))
+    meta["count"] = count
+    return meta
+
+
+class BinarySnapshot:
+    """Read-only, memory-mapped view of a binary snapshot. Titles and originals are decoded on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic = self._map[:len(MAGIC)]
+        if magic == MAGIC:
+            (magic, self.count, meta_off, meta_len, durations_off, last_seen_off,
+             title_index_off, original_index_off, self._blob_off, processes_off) = _HEADER.unpack_from(self._map, 0)
+        elif magic == _MAGIC_V1:
+            (magic, self.count, meta_off, meta_len, durations_off, last_seen_off,
+             title_index_off, original_index_off, self._blob_off) = _HEADER_V1.unpack_from(self._map, 0)
+            processes_off = None
+        else:
+            self.close()
+            raise ValueError(f"{path} is not a binary snapshot")
+        self.meta = json.loads(self._map[meta_off:meta_off + meta_len].decode("utf-8"))
+        view = self._view = memoryview(self._map)
+        n = self.count
+        self.durations = self._column(view, durations_off, n, "d")
+        self.last_seen = self._column(view, last_seen_off, n, "d")
+        self._title_index = self._column(view, title_index_off, n + 1, "Q")
+        self._original_index = self._column(view, original_index_off, n + 1, "Q")
+        # process index per entry (-1 for none) into process_names; None for version 1 files
+        self.process_names = self.meta.get("processes", [])
+        self.processes = self._column(view, processes_off, n, "h", 2) if processes_off is not None else None
+
+    @staticmethod
+    def _column(view, offset, n, typecode, itemsize=8):
+        column = view[offset:offset + itemsize * n]
+        if sys.byteorder == "little":
+            return column.cast(typecode)
+        a = array(typecode, column.tobytes())
+        a.byteswap()
+        return a
+
+    @staticmethod
+    def copy_column(column):
+        """A native-order array("d") copy of a float column (durations or last_seen), in one memcpy."""
+        a = array("d")
+        with memoryview(column).cast("B") as raw:
+            a.frombytes(raw)
+        return a
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, index, i):
+        start, end = index[i], index[i + 1]
+        return self._map[self._blob_off + start:self._blob_off + end].decode("utf-8")
+
+    def title(self, i):
+        return self._string(self._title_index, i)
+
+    def titles(self):
+        return [self.title(i) for i in range(self.count)]
+
+    def original(self, i):
+        """Original title for entry i (the title itself when none was stored)."""
+        original = self._string(self._original_index, i)
+        return original or self.title(i)
+
+    def stored_originals(self):
+        """Yield (title, original) for the entries that stored an original, skipping the rest unread."""
+        index = self._original_index
+        for i in range(self.count):
+            if index[i + 1] > index[i]:
+                yield self.title(i), self._string(index, i)
+
+    def close(self):
+        # release column views first; the map can't close while they're exported
+        for name in ("durations", "last_seen", "_title_index", "_original_index", "processes", "_view"):
+            column = getattr(self, name, None)
+            if isinstance(column, memoryview):
+                column.release()
+            setattr(self, name, None)
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
@@ -0,0 +1,328 @@
+"""Time-bucketed history: per-title seconds in hourly, daily and monthly buckets.
+
+window_times only has lifetime totals. BucketHistory also adds every credited
+interval to the bucket of the hour, local day and local month it falls in (an
+interval crossing an hour boundary is split). A range query is answered from the
+coarsest buckets that fit inside it: whole months, then whole days, then hours at
+the ragged ends. That is at most ~46 hour + ~60 day buckets plus one per whole
+month, however long the history is, so "today", "this week" and "this month" cost
+the same after a year of tracking as after a day.
+
+Hours are local clock hours, so a day or month is always made of whole hourly
+buckets: where the UTC offset has a half or quarter hour (India, Nepal,
+Newfoundland, ...) they start that far past the UTC hour (_hour_shift).
+
+Resolution is one hour: query bounds are widened to whole hours. Hourly buckets are
+only kept for `hour_days` days; where a range edge falls on a day older than that,
+the whole day is counted. Likewise daily buckets are kept for `day_days` days (past
+that the whole month is counted) and monthly buckets for `month_count` months, so
+the history stays bounded however long tracking runs.
+
+to_json() copies only the buckets that changed since its last call and reuses the
+earlier copies of the rest, so capturing the history for a save (under the tracker
+lock) costs as much as the activity since the previous save, not the whole history.
+"""
+import heapq
+import math
+from datetime import date, datetime, timedelta
+
+PERIODS = ("day", "week", "month")
+LEVELS = ("hours", "days", "months")
+
+
+class Bucket:
+    __slots__ = ("titles", "groups", "total")
+
+    def __init__(self):
+        self.titles = {}  # canonical -> seconds
+        self.groups = {}  # group -> seconds
+        self.total = 0.0
+
+    def add(self, title, group, seconds):
+        self.titles[title] = self.titles.get(title, 0.0) + seconds
+        self.groups[group] = self.groups.get(group, 0.0) + seconds
+        self.total += seconds
+
+    def to_json(self):
+        return {"t": dict(self.titles), "g": dict(self.groups)}
+
+    @classmethod
+    def from_json(cls, data):
+        bucket = cls()
+        bucket.titles = {k: float(v) for k, v in data.get("t", {}).items()}
+        bucket.groups = {k: float(v) for k, v in data.get("g", {}).items()}
+        bucket.total = sum(bucket.groups.values())
+        return bucket
+
+
+def _hour_shift(timestamp):
+    """Seconds past the UTC hour at which local hours start around `timestamp` (900 at UTC+5:45, else mostly 0)."""
+    return -int(datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds()) % 3600
+
+
+def _hour_index(timestamp, shift):
+    """Index of the local hour containing `timestamp`; hour h starts at h * 3600 + shift."""
+    return int((timestamp - shift) // 3600)
+
+
+def _hour_of(day):
+    """Hour index of local midnight starting `day`."""
+    midnight = datetime.combine(day, datetime.min.time()).timestamp()
+    return _hour_index(midnight, _hour_shift(midnight))
+
+
+def _month_key(day):
+    return day.year * 12 + day.month - 1
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def period_range(period, when=None):
+    """(start, end) timestamps of the local day, week (from Monday) or month containing `when`."""
+    day = datetime.fromtimestamp(when).date() if when is not None else date.today()
+    if period == "day":
+        first, last = day, day + timedelta(days=1)
+    elif period == "week":
+        first = day - timedelta(days=day.weekday())
+        last = first + timedelta(days=7)
+    elif period == "month":
+        first = day.replace(day=1)
+        last = _next_month(first)
+    else:
+        raise ValueError(f"period must be one of {PERIODS}")
+    return (datetime.combine(first, datetime.min.time()).timestamp(),
+            datetime.combine(last, datetime.min.time()).timestamp())
+
+
+class BucketHistory:
+    """Hourly, daily and monthly buckets of credited time.
+
+    group_of(canonical) gives the group a credit is counted under.
+    hour_days: how many days of hourly buckets to keep (<= 0 keeps them all).
+    day_days: how many days of daily buckets to keep (<= 0 keeps them all).
+    month_count: how many months of monthly buckets to keep (<= 0 keeps them all).
+    """
+
+    def __init__(self, group_of, hour_days=14, day_days=400, month_count=120):
+        self.group_of = group_of
+        self.hour_days = hour_days
+        self.day_days = day_days
+        self.month_count = month_count
+        self.clear()
+
+    def clear(self):
+        self.hours = {}  # hour index (see _hour_index) -> Bucket
+        self.days = {}  # date ordinal (local) -> Bucket
+        self.months = {}  # year * 12 + month - 1 (local) -> Bucket
+        self.hours_before = 0  # hourly buckets before this hour index have been dropped
+        self.days_before = 0  # daily buckets before this date ordinal have been dropped
+        self.months_before = 0  # monthly buckets before this month key have been dropped
+        self._hour = None  # last credited (hour, shift) and its (day, month) keys
+        self._keys = None
+        self._saved = {name: {} for name in LEVELS}  # str(key) -> to_json() copy of an unchanged bucket
+        self._changed = {name: set() for name in LEVELS}  # keys whose copy is missing or out of date
+
+    # region recording
+    def credit(self, title, start, end, group=None):
+        """Add [start, end) to `title`'s buckets."""
+        if end <= start:
+            return
+        if group is None:
+            group = self.group_of(title)
+        shift = _hour_shift(start)
+        while start < end:
+            hour = _hour_index(start, shift)
+            piece_end = min(end, (hour + 1) * 3600.0 + shift)
+            self._add(hour, shift, title, group, piece_end - start)
+            start = piece_end
+
+    def _add(self, hour, shift, title, group, seconds):
+        if (hour, shift) != self._hour:
+            day = datetime.fromtimestamp(hour * 3600 + shift).date()
+            self._hour, self._keys = (hour, shift), (day.toordinal(), _month_key(day))
+        changed = self._changed
+        if hour >= self.hours_before:
+            bucket = self.hours.get(hour)
+            if bucket is None:
+                bucket = self.hours[hour] = Bucket()
+                self._drop_old("hours", hour - self.hour_days * 24 if self.hour_days > 0 else None)
+            bucket.add(title, group, seconds)
+            changed["hours"].add(hour)
+        day_key, month_key = self._keys
+        if day_key >= self.days_before:
+            bucket = self.days.get(day_key)
+            if bucket is None:
+                bucket = self.days[day_key] = Bucket()
+                self._drop_old("days", day_key - self.day_days if self.day_days > 0 else None)
+            bucket.add(title, group, seconds)
+            changed["days"].add(day_key)
+        if month_key >= self.months_before:
+            bucket = self.months.get(month_key)
+            if bucket is None:
+                bucket = self.months[month_key] = Bucket()
+                self._drop_old("months", month_key - self.month_count + 1 if self.month_count > 0 else None)
+            bucket.add(title, group, seconds)
+            changed["months"].add(month_key)
+
+    def _drop_old(self, name, cutoff):
+        """Drop the `name` buckets with keys before `cutoff` (None: keep everything)."""
+        if cutoff is None or cutoff <= getattr(self, name + "_before"):
+            return
+        level = getattr(self, name)
+        for key in [k for k in level if k < cutoff]:
+            del level[key]
+            self._changed[name].add(key)
+        setattr(self, name + "_before", cutoff)
+
+    def remove(self, titles):
+        """Forget `titles` in every bucket (e.g. after a purge)."""
+        titles = set(titles)
+        for level in (self.hours, self.days, self.months):
+            for bucket in level.values():
+                for title in titles & bucket.titles.keys():
+                    seconds = bucket.titles.pop(title)
+                    group = self.group_of(title)
+                    if group in bucket.groups:
+                        bucket.groups[group] = max(0.0, bucket.groups[group] - seconds)
+                    bucket.total -= seconds
+        self._changed_all()
+
+    def regroup(self, moves):
+        """Move titles' time between groups in every bucket; moves maps canonical -> (old group, new group)."""
+        for level in (self.hours, self.days, self.months):
+            for bucket in level.values():
+                for title in moves.keys() & bucket.titles.keys():
+                    seconds = bucket.titles[title]
+                    old, new = moves[title]
+                    if old in bucket.groups:
+                        bucket.groups[old] = max(0.0, bucket.groups[old] - seconds)
+                        if not bucket.groups[old]:
+                            del bucket.groups[old]
+                    bucket.groups[new] = bucket.groups.get(new, 0.0) + seconds
+        self._changed_all()
+
+    def _changed_all(self):
+        for name in LEVELS:
+            self._changed[name].update(getattr(self, name))
+    # endregion
+
+    # region queries
+    def _cover(self, start, end):
+        """The buckets that together cover [start, end) widened to whole hours, coarsest first."""
+        shift = _hour_shift(start)
+        hour, end_hour = _hour_index(start, shift), math.ceil((end - shift) / 3600)
+        pieces = []
+        while hour < end_hour:
+            day = datetime.fromtimestamp(hour * 3600 + shift).date()
+            if day.toordinal() < self.days_before:
+                # daily detail is gone for this month: count the whole month
+                pieces.append(self.months.get(_month_key(day)))
+                hour = _hour_of(_next_month(day))
+                continue
+            day_start = _hour_of(day)
+            next_day = _hour_of(day + timedelta(days=1))
+            if hour == day_start:
+                if day.day == 1:
+                    next_month = _hour_of(_next_month(day))
+                    if next_month <= end_hour:
+                        pieces.append(self.months.get(_month_key(day)))
+                        hour = next_month
+                        continue
+                if next_day <= end_hour:
+                    pieces.append(self.days.get(day.toordinal()))
+                    hour = next_day
+                    continue
+            if hour < self.hours_before:
+                # hourly detail is gone for this day: count the whole day
+                pieces.append(self.days.get(day.toordinal()))
+                hour = next_day
+                continue
+            pieces.append(self.hours.get(hour))
+            hour += 1
+        return [p for p in pieces if p is not None]
+
+    def total(self, start, end):
+        return sum(bucket.total for bucket in self._cover(start, end))
+
+    def group_totals(self, start, end):
+        """{group: seconds} credited between `start` and `end`."""
+        totals = {}
+        for bucket in self._cover(start, end):
+            for group, seconds in bucket.groups.items():
+                totals[group] = totals.get(group, 0.0) + seconds
+        return totals
+
+    def title_totals(self, start, end):
+        """{canonical: seconds} credited between `start` and `end`."""
+        return self._merge_titles(self._cover(start, end))
+
+    @staticmethod
+    def _merge_titles(pieces):
+        if len(pieces) == 1:
+            return dict(pieces[0].titles)
+        totals = {}
+        for bucket in pieces:
+            for title, seconds in bucket.titles.items():
+                totals[title] = totals.get(title, 0.0) + seconds
+        return totals
+
+    def top_titles(self, start, end, limit=10, group=None):
+        """[(canonical, group, seconds), ...] for the most active titles in the range, largest first."""
+        group_of = self.group_of
+        totals = self.title_totals(start, end)
+        if group is not None:
+            totals = {t: s for t, s in totals.items() if group_of(t) == group}
+        return [(title, group_of(title), seconds)
+                for title, seconds in heapq.nlargest(limit, totals.items(), key=lambda kv: kv[1])]
+
+    def summary(self, start, end, top=5):
+        """Everything a grouped view needs for the range, in one pass over its titles.
+
+        {"total": s, "groups": {group: s}, "counts": {group: n}, "top": {group: [(canonical, s), ...]}}
+        """
+        group_of = self.group_of
+        pieces = self._cover(start, end)
+        by_group = {}
+        for title, seconds in self._merge_titles(pieces).items():
+            by_group.setdefault(group_of(title), []).append((title, seconds))
+        return {
+            "total": sum(bucket.total for bucket in pieces),
+            "groups": {g: sum(s for _, s in entries) for g, entries in by_group.items()},
+            "counts": {g: len(entries) for g, entries in by_group.items()},
+            "top": {g: heapq.nlargest(top, entries, key=lambda kv: kv[1]) for g, entries in by_group.items()},
+        }
+    # endregion
+
+    # region persistence
+    def to_json(self):
+        """A JSON-ready copy of the history that later credits don't change (safe to encode on another thread)."""
+        out = {"hours_before": self.hours_before, "days_before": self.days_before,
+               "months_before": self.months_before}
+        for name in LEVELS:
+            level, saved = getattr(self, name), self._saved[name]
+            for key in self._changed[name]:
+                bucket = level.get(key)
+                if bucket is None:
+                    saved.pop(str(key), None)
+                else:
+                    saved[str(key)] = bucket.to_json()
+            self._changed[name] = set()
+            out[name] = dict(saved)
+        return out
+
+    def load_json(self, data):
+        self.clear()
+        for name in LEVELS:
+            setattr(self, name + "_before", int(data.get(name + "_before", 0)))
+            level = getattr(self, name)
+            for key, bucket in data.get(name, {}).items():
+                level[int(key)] = Bucket.from_json(bucket)
+        self._changed_all()
+
+    def stats(self):
+        return {"hours": len(self.hours), "days": len(self.days), "months": len(self.months),
+                "entries": sum(len(b.titles) for level in (self.hours, self.days, self.months)
+                               for b in level.values())}
+    # endregion
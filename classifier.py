@@ -0,0 +1,210 @@
+"""Title normalization and group classification, shared by the tracker and the UI.
+
+No Tk or Win32 imports here, so this runs anywhere (headless tracker, tests, benchmarks).
+
+Normalization turns a raw window title into its window_times key. It is an ordered
+list of regex rewrite rules (NORMALIZE_RULES in the settings file, defaulting to
+DEFAULT_NORMALIZE_RULES), each {"name", "pattern", "replace", "ignore_case"}:
+
+    {"name": "clock", "pattern": " - [0-9]{1,2}:[0-9]{2}$", "replace": ""}
+
+The rules are compiled once and run in order over the stripped title; a rule that
+changes the title also strips it again. Only new keys are affected: titles already
+tracked keep the key they were recorded under.
+"""
+import re
+
+from rules import RuleEngine
+from title_cache import LRUCache
+
+# Define grouping rules. Plain strings are 'ends with' suffixes; ("prefix" | "contains" | "regex" | "process", pattern)
+# pairs are the other rule types (see rules.py). First match wins, in the order listed.
+GROUP_RULES = {
+    "Office": [" - Word", " - PowerPoint", " - Excel", "- Adobe Acrobat Reader (64-bit)",
+               " — LibreOffice Writer", " - Google Docs — Mozilla Firefox", " - Notepad", " - Obsidian"],
+    "Work": [" - Visual Studio Code", ".pdf", " - Arizona State University Mail — Mozilla Firefox"],
+    "Unimportant": [" - YouTube — Mozilla Firefox", "YouTube — Mozilla Firefox", "Bluesky — Mozilla Firefox"],
+    "Social": [" - Discord", " - Slack"]
+}
+
+
+DEFAULT_NORMALIZE_RULES = [
+    # leading bullet or unsaved marker "● " or similar
+    {"name": "unsaved marker", "pattern": r'^[\u25CF\u2022\*\s]+', "replace": ""},
+    # notification counters and unread badges: "(3) Inbox", "(99+) Feed", "[2] Chat"
+    {"name": "unread counter", "pattern": r'^(?:\(\d+\+?\)|\[\d+\+?\])\s*', "replace": ""},
+    # Obsidian versions like "Obsidian v1.11.4" or "Obsidian 1.11.4"
+    {"name": "Obsidian version", "pattern": r'\b(Obsidian)(?:\s*v?\d+(\.\d+)*)', "replace": r'\1',
+     "ignore_case": True},
+    # version numbers other apps append, e.g. "AppName v1.2.3" or "AppName 1.2.3"
+    {"name": "trailing version", "pattern": r'\s+v?\d+(\.\d+){1,}(?:\S*)?$', "replace": ""},
+]
+
+
+class TitleNormalizer:
+    """The normalization rules, compiled, with a hit counter per rule.
+
+    Rules that don't compile (or whose replacement refers to a missing group) are
+    reported and left out.
+    """
+
+    def __init__(self, rules=None):
+        self.set_rules(DEFAULT_NORMALIZE_RULES if rules is None else rules)
+
+    def set_rules(self, rules):
+        compiled = []
+        for rule in rules:
+            try:
+                name = rule.get("name") or rule["pattern"]
+                regex = re.compile(rule["pattern"], re.IGNORECASE if rule.get("ignore_case") else 0)
+                replace = rule.get("replace", "")
+                regex.sub(replace, "")  # checks the replacement's group references now, not on the first title
+            except (AttributeError, KeyError, TypeError, re.error) as e:
+                print("Error in normalization rule:", rule, e)
+                continue
+            compiled.append((name, regex.subn, replace))
+        self.rules = rules
+        self._compiled = compiled
+        self.hits = [0] * len(compiled)
+        self.titles = 0  # titles normalized (cache misses, when behind the classifier's cache)
+        self.changed = 0  # of those, titles some rule rewrote
+
+    def normalize(self, raw_title: str) -> str:
+        if not raw_title:
+            return "Unknown"
+        title = raw_title.strip()
+        hits = self.hits
+        changed = False
+        for i, (_, subn, replace) in enumerate(self._compiled):
+            title, n = subn(replace, title)
+            if n:
+                hits[i] += 1
+                changed = True
+                title = title.strip()
+        self.titles += 1
+        self.changed += changed
+        return title
+
+    def stats(self):
+        return {"titles": self.titles, "changed": self.changed,
+                "rules": [{"name": name, "hits": hits} for (name, _, _), hits in zip(self._compiled, self.hits)]}
+
+
+_default_normalizer = TitleNormalizer()
+
+
+def normalize_title(raw_title: str) -> str:
+    """Return a canonical title used as the key in window_times, with DEFAULT_NORMALIZE_RULES."""
+    return _default_normalizer.normalize(raw_title)
+
+
+def truncate_display(s: str, limit: int) -> str:
+    if not s:
+        return s
+    if len(s) <= limit:
+        return s
+    return s[:limit - 3].rstrip() + "..."
+
+
+class Classifier:
+    """Memoized normalize_title + GROUP_RULES classification.
+
+    `rules` is the live rules mapping. Edits to it are picked up when `version` is read
+    (RuleEngine.sync, which compares every rule), so that happens once per refresh
+    (Tracker.reclassify) rather than on every classify; classify() itself only checks
+    the compiled version. `title_truncate` may be changed at any time. Cached
+    classifications are dropped whenever either changes.
+    `normalize_rules` are the normalization rules (default DEFAULT_NORMALIZE_RULES);
+    change them with set_normalize_rules().
+    `process_of(canonical)` optionally gives the executable a title was seen in, for
+    "process" rules; it's only consulted while such rules exist.
+    """
+
+    def __init__(self, rules=None, title_truncate=50, cache_size=50000, normalize_rules=None):
+        self.rules = GROUP_RULES if rules is None else rules
+        self.title_truncate = title_truncate
+        self.rule_engine = RuleEngine(self.rules)
+        self.normalizer = TitleNormalizer(normalize_rules)
+        self.process_of = None
+        # Memoized raw -> canonical and canonical -> (group, display title)
+        self.normalize_cache = LRUCache(cache_size)
+        self.classify_cache = LRUCache(cache_size)
+
+    def normalize(self, raw_title: str) -> str:
+        canonical = self.normalize_cache.get(raw_title)
+        if canonical is None:
+            canonical = self.normalizer.normalize(raw_title)
+            self.normalize_cache.put(raw_title, canonical)
+        return canonical
+
+    def set_normalize_rules(self, rules):
+        """Use `rules` from now on (a no-op if they are unchanged)."""
+        if rules == self.normalizer.rules:
+            return
+        self.normalizer.set_rules(rules)
+        self.normalize_cache.clear()
+
+    @property
+    def version(self):
+        """Compiles any edits made to the rules since the last check; changes whenever they are recompiled."""
+        self.rule_engine.sync(self.rules)
+        return self.rule_engine.version
+
+    @property
+    def uses_process(self):
+        """True while some rule matches on the process name (so callers know to look it up)."""
+        return self.rule_engine.uses_process
+
+    def classify(self, canonical_title: str, process=None):
+        """Return (group, clean_title) for the canonical title. clean_title is truncated for display.
+
+        process: the window's executable, for "process" rules; looked up with process_of if not given.
+        """
+        if not canonical_title:
+            # ruh roh, oh well
+            return "Unknown", "Unknown"
+
+        # Cached answers depend on the rules and the truncation length; drop them if either changed
+        token = (self.rule_engine.version, self.title_truncate)
+        self.classify_cache.validate(token)
+        key = canonical_title
+        if self.rule_engine.uses_process:
+            if process is None and self.process_of is not None:
+                process = self.process_of(canonical_title)
+            if process:
+                key = (canonical_title, process)
+        cached = self.classify_cache.get(key)
+        if cached is None:
+            cached = self._classify_uncached(canonical_title, process)
+            self.classify_cache.put(key, cached, token)
+        return cached
+
+    def group_of(self, canonical_title: str, process=None) -> str:
+        return self.classify(canonical_title, process)[0]
+
+    def _classify_uncached(self, canonical_title, process=None):
+        # Check group rules (compiled matchers; recompiled if the rules were edited)
+        matched = self.rule_engine.match(canonical_title, process)
+        if matched is not None:
+            group, kind, pattern = matched
+            # remove the matched suffix/prefix from display name
+            if kind == "suffix":
+                clean_title = canonical_title.replace(pattern, "").strip()
+            elif kind == "prefix":
+                clean_title = canonical_title[len(pattern):].strip()
+            else:
+                clean_title = canonical_title
+            # Truncate clean titles to title_truncate chars for display
+            clean_title_disp = truncate_display(clean_title or canonical_title, self.title_truncate)
+            return group, clean_title_disp
+
+        # Otherwise, it's in the Uncategorized Group
+        return "Uncategorized", truncate_display(canonical_title, self.title_truncate)
+
+    def cache_stats(self):
+        """Hit/miss counters for the title caches."""
+        return {"normalize": self.normalize_cache.stats(), "classify": self.classify_cache.stats()}
+
+    def normalize_stats(self):
+        """Per-rule hit counts of the normalization rules (see TitleNormalizer.stats)."""
+        return self.normalizer.stats()
@@ -0,0 +1,363 @@
+"""Streaming export of tracked data to CSV and columnar files.
+
+Two tables can be exported:
+  titles     one row per tracked title: TITLE_COLUMNS
+  intervals  one row per recorded focus interval (needs RECORD_HISTORY): INTERVAL_COLUMNS
+
+Rows come from generators and are written as they arrive (CSV) or a chunk at a time
+(columnar), so memory stays flat however long the history is. "group" is what the
+classifier says now (classify_window_by_group). "original_title" comes from
+window_original_titles. Intervals also keep the group they were recorded under.
+
+Formats:
+  csv      UTF-8 with a header row
+  tkcol    dependency-free columnar file: row groups of packed columns (float64 /
+           int64 arrays, strings as offsets + UTF-8 blob) and a JSON footer indexing
+           them, so readers can fetch just the columns they need; see read_columns()
+  parquet  Apache Parquet via pyarrow, one row group per chunk (pyarrow must be installed)
+
+    python export.py titles --output titles.csv
+    python export.py intervals --format tkcol --output year.tkcol --start 2025-01-01 --end 2026-01-01
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+
+import binary_snapshot
+from journal import read_records
+from persistence import read_snapshot
+
+TITLE_COLUMNS = (("title", "s"), ("original_title", "s"), ("group", "s"), ("seconds", "f"),
+                 ("last_seen", "f"), ("process", "s"))
+INTERVAL_COLUMNS = (("start", "f"), ("end", "f"), ("seconds", "f"), ("title", "s"), ("original_title", "s"),
+                    ("group", "s"), ("recorded_group", "s"), ("afk", "i"))
+FORMATS = ("csv", "tkcol", "parquet")
+CHUNK_ROWS = 65536  # rows per columnar row group
+
+TKCOL_MAGIC = b"TKCOL\x00\x00\x01"
+_FOOTER = struct.Struct("<Q8s")  # footer length, magic
+
+
+# region row sources
+def title_rows(tracker, batch=5000):
+    """Yield a TITLE_COLUMNS row per title of a live tracker, holding its lock one batch at a time."""
+    titles = tracker.titles
+    originals = tracker.window_original_titles
+    group_of = tracker.classifier.group_of
+    start = 0
+    while True:
+        with tracker.lock:
+            found, start = titles.scan(start, batch)
+            rows = [(title, originals.get(title, title), group_of(title), seconds, seen, titles.process_of(title))
+                    for title, seconds, seen in found]
+        yield from rows
+        if not start:
+            return
+
+
+def _journal_changes(journal_file, snapshot_gen):
+    """The journal's records newer than the snapshot, summed per title: (times, last_seen, originals, processes, folded).
+
+    `folded` holds titles whose snapshot time was folded away since; `times` is only what came after.
+    """
+    times, last_seen, originals, processes, folded = {}, {}, {}, {}, set()
+    if journal_file is None:
+        return times, last_seen, originals, processes, folded
+    gen, records, _ = read_records(journal_file)
+    if gen <= snapshot_gen:
+        return times, last_seen, originals, processes, folded
+    for rec in records:
+        if "w" in rec:
+            key, end = rec["w"], float(rec["e"])
+            times[key] = times.get(key, 0.0) + end - float(rec["s"])
+            last_seen[key] = max(last_seen.get(key, 0.0), end)
+        elif "o" in rec:
+            originals[rec["o"]] = rec["t"]
+        elif "p" in rec:
+            processes[rec["p"]] = rec["n"]
+        elif "fold" in rec:
+            times.pop(rec["fold"], None)
+            originals.pop(rec["fold"], None)
+            processes.pop(rec["fold"], None)
+            folded.add(rec["fold"])
+    return times, last_seen, originals, processes, folded
+
+
+def snapshot_title_rows(snapshot_file, journal_file=None, classifier=None):
+    """Yield TITLE_COLUMNS rows straight from the save files, without a Tracker.
+
+    A binary snapshot is read entry by entry from its memory map. A JSON snapshot
+    has to be parsed whole first. Journal records newer than the snapshot are
+    applied on the way; only the journal, which compaction keeps small, is held
+    in memory. With no snapshot (`snapshot_file` None) the rows come from the
+    journal alone.
+    """
+    if classifier is None:
+        from classifier import Classifier
+        classifier = Classifier()
+    group_of = classifier.group_of
+    snap = None
+    if snapshot_file is None:
+        def entries():
+            return iter(())
+        gen = -1
+    elif binary_snapshot.is_binary_snapshot(snapshot_file):
+        snap = binary_snapshot.BinarySnapshot(snapshot_file)
+        count = snap.count
+
+        def entries():
+            for i in range(count):
+                pid = snap.processes[i] if snap.processes is not None else -1
+                yield (snap.title(i), snap.original(i), snap.durations[i], snap.last_seen[i],
+                       snap.process_names[pid] if pid >= 0 else "")
+        gen = int(snap.meta.get("journal_gen", 0))
+    else:
+        data = read_snapshot(snapshot_file)
+
+        def entries():
+            originals, seen, processes = data["window_original_titles"], data["last_seen"], data["window_processes"]
+            for title, seconds in data["window_times"].items():
+                yield (title, originals.get(title, title), seconds, float(seen.get(title, 0.0)),
+                       processes.get(title, ""))
+        gen = data["journal_gen"]
+    times, last_seen, originals, processes, folded = _journal_changes(journal_file, gen)
+    try:
+        for title, original, seconds, seen, process in entries():
+            if title in folded:
+                if title not in times:
+                    continue
+                seconds, original, process = 0.0, title, ""  # folding dropped the rest as well
+            seconds += times.pop(title, 0.0)
+            yield (title, originals.get(title, original), group_of(title), seconds,
+                   max(seen, last_seen.get(title, 0.0)), processes.get(title, process))
+    finally:
+        if snap is not None:
+            snap.close()
+    # titles first seen since the snapshot
+    for title, seconds in times.items():
+        yield (title, originals.get(title, title), group_of(title), seconds, last_seen.get(title, 0.0),
+               processes.get(title, ""))
+
+
+def snapshot_originals(snapshot_file):
+    """Just the snapshot's {title: original} map; a title missing from it is its own original.
+
+    A binary snapshot only decodes the entries that stored an original; a JSON one
+    is parsed and everything but the map dropped straight away.
+    """
+    if binary_snapshot.is_binary_snapshot(snapshot_file):
+        snap = binary_snapshot.BinarySnapshot(snapshot_file)
+        try:
+            return dict(snap.stored_originals())
+        finally:
+            snap.close()
+    with open(snapshot_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("window_original_titles", {})
+
+
+def interval_rows(history_db, start, end, classifier, originals=None):
+    """Yield an INTERVAL_COLUMNS row per interval in the history database between `start` and `end`."""
+    originals = originals if originals is not None else {}
+    group_of = classifier.group_of
+    for row_start, row_end, title, recorded_group, afk in history_db.intervals(start, end):
+        yield (row_start, row_end, row_end - row_start, title, originals.get(title, title), group_of(title),
+               recorded_group, afk)
+# endregion
+
+
+# region writers
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(path, columns, rows):
+    """Write rows as CSV with a header. Returns the number of rows written."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        for chunk in _chunks(rows, 4096):  # rows go straight out, so small batches are enough
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def _le_bytes(typecode, values):
+    a = array(typecode, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _encode_column(kind, values):
+    if kind == "f":
+        return _le_bytes("d", (float(v) for v in values))
+    if kind == "i":
+        return _le_bytes("q", (int(v) for v in values))
+    encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    return _le_bytes("Q", offsets) + b"".join(encoded)
+
+
+def write_tkcol(path, columns, rows, chunk_rows=CHUNK_ROWS):
+    """Write rows in the tkcol columnar format, one row group per `chunk_rows` rows. Returns the row count."""
+    row_groups = []
+    count = 0
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(TKCOL_MAGIC)
+        for chunk in _chunks(rows, chunk_rows):
+            placed = []
+            for (_, kind), values in zip(columns, zip(*chunk)):
+                data = _encode_column(kind, values)
+                placed.append([f.tell(), len(data)])
+                f.write(data)
+            row_groups.append({"rows": len(chunk), "columns": placed})
+            count += len(chunk)
+        footer = json.dumps({"columns": [list(c) for c in columns], "row_groups": row_groups}).encode("utf-8")
+        f.write(footer)
+        f.write(_FOOTER.pack(len(footer), TKCOL_MAGIC))
+    os.replace(tmp, path)
+    return count
+
+
+def _decode_column(kind, data, rows):
+    if kind in ("f", "i"):
+        values = array("d" if kind == "f" else "q")
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+    offsets = array("Q")
+    offsets.frombytes(data[:8 * (rows + 1)])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    blob = data[8 * (rows + 1):]
+    return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(rows)]
+
+
+def read_columns(path, columns=None):
+    """Yield {column: values} per row group of a tkcol file, reading only the requested `columns`."""
+    with open(path, "rb") as f:
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        footer_len, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != TKCOL_MAGIC:
+            raise ValueError(f"{path} is not a tkcol file")
+        f.seek(-_FOOTER.size - footer_len, os.SEEK_END)
+        footer = json.loads(f.read(footer_len).decode("utf-8"))
+        names = [name for name, _ in footer["columns"]]
+        wanted = names if columns is None else list(columns)
+        for group in footer["row_groups"]:
+            out = {}
+            for name in wanted:
+                i = names.index(name)
+                offset, length = group["columns"][i]
+                f.seek(offset)
+                out[name] = _decode_column(footer["columns"][i][1], f.read(length), group["rows"])
+            yield out
+
+
+def read_rows(path):
+    """Yield the rows of a tkcol file as tuples, a row group at a time."""
+    for group in read_columns(path):
+        yield from zip(*group.values())
+
+
+def write_parquet(path, columns, rows, chunk_rows=CHUNK_ROWS):
+    """Write rows as Parquet, one row group per `chunk_rows` rows. Needs pyarrow. Returns the row count."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow); tkcol and csv work without it")
+    types = {"f": pa.float64(), "i": pa.int64(), "s": pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    count = 0
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        for chunk in _chunks(rows, chunk_rows):
+            arrays = [pa.array(values, type=types[kind]) for (_, kind), values in zip(columns, zip(*chunk))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+    finally:
+        writer.close()
+    return count
+
+
+def export(path, columns, rows, fmt="csv"):
+    """Write `rows` to `path` in `fmt` (one of FORMATS). Returns the number of rows written."""
+    if fmt == "csv":
+        return write_csv(path, columns, rows)
+    if fmt == "tkcol":
+        return write_tkcol(path, columns, rows)
+    if fmt == "parquet":
+        return write_parquet(path, columns, rows)
+    raise ValueError(f"format must be one of {FORMATS}")
+# endregion
+
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export TimeKeeper data to CSV or columnar files.")
+    parser.add_argument("table", choices=("titles", "intervals"))
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output extension, else csv")
+    parser.add_argument("--save-file", default="window_times.json",
+                        help="snapshot to read titles from (the .tksnap next to it is used if newer)")
+    parser.add_argument("--journal", default="window_times.journal")
+    parser.add_argument("--history", default="timekeeper_history.sqlite3", help="interval history database")
+    parser.add_argument("--start", type=_timestamp, help="intervals from this date/time (ISO format)")
+    parser.add_argument("--end", type=_timestamp, help="intervals up to this date/time (ISO format)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".").lower()
+        fmt = extension if extension in FORMATS else "csv"
+    from classifier import Classifier
+    classifier = Classifier()
+    candidates = [p for p in (os.path.splitext(args.save_file)[0] + ".tksnap", args.save_file) if os.path.exists(p)]
+    snapshot = max(candidates, key=os.path.getmtime) if candidates else None
+
+    started = time.perf_counter()
+    if args.table == "titles":
+        if snapshot is None and not os.path.exists(args.journal):
+            parser.error(f"no snapshot found at {args.save_file} and no journal at {args.journal}")
+        columns, rows = TITLE_COLUMNS, snapshot_title_rows(snapshot, args.journal, classifier)
+    else:
+        if not os.path.exists(args.history):
+            parser.error(f"no history database at {args.history} (is RECORD_HISTORY on?)")
+        from history_db import HistoryDB
+        originals = snapshot_originals(snapshot) if snapshot is not None else {}
+        originals.update(_journal_changes(args.journal, -1)[2])
+        db = HistoryDB(args.history)
+        start = args.start if args.start is not None else 0.0
+        end = args.end if args.end is not None else time.time()
+        columns, rows = INTERVAL_COLUMNS, interval_rows(db, start, end, classifier, originals)
+    try:
+        count = export(args.output, columns, rows, fmt)
+    finally:
+        if args.table == "intervals":
+            db.close()
+    print(f"Wrote {count} {args.table} rows to {args.output} ({fmt}) in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Optional SQLite store of individual focus intervals.
+
+window_times only keeps lifetime totals per title. When history recording is on,
+every credited interval is also kept here (start, end, canonical title, group, AFK
+flag) so arbitrary time ranges can be queried later. The JSON totals stay the live,
+materialized view; this database is written in batches and only read on demand.
+"""
+import sqlite3
+import threading
+
+# Intervals longer than this are split on insert so range queries can bound their index scan
+MAX_INTERVAL = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    title TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    afk INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS intervals_start ON intervals (start);
+CREATE INDEX IF NOT EXISTS intervals_grp_start ON intervals (grp, start);
+"""
+
+
+class HistoryDB:
+    """Batched writer and small query API over the intervals table.
+
+    record() only buffers (coalescing back-to-back intervals of the same title);
+    flush() inserts the batch in one transaction. The batch can also be taken with
+    take_pending() and inserted with write_rows() from another thread (the background
+    writer); connection use is serialized by `conn_lock`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn_lock = threading.Lock()
+        self.conn.executescript(_SCHEMA)
+        self._pending = []  # [start, end, title, group, afk]
+
+    def record(self, start, end, title, group, afk=False):
+        if end <= start:
+            return
+        afk = 1 if afk else 0
+        last = self._pending[-1] if self._pending else None
+        if (last is not None and last[1] == start and last[2] == title and last[3] == group
+                and last[4] == afk and end - last[0] <= MAX_INTERVAL):
+            last[1] = end
+            return
+        while end - start > MAX_INTERVAL:
+            self._pending.append([start, start + MAX_INTERVAL, title, group, afk])
+            start += MAX_INTERVAL
+        self._pending.append([start, end, title, group, afk])
+
+    def take_pending(self):
+        """Remove and return the buffered rows."""
+        rows = [tuple(r) for r in self._pending]
+        self._pending.clear()
+        return rows
+
+    def write_rows(self, rows):
+        """Insert rows from take_pending() in one transaction. Returns how many were written."""
+        if not rows:
+            return 0
+        with self.conn_lock, self.conn:
+            self.conn.executemany("INSERT INTO intervals (start, end, title, grp, afk) VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def flush(self):
+        """Insert buffered intervals. Returns how many rows were written."""
+        return self.write_rows(self.take_pending())
+
+    def close(self):
+        self.flush()
+        with self.conn_lock:
+            self.conn.close()
+
+    # region queries
+    # Overlap of [start, end) with the query range, clipped to it. The start >= range_start - MAX_INTERVAL
+    # bound is what lets SQLite use the start index instead of scanning every row.
+    _CLIPPED = "SUM(MIN(end, :end) - MAX(start, :start))"
+    _IN_RANGE = "start >= :start - :max_interval AND start < :end AND end > :start"
+
+    def _params(self, start, end, **extra):
+        return dict(start=float(start), end=float(end), max_interval=MAX_INTERVAL, **extra)
+
+    def totals_by_group(self, start, end, include_afk=False):
+        """{group: seconds} for activity between the `start` and `end` timestamps."""
+        sql = f"SELECT grp, {self._CLIPPED} FROM intervals WHERE {self._IN_RANGE}"
+        if not include_afk:
+            sql += " AND afk = 0"
+        sql += " GROUP BY grp"
+        with self.conn_lock:
+            return {grp: total for grp, total in self.conn.execute(sql, self._params(start, end))}
+
+    def top_titles(self, start, end, limit=10, group=None):
+        """[(title, group, seconds), ...] for the most active titles in the range, largest first."""
+        sql = f"SELECT title, grp, {self._CLIPPED} AS total FROM intervals WHERE {self._IN_RANGE} AND afk = 0"
+        if group is not None:
+            sql += " AND grp = :grp"
+        sql += " GROUP BY title, grp ORDER BY total DESC LIMIT :limit"
+        with self.conn_lock:
+            return self.conn.execute(sql, self._params(start, end, grp=group, limit=int(limit))).fetchall()
+
+    def afk_total(self, start, end):
+        sql = f"SELECT {self._CLIPPED} FROM intervals WHERE {self._IN_RANGE} AND afk = 1"
+        with self.conn_lock:
+            return self.conn.execute(sql, self._params(start, end)).fetchone()[0] or 0.0
+
+    def intervals(self, start, end, chunk=5000):
+        """Yield (start, end, title, group, afk) rows overlapping the range, in time order.
+
+        Rows are fetched `chunk` at a time (keyset pagination on (start, id)), so a
+        long range is never in memory all at once.
+        """
+        sql = (f"SELECT id, start, end, title, grp, afk FROM intervals WHERE {self._IN_RANGE} "
+               "AND (start > :after OR (start = :after AND id > :after_id)) ORDER BY start, id LIMIT :chunk")
+        after, after_id = float(start) - MAX_INTERVAL - 1.0, -1
+        while True:
+            # each page is fetched whole: a commit from the writer thread mid-iteration could reset the cursor
+            with self.conn_lock:
+                rows = self.conn.execute(sql, self._params(start, end, after=after, after_id=after_id,
+                                                           chunk=int(chunk))).fetchall()
+            for row in rows:
+                yield row[1:]
+            if len(rows) < chunk:
+                return
+            after, after_id = rows[-1][1], rows[-1][0]
+    # endregion
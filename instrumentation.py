@@ -0,0 +1,125 @@
+"""Per-call latency histograms, call counts and timer drift for the hot paths.
+
+Wrap a function with Instrumentation.wrap(name, func). While `enabled` is False the
+wrapper costs one attribute check per call; when enabled it records the call's wall
+time into a log2 histogram (1us .. ~1min buckets). The scheduler reports drift
+(how late each timer callback fired compared to when it was asked for) through
+record_drift(). report() gives the numbers as a dict and dump() writes them as JSON.
+"""
+import json
+import math
+import time
+
+BUCKETS = 27  # bucket i holds calls taking < 2**i microseconds; the last one holds everything slower
+
+
+class Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        us = seconds * 1e6
+        i = 0 if us < 1 else min(BUCKETS - 1, int(math.log2(us)) + 1)
+        self.buckets[i] += 1
+
+    def percentile(self, p):
+        """Upper bound (seconds) of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.max, 2 ** i / 1e6)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+            "buckets_us": {f"<{2 ** i}": n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Instrumentation:
+    """Named latency histograms plus a drift histogram; off unless `enabled`."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.calls = {}  # name -> Histogram
+        self.drift = Histogram()
+        self.started = time.time()
+
+    def wrap(self, name, func):
+        """Return func, timed under `name` whenever instrumentation is enabled."""
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        timed.__name__ = getattr(func, "__name__", name)
+        timed.__wrapped__ = func
+        return timed
+
+    def record(self, name, seconds):
+        """Add one call of `name` that took `seconds` (recorded even while disabled)."""
+        hist = self.calls.get(name)
+        if hist is None:
+            hist = self.calls[name] = Histogram()
+        hist.add(seconds)
+
+    def record_drift(self, seconds_late):
+        if self.enabled:
+            self.drift.add(max(0.0, seconds_late))
+
+    def reset(self):
+        self.calls.clear()
+        self.drift = Histogram()
+        self.started = time.time()
+
+    def report(self, extra=None):
+        out = {
+            "enabled": self.enabled,
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "calls": {name: hist.summary() for name, hist in sorted(self.calls.items())},
+            "drift": self.drift.summary(),
+        }
+        if extra:
+            out.update(extra)
+        return out
+
+    def format_report(self, extra=None):
+        """Human-readable table for the diagnostics view."""
+        report = self.report()
+        lines = [f"Instrumentation {'on' if self.enabled else 'off'} since {report['since']}", "",
+                 f"{'':<10}{'calls':>8}{'mean ms':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        rows = list(report["calls"].items()) + [("drift", report["drift"])]
+        for name, s in rows:
+            lines.append(f"{name:<10}{s['count']:>8}{s['mean_ms']:>10.2f}{s['p50_ms']:>9.2f}"
+                         f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        if extra:
+            lines.append("")
+            lines.extend(f"{key}: {value}" for key, value in extra.items())
+        return "\n".join(lines)
+
+    def dump(self, path, extra=None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(extra), f, indent=2)
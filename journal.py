@@ -0,0 +1,379 @@
+"""Append-only journal of focus intervals, compacted periodically into the JSON snapshot.
+
+Rewriting the whole save file every SAVE_TIME seconds costs I/O proportional to the
+total history. Instead, new activity is buffered in memory and appended to a journal
+as small JSON lines; every so often the full state is written as a snapshot (the
+usual window_times.json) and the journal starts over.
+
+Journal layout: the first line is a header {"gen": n}; every following line is one
+record:
+    {"w": canonical, "s": start, "e": end}   focus interval credited to canonical
+    {"afk": seconds}                          time counted as AFK
+    {"o": canonical, "t": original}           representative original title
+    {"p": canonical, "n": process}            executable canonical was seen in
+    {"fold": canonical, "g": group}           canonical's time moved into group's rollup (retention)
+
+The snapshot stores "journal_gen". A journal whose gen is not newer than that has
+already been folded into the snapshot and is ignored on load, so a crash between
+writing the snapshot and resetting the journal cannot double count.
+"""
+import json
+import os
+
+
+def write_temp(path, data):
+    """Write `data` (str or bytes) to a temp file next to `path` and return the temp file's path."""
+    tmp = path + ".tmp"
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def write_atomic(path, data):
+    """Write `data` (str or bytes) to a temp file next to `path`, then rename it over `path`."""
+    os.replace(write_temp(path, data), path)
+
+
+def read_journal(path):
+    """Return (gen, records) from a journal file. Unparseable lines (e.g. a torn last write) are skipped."""
+    gen = 0
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if i == 0 and "gen" in rec:
+                    gen = int(rec["gen"])
+                else:
+                    records.append(rec)
+    except FileNotFoundError:
+        pass
+    return gen, records
+
+
+def read_records(path, offset=0):
+    """(gen, records, end) for the complete lines of a journal from byte `offset` on, without touching the file.
+
+    `end` is the offset just after the last complete line, so a later call can pick
+    up from there once more has been appended (a line still being written is left
+    for then). Offset 0 includes the header.
+    """
+    gen = 0
+    records = []
+    end = offset
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return gen, records, end
+    complete = data.rfind(b"\n") + 1
+    end = offset + complete
+    for i, line in enumerate(data[:complete].splitlines()):
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if i == 0 and offset == 0 and "gen" in rec:
+            gen = int(rec["gen"])
+        else:
+            records.append(rec)
+    return gen, records, end
+
+
+def apply_records(data, records, touched=None):
+    """Apply journal records to a plain snapshot payload (see persistence.read_snapshot), as Journal.replay does.
+
+    touched: optional set that collects every title the records mention.
+    """
+    times, last_seen = data["window_times"], data["last_seen"]
+    for rec in records:
+        if "w" in rec:
+            key, end = rec["w"], float(rec["e"])
+            touched is not None and touched.add(key)
+            times[key] = times.get(key, 0.0) + end - float(rec["s"])
+            if end > last_seen.get(key, 0.0):
+                last_seen[key] = end
+        elif "afk" in rec:
+            data["AFK_time"] += float(rec["afk"])
+        elif "o" in rec:
+            touched is not None and touched.add(rec["o"])
+            data["window_original_titles"][rec["o"]] = rec["t"]
+        elif "p" in rec:
+            touched is not None and touched.add(rec["p"])
+            data["window_processes"][rec["p"]] = rec["n"]
+        elif "fold" in rec:
+            key = rec["fold"]
+            touched is not None and touched.add(key)
+            seconds = times.pop(key, None)
+            data["window_original_titles"].pop(key, None)
+            if seconds is not None:
+                rollup = data["rollups"].setdefault(rec["g"], [0.0, 0])
+                rollup[0] += seconds
+                rollup[1] += 1
+
+
+def has_records(path):
+    """True if the journal holds anything after its header line (False if it is missing)."""
+    try:
+        with open(path, "rb") as f:
+            f.readline()
+            return any(line.strip() for line in f)
+    except OSError:
+        return False
+
+
+def read_gen(path):
+    """Just the journal's generation (0 if missing or unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.loads(f.readline()).get("gen", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Journal:
+    """Buffers focus intervals/AFK time/titles and appends them to `path` on flush().
+
+    flush() and compact() can also be split into a capture step taken under the
+    tracker lock (take_pending/begin_compact) and a write step run elsewhere
+    (append/write_snapshot), which is how the background writer uses them.
+
+    Nothing is lost to a failed write: lines append() couldn't write are kept and
+    go out first with the next append. A compaction appends the records it took to
+    the current journal before writing the snapshot, and only retires the journal
+    (new generation) once the snapshot is on disk; if it can't be written, the
+    journal simply carries on.
+
+    compact_min_bytes: never compact before the journal reaches this size.
+    Past that, compaction happens once the journal is half the size of what a compaction
+    rewrites (snapshot_bytes: the snapshot plus the files written alongside it), so the
+    amortized cost of rewriting them stays proportional to new activity.
+    """
+
+    def __init__(self, path, compact_min_bytes=256 * 1024):
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        self.gen = 1  # generation of the journal file on disk
+        self._claimed_gen = 0  # highest generation handed out by begin_compact
+        self._compacting = 0  # compactions captured but not yet written or aborted
+        self._unwritten = []  # lines a failed append() left behind, written ahead of the next ones
+        self.journal_bytes = 0
+        self.snapshot_bytes = 0
+        self.bytes_written = 0  # lifetime, journal + snapshots
+        self._intervals = []  # [canonical, start, end], adjacent intervals coalesced
+        self._afk = 0.0
+        self._titles = {}
+        self._processes = {}
+        self._folds = []  # [canonical, group]
+
+    # region recording
+    def record_interval(self, canonical, start, end):
+        last = self._intervals[-1] if self._intervals else None
+        if last is not None and last[0] == canonical and last[2] == start:
+            last[2] = end
+        else:
+            self._intervals.append([canonical, start, end])
+
+    def record_afk(self, seconds):
+        self._afk += seconds
+
+    def record_title(self, canonical, original):
+        self._titles[canonical] = original
+
+    def record_process(self, canonical, process):
+        self._processes[canonical] = process
+
+    def record_fold(self, canonical, group):
+        self._folds.append([canonical, group])
+
+    def has_pending(self):
+        return bool(self._intervals or self._afk or self._titles or self._processes or self._folds
+                    or self._unwritten)
+    # endregion
+
+    def replay(self, snapshot_gen, window_times, window_original_titles, rollups=None, last_seen=None,
+               intervals=None, processes=None):
+        """Apply journal records newer than the snapshot. Returns AFK seconds to add.
+
+        rollups: group -> [seconds, entries] that fold records add to.
+        last_seen: optional callable(canonical, end) told about every replayed interval.
+        intervals: optional callable(canonical, start, end), likewise. It also gets the
+            intervals of a journal the snapshot already covers (for history kept
+            separately, like the buckets, that may be older than the snapshot).
+        processes: optional callable(canonical, process) for process records.
+        Also positions this journal to continue appending after what was replayed.
+        """
+        gen, records = read_journal(self.path)
+        afk = 0.0
+        if gen > snapshot_gen:
+            for rec in records:
+                if "w" in rec:
+                    window_times[rec["w"]] += float(rec["e"]) - float(rec["s"])
+                    if last_seen is not None:
+                        last_seen(rec["w"], float(rec["e"]))
+                    if intervals is not None:
+                        intervals(rec["w"], float(rec["s"]), float(rec["e"]))
+                elif "afk" in rec:
+                    afk += float(rec["afk"])
+                elif "o" in rec:
+                    window_original_titles[rec["o"]] = rec["t"]
+                elif "p" in rec:
+                    if processes is not None:
+                        processes(rec["p"], rec["n"])
+                elif "fold" in rec:
+                    seconds = window_times.pop(rec["fold"], None)
+                    window_original_titles.pop(rec["fold"], None)
+                    if seconds is not None and rollups is not None:
+                        rollup = rollups.setdefault(rec["g"], [0.0, 0])
+                        rollup[0] += seconds
+                        rollup[1] += 1
+            self.gen = gen
+            self.journal_bytes = os.path.getsize(self.path)
+            self._terminate_torn_line()
+        else:
+            # stale or missing journal: everything in it is already in the snapshot
+            if intervals is not None:
+                for rec in records:
+                    if "w" in rec:
+                        intervals(rec["w"], float(rec["s"]), float(rec["e"]))
+            self.gen = snapshot_gen + 1
+            self._reset_file()
+        return afk
+
+    def take_pending(self):
+        """Remove and return the buffered records as JSON lines (None if there are none).
+
+        Callers hold the tracker lock for this; writing the lines with append() can
+        happen later on another thread.
+        """
+        if not self.has_pending():
+            return None
+        lines = []
+        # folds only ever hit titles unseen for a long time, so none of the buffered records precede them
+        for canonical, group in self._folds:
+            lines.append(json.dumps({"fold": canonical, "g": group}, ensure_ascii=False))
+        for canonical, original in self._titles.items():
+            lines.append(json.dumps({"o": canonical, "t": original}, ensure_ascii=False))
+        for canonical, process in self._processes.items():
+            lines.append(json.dumps({"p": canonical, "n": process}, ensure_ascii=False))
+        for canonical, start, end in self._intervals:
+            lines.append(json.dumps({"w": canonical, "s": round(start, 3), "e": round(end, 3)}, ensure_ascii=False))
+        if self._afk:
+            lines.append(json.dumps({"afk": round(self._afk, 3)}))
+        self._clear_pending()
+        return lines
+
+    def append(self, lines):
+        """Append lines from take_pending() to the journal file. Returns bytes written.
+
+        If the write fails the lines are kept (and the error raised); the next append
+        writes them first.
+        """
+        lines = self._unwritten + (lines or [])
+        if not lines:
+            return 0
+        self._unwritten = []
+        data = "\n".join(lines) + "\n"
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except Exception:
+            self._unwritten = lines
+            raise
+        written = len(data.encode("utf-8"))
+        self.journal_bytes += written
+        self.bytes_written += written
+        return written
+
+    def flush(self):
+        """Append buffered records to the journal. Returns bytes written."""
+        return self.append(self.take_pending())
+
+    def needs_compaction(self):
+        # not while a compaction is on its way to disk
+        return not self._compacting and self.journal_bytes >= max(self.compact_min_bytes, self.snapshot_bytes // 2)
+
+    def begin_compact(self):
+        """Start a compaction: claim a generation and take the buffered records. Returns (gen, lines).
+
+        Call with the tracker lock held, at the same moment the snapshot payload is
+        taken (it reflects the records). Then append(lines) and write the snapshot for
+        `gen`; commit_compact() once it is on disk, abort_compact() if it can't be written.
+        write_snapshot() does all of that.
+        """
+        self._claimed_gen = gen = max(self.gen, self._claimed_gen + 1)
+        self._compacting += 1
+        return gen, self.take_pending() or []
+
+    @staticmethod
+    def encode_snapshot(payload, gen, encode=None):
+        """The snapshot file's bytes for `gen`. encode(payload) -> bytes picks the format; JSON when None."""
+        payload = dict(payload, journal_gen=gen)
+        return encode(payload) if encode is not None else json.dumps(payload, indent=2).encode("utf-8")
+
+    def commit_compact(self, gen, snapshot_bytes):
+        """The snapshot for `gen` is on disk: start the journal for gen + 1.
+
+        snapshot_bytes: everything the compaction wrote, which sets the next threshold.
+        """
+        self._compacting -= 1
+        self.gen = gen + 1
+        self._unwritten = []  # the snapshot has them
+        self.snapshot_bytes = snapshot_bytes
+        self.bytes_written += snapshot_bytes
+        self._reset_file(self.gen)
+
+    def abort_compact(self):
+        """The snapshot couldn't be written: keep journaling into the current generation."""
+        self._compacting -= 1
+
+    def write_snapshot(self, snapshot_path, payload, gen, lines=(), encode=None):
+        """Write the snapshot for `gen` atomically and start the journal for gen + 1. Returns bytes written.
+
+        `lines` are the records begin_compact() took. They are appended to the current
+        journal first, so they are on disk whether or not the snapshot gets written.
+        """
+        try:
+            self.append(list(lines))
+            data = self.encode_snapshot(payload, gen, encode)
+            write_atomic(snapshot_path, data)
+        except Exception:
+            self.abort_compact()
+            raise
+        self.commit_compact(gen, len(data))
+        return len(data)
+
+    def compact(self, snapshot_path, payload, encode=None):
+        """Write `payload` (full state, including everything journaled so far) as the snapshot and start a new journal.
+
+        Returns bytes written.
+        """
+        gen, lines = self.begin_compact()
+        return self.write_snapshot(snapshot_path, payload, gen, lines, encode)
+
+    def _clear_pending(self):
+        self._intervals.clear()
+        self._titles.clear()
+        self._processes.clear()
+        self._folds.clear()
+        self._afk = 0.0
+
+    def _reset_file(self, gen=None):
+        header = json.dumps({"gen": self.gen if gen is None else gen}) + "\n"
+        write_atomic(self.path, header)
+        self.journal_bytes = len(header)
+
+    def _terminate_torn_line(self):
+        """Make sure the next append starts on a fresh line even if the last write was cut short."""
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() and (f.seek(-1, os.SEEK_END), f.read(1))[1] != b"\n":
+                f.write(b"\n")
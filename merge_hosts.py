@@ -0,0 +1,310 @@
+"""Merge TimeKeeper data from several machines into one combined snapshot.
+
+Every workstation keeps its own snapshot (window_times.json / .tksnap) and journal.
+Sync or copy each machine's data folder somewhere readable (one directory per
+host, no network service involved) and run
+
+    python merge_hosts.py hostA/ hostB/ ... --output combined/
+
+combined/window_times.tksnap (or .json with --format json) is an ordinary snapshot.
+How the hosts are combined:
+  window_times, AFK_time, rollups  summed
+  window_original_titles           the shortest original any host saw (the tracker's own rule), ties alphabetical
+  last_seen                        the latest; a title's process comes from the host that saw it last
+  reset_date                       the earliest
+
+Merges are incremental. The combined snapshot remembers, per host, which snapshot
+file it last read (size and mtime) and how far into the journal it got, and
+combined/hosts/ keeps what each host contributed. An unchanged host costs a couple
+of stat() calls. A host whose journal grew is read from the old offset on. A host
+that rewrote its snapshot (compaction) is read in full, and its old contribution is
+swapped for the new one. Changed hosts are read on a process pool. The parent only
+applies each host's differences to the combined totals.
+
+    python merge_hosts.py hostA/ hostB/ --output combined/ --watch 60   # merge again every minute
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import binary_snapshot
+from journal import apply_records, read_gen, read_records, write_atomic
+from persistence import SNAPSHOT_FORMATS, read_snapshot
+
+STATE_KEY = "merge_state"  # per-host progress, stored in the combined snapshot itself
+
+
+def _fingerprint(path):
+    """[name, size, mtime_ns] of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.basename(path), st.st_size, st.st_mtime_ns]
+
+
+def find_snapshot(directory, name="window_times"):
+    """The newer of a host's binary and JSON snapshots, or None."""
+    paths = [p for p in (os.path.join(directory, name + ".tksnap"), os.path.join(directory, name + ".json"))
+             if os.path.exists(p)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def _empty():
+    return {"window_times": {}, "window_original_titles": {}, "last_seen": {}, "window_processes": {},
+            "AFK_time": 0.0, "reset_date": None, "rollups": {}}
+
+
+def _diff(old, new, keys):
+    """What changed between two versions of a host's data, limited to `keys` (titles)."""
+    old_times, new_times = old["window_times"], new["window_times"]
+    times = {}
+    removed = []
+    for key in keys:
+        before, after = old_times.get(key), new_times.get(key)
+        if after is None:
+            if before is not None:
+                times[key] = -before
+                removed.append(key)
+        elif after != before:
+            times[key] = after - (before or 0.0)
+    rollups = {}
+    for group in old["rollups"].keys() | new["rollups"].keys():
+        seconds, count = new["rollups"].get(group, (0.0, 0))
+        old_seconds, old_count = old["rollups"].get(group, (0.0, 0))
+        if seconds != old_seconds or count != old_count:
+            rollups[group] = [seconds - old_seconds, count - old_count]
+    originals, last_seen, processes = new["window_original_titles"], new["last_seen"], new["window_processes"]
+    return {
+        "times": times,
+        "removed": removed,
+        "afk": new["AFK_time"] - old["AFK_time"],
+        "rollups": rollups,
+        "originals": {k: originals[k] for k in keys if k in originals},
+        "last_seen": {k: last_seen[k] for k in keys if k in last_seen},
+        "processes": {k: processes[k] for k in keys if k in processes},
+        "reset_date": new["reset_date"],
+    }
+
+
+def _read_host(snapshot, journal):
+    """A host's current data: its snapshot plus any newer journal. Returns (data, gen, offset)."""
+    data = read_snapshot(snapshot) if snapshot is not None else _empty()
+    gen, records, offset = read_records(journal)
+    if gen > data.get("journal_gen", 0):
+        apply_records(data, records, set())
+    return data, gen, offset
+
+
+def update_host(directory, name, cache_dir, known):
+    """Bring one host's contribution up to date. Runs in a worker process.
+
+    known: this host's entry from the last merge state (None for a new host).
+    Returns (state, diff, note): the host's new state entry, the changes to apply to
+    the combined totals and a one-line description.
+    """
+    snapshot = find_snapshot(directory, name)
+    journal = os.path.join(directory, name + ".journal")
+    snapshot_fp = _fingerprint(snapshot) if snapshot else None
+    if known is None:
+        old = _empty()
+    else:
+        cache = os.path.join(cache_dir, known["cache"])
+        if not os.path.exists(cache):
+            # without it there is no telling what this host already added to the totals
+            raise FileNotFoundError(f"{cache} is missing; merge again with --rebuild")
+        old = read_snapshot(cache)
+
+    incremental = known is not None and known["snapshot"] == snapshot_fp and read_gen(journal) == known["gen"]
+    if incremental:
+        gen = known["gen"]
+        _, records, offset = read_records(journal, known["offset"])
+        touched = set()
+        new = {k: (dict(v) if isinstance(v, dict) else v) for k, v in old.items()}
+        new["rollups"] = {g: list(r) for g, r in old["rollups"].items()}
+        apply_records(new, records, touched)
+        diff = _diff(old, new, touched)
+        note = f"journal +{len(records)} records"
+    else:
+        new, gen, offset = _read_host(snapshot, journal)
+        diff = _diff(old, new, old["window_times"].keys() | new["window_times"].keys())
+        note = "read in full" if known is None else "snapshot rewritten, read in full"
+
+    # a new cache file each time: the old one stays valid until the combined snapshot points here
+    host_id = hashlib.sha1(os.path.abspath(directory).encode("utf-8")).hexdigest()[:12]
+    cache = f"{os.path.basename(os.path.normpath(directory))}-{host_id}.{time.time_ns()}.tksnap"
+    write_atomic(os.path.join(cache_dir, cache), binary_snapshot.encode(new))
+    state = {"snapshot": snapshot_fp, "journal": _fingerprint(journal), "gen": gen, "offset": offset, "cache": cache}
+    return state, diff, note
+
+
+class HostMerger:
+    """Combined totals over several hosts' data directories, kept in `output`.
+
+    jobs: worker processes for reading changed hosts (None: one per CPU).
+    """
+
+    def __init__(self, output, name="window_times", snapshot_format="binary", jobs=None):
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"snapshot_format must be one of {SNAPSHOT_FORMATS}")
+        self.output = output
+        self.name = name
+        self.snapshot_format = snapshot_format
+        self.jobs = jobs
+        self.cache_dir = os.path.join(output, "hosts")
+        extension = ".tksnap" if snapshot_format == "binary" else ".json"
+        self.combined_file = os.path.join(output, name + extension)
+        self.data = _empty()
+        self.hosts = {}  # absolute host directory -> state entry (see update_host)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load()
+
+    def load(self):
+        """Pick up the combined snapshot left by an earlier merge, in either format."""
+        path = find_snapshot(self.output, self.name)
+        if path is None:
+            return
+        try:
+            data = read_snapshot(path)
+        except Exception as e:
+            print("Error loading combined snapshot:", e)
+            return
+        self.hosts = data.pop(STATE_KEY, {})
+        self.data = {key: data.get(key, value) for key, value in _empty().items()}
+
+    def reset(self):
+        """Start over: the next merge reads every host in full (and then removes the old host caches)."""
+        self.data = _empty()
+        self.hosts = {}
+
+    def _changed(self, directory):
+        """True if a host's files may have changed since it was last merged."""
+        known = self.hosts.get(directory)
+        if known is None:
+            return True
+        snapshot = find_snapshot(directory, self.name)
+        return (known["snapshot"] != (_fingerprint(snapshot) if snapshot else None)
+                or known["journal"] != _fingerprint(os.path.join(directory, self.name + ".journal")))
+
+    def merge(self, directories):
+        """Merge the hosts in `directories` into the combined totals and save them. Returns a report dict."""
+        start = time.perf_counter()
+        directories = [os.path.abspath(d) for d in directories]
+        changed = [d for d in directories if self._changed(d)]
+        notes = {}
+        results = []
+        if len(changed) > 1 and self.jobs != 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                futures = [(d, pool.submit(update_host, d, self.name, self.cache_dir, self.hosts.get(d)))
+                           for d in changed]
+                for directory, future in futures:
+                    try:
+                        results.append((directory, future.result()))
+                    except Exception as e:
+                        notes[directory] = f"error: {e}"
+        else:
+            for directory in changed:
+                try:
+                    results.append((directory, update_host(directory, self.name, self.cache_dir,
+                                                           self.hosts.get(directory))))
+                except Exception as e:
+                    notes[directory] = f"error: {e}"
+
+        for directory, (state, diff, note) in results:
+            self._apply(diff)
+            self.hosts[directory] = state
+            notes[directory] = note
+        if results:
+            self.save()
+            self._remove_unused_caches()
+        for directory in directories:
+            notes.setdefault(directory, "unchanged")
+        return {"hosts": len(directories), "changed": len(results), "notes": notes,
+                "titles": len(self.data["window_times"]), "seconds": sum(self.data["window_times"].values()),
+                "elapsed": time.perf_counter() - start}
+
+    def _remove_unused_caches(self):
+        """Delete host caches the saved merge state no longer points to (replaced ones, all old ones after reset())."""
+        used = {state["cache"] for state in self.hosts.values()}
+        for entry in os.listdir(self.cache_dir):
+            if entry.endswith(".tksnap") and entry not in used:
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry))
+                except OSError:
+                    pass
+
+    def _apply(self, diff):
+        data = self.data
+        times, originals = data["window_times"], data["window_original_titles"]
+        last_seen, processes = data["last_seen"], data["window_processes"]
+        for key, delta in diff["times"].items():
+            times[key] = times.get(key, 0.0) + delta
+        for key in diff["removed"]:
+            # gone from this host; keep it only if other hosts still have time on it
+            if times.get(key, 0.0) <= 1e-6:
+                times.pop(key, None)
+                originals.pop(key, None)
+                last_seen.pop(key, None)
+                processes.pop(key, None)
+        for key, original in diff["originals"].items():
+            current = originals.get(key)
+            if key in times and (current is None or (len(original), original) < (len(current), current)):
+                originals[key] = original
+        for key, seen in diff["last_seen"].items():
+            if key in times and seen >= last_seen.get(key, 0.0):
+                last_seen[key] = seen
+                if key in diff["processes"]:
+                    processes[key] = diff["processes"][key]
+        for key, process in diff["processes"].items():
+            if key in times:
+                processes.setdefault(key, process)
+        data["AFK_time"] += diff["afk"]
+        for group, (seconds, count) in diff["rollups"].items():
+            rollup = data["rollups"].setdefault(group, [0.0, 0])
+            rollup[0] += seconds
+            rollup[1] += count
+            if rollup[1] <= 0:
+                del data["rollups"][group]
+        reset_date = diff["reset_date"]
+        if reset_date and (data["reset_date"] is None or reset_date < data["reset_date"]):
+            data["reset_date"] = reset_date
+
+    def save(self):
+        payload = dict(self.data, journal_gen=0)
+        payload[STATE_KEY] = self.hosts
+        if self.snapshot_format == "binary":
+            write_atomic(self.combined_file, binary_snapshot.encode(payload))
+        else:
+            write_atomic(self.combined_file, json.dumps(payload, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge several machines' TimeKeeper data into one snapshot.")
+    parser.add_argument("hosts", nargs="+", help="one data directory per host")
+    parser.add_argument("--output", required=True, help="directory for the combined snapshot and merge state")
+    parser.add_argument("--name", default="window_times", help="base name of the snapshot/journal files")
+    parser.add_argument("--format", choices=SNAPSHOT_FORMATS, default="binary", help="combined snapshot format")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--watch", type=float, default=0, help="merge again every this many seconds")
+    parser.add_argument("--rebuild", action="store_true", help="forget earlier merges, read every host in full and remove the old host caches")
+    args = parser.parse_args(argv)
+
+    merger = HostMerger(args.output, args.name, args.format, args.jobs)
+    if args.rebuild:
+        merger.reset()
+    while True:
+        report = merger.merge(args.hosts)
+        for directory, note in report["notes"].items():
+            print(f"{directory}: {note}")
+        print(f"{report['changed']} of {report['hosts']} hosts changed; {report['titles']} titles, "
+              f"{report['seconds'] / 3600:.1f} h total; merged in {report['elapsed']:.2f} s")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""Loading and saving a Tracker's state: snapshot plus append-only journal.
+
+The snapshot is either JSON (window_times.json) or the binary, memory-mapped
+format from binary_snapshot (window_times.tksnap). Loading a binary snapshot maps
+the file and bulk-copies the duration and last-seen columns; original titles stay
+in the map and are decoded only when asked for. A snapshot found in the other
+format is loaded and then migrated on the next write.
+
+Saving is split in two: capturing what to write (under the tracker lock, cheap:
+buffered journal records, history rows and, when compacting, a copy of the state)
+and writing it (serialization and disk I/O). With background=True the writing
+happens on a BackgroundWriter thread, so ticks and the UI never wait on the disk.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import binary_snapshot
+from journal import Journal, write_atomic, write_temp, read_gen
+
+SNAPSHOT_FORMATS = ("binary", "json")
+
+
+def read_snapshot(path):
+    """A snapshot file of either format as a plain payload dict, without a Tracker.
+
+    Keys: window_times, window_original_titles, last_seen, window_processes (only
+    where known), AFK_time, reset_date, rollups and journal_gen.
+    """
+    if binary_snapshot.is_binary_snapshot(path):
+        snap = binary_snapshot.BinarySnapshot(path)
+        try:
+            titles = snap.titles()
+            durations, last_seen = snap.durations, snap.last_seen
+            originals = {}
+            for i, title in enumerate(titles):
+                original = snap.original(i)
+                if original != title:
+                    originals[title] = original
+            processes = {}
+            if snap.processes is not None:
+                for i, pid in enumerate(snap.processes):
+                    if pid >= 0:
+                        processes[titles[i]] = snap.process_names[pid]
+            data = dict(snap.meta)
+            data.pop("processes", None)  # names for the column, now in window_processes
+            data["window_times"] = {title: durations[i] for i, title in enumerate(titles)}
+            data["last_seen"] = {title: last_seen[i] for i, title in enumerate(titles)}
+            data["window_original_titles"] = originals
+            data["window_processes"] = processes
+        finally:
+            snap.close()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["window_times"] = {k: float(v) for k, v in data.get("window_times", {}).items()}
+        data.setdefault("window_original_titles", {})
+        data.setdefault("last_seen", {})
+        data.setdefault("window_processes", {})
+    data["AFK_time"] = float(data.get("AFK_time", 0.0))
+    data.setdefault("rollups", {})
+    data["journal_gen"] = int(data.get("journal_gen", 0))
+    return data
+
+
+class BackgroundWriter:
+    """Runs write jobs one at a time, in submission order, on a daemon thread.
+
+    A job is a callable returning the number of bytes it wrote. stats() reports
+    how long jobs took and how much they wrote.
+    """
+
+    def __init__(self, name="writer"):
+        self._queue = queue.Queue()
+        self.jobs = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.last_bytes = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        self._queue.put(job)
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def drain(self):
+        """Block until everything submitted so far has been written."""
+        self._queue.join()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    written = job() or 0
+                except Exception as e:
+                    self.errors += 1
+                    print("Error saving:", e)
+                    continue
+                elapsed = time.perf_counter() - start
+                self.jobs += 1
+                self.last_bytes = written
+                self.bytes_written += written
+                self.last_latency = elapsed
+                self.total_latency += elapsed
+                self.max_latency = max(self.max_latency, elapsed)
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        return {
+            "jobs": self.jobs,
+            "pending": self.pending(),
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "last_bytes": self.last_bytes,
+            "last_ms": self.last_latency * 1000,
+            "mean_ms": self.total_latency / self.jobs * 1000 if self.jobs else 0.0,
+            "max_ms": self.max_latency * 1000,
+        }
+
+
+class TrackerStore:
+    """Persists `tracker` to `save_file` (snapshot) and `journal_file` (activity since the snapshot).
+
+    background: write on a BackgroundWriter thread instead of in the caller.
+    snapshot_format: "json" (save_file) or "binary" (snapshot in save_file with a .tksnap extension).
+    """
+
+    def __init__(self, tracker, save_file, journal_file, background=False, snapshot_format="json"):
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"snapshot_format must be one of {SNAPSHOT_FORMATS}")
+        self.tracker = tracker
+        self.json_file = save_file
+        self.binary_file = os.path.splitext(save_file)[0] + ".tksnap"
+        # hourly/daily/monthly buckets, rewritten along with the snapshot (same journal_gen)
+        self.buckets_file = os.path.splitext(save_file)[0] + ".buckets.json"
+        # JSON snapshots can't be read partially: their totals also go here, for the first paint (read_totals)
+        self.totals_file = os.path.splitext(save_file)[0] + ".totals.json"
+        self.snapshot_format = snapshot_format
+        self.save_file = self.binary_file if snapshot_format == "binary" else self.json_file
+        self._encode = binary_snapshot.encode if snapshot_format == "binary" else None
+        self._snapshot = None  # mapped BinarySnapshot still serving original titles
+        self._migrate_from = None  # snapshot in the other format, removed once ours is written
+        self._loaded = False
+        # New activity is appended here each save; save_file is only rewritten on compaction
+        self.journal = Journal(journal_file)
+        tracker.journal = self.journal
+        self.writer = BackgroundWriter() if background else None
+        self.saves = 0
+        self.skipped = 0  # saves with nothing new to write
+        self.last_capture = 0.0  # seconds the last save held the tracker lock
+        self.last_error = None  # message of the last failed write, None once a write succeeds again (for the UI)
+        self._buckets_stale = False  # the last compaction couldn't replace the buckets file; the next save redoes it
+        self._snapshot_missing = False  # load() found no snapshot: the next save writes one, not just the journal
+
+    def set_format(self, snapshot_format):
+        """Switch snapshot format. After load() the snapshot is rewritten in the new format right away."""
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"snapshot_format must be one of {SNAPSHOT_FORMATS}")
+        if snapshot_format == self.snapshot_format:
+            return
+        old_file = self.save_file
+        self.snapshot_format = snapshot_format
+        self.save_file = self.binary_file if snapshot_format == "binary" else self.json_file
+        self._encode = binary_snapshot.encode if snapshot_format == "binary" else None
+        if self._loaded:
+            if os.path.exists(old_file):
+                self._migrate_from = old_file
+            self.compact()
+
+    def snapshot_payload(self):
+        t = self.tracker
+        # the file behind a mapped snapshot is about to be replaced: take what's still in it first
+        self._release_snapshot()
+        a = t.aggregates
+        processes = {}
+        for k in t.window_times:
+            process = t.titles.process_of(k)
+            if process:
+                processes[k] = process
+        return {
+            "window_times": dict(t.window_times.items()),
+            "AFK_time": t.AFK_time,
+            "reset_date": t.reset_date,
+            "window_original_titles": dict(t.window_original_titles),
+            "rollups": {group: list(rollup) for group, rollup in t.rollups.items()},
+            # whole seconds are plenty for retention ages
+            "last_seen": {k: int(t.titles.last_seen(k)) for k in t.window_times},
+            "window_processes": processes,
+            # what the window needs before the titles are loaded (see read_totals)
+            "totals": {"total": a.total, "insignificant_total": a.insignificant_total,
+                       "insignificant_count": a.insignificant_count,
+                       "group_totals": dict(a.group_totals), "group_counts": dict(a.group_counts)},
+        }
+
+    def read_totals(self):
+        """Totals, entry count, AFK time and reset date as of the last snapshot, without loading it; None if unavailable.
+
+        A binary snapshot has them in its meta block (a few KB at the start of the file),
+        if the writer stored totals (merge_hosts' combined snapshots don't); a JSON
+        snapshot in the small totals_file written next to it.
+        """
+        try:
+            if self.snapshot_format == "binary" and binary_snapshot.is_binary_snapshot(self.binary_file):
+                meta = binary_snapshot.read_meta(self.binary_file)
+                return meta if "totals" in meta else None
+            if os.path.exists(self.totals_file):
+                with open(self.totals_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                return cached if "totals" in cached else None
+        except Exception as e:
+            print("Error reading snapshot totals:", e)
+        return None
+
+    @staticmethod
+    def _totals_record(payload, gen):
+        """What read_totals needs from a JSON snapshot's payload."""
+        return {"journal_gen": gen, "totals": payload["totals"], "count": len(payload["window_times"]),
+                "AFK_time": payload["AFK_time"], "reset_date": payload["reset_date"]}
+
+    def load(self):
+        t = self.tracker
+        snapshot_gen = 0
+        with t.lock:
+            # prefer the configured format; fall back to the other one and migrate it
+            other = self.json_file if self.save_file == self.binary_file else self.binary_file
+            for path in (self.save_file, other):
+                if not os.path.exists(path):
+                    continue
+                try:
+                    if binary_snapshot.is_binary_snapshot(path):
+                        snapshot_gen = self._load_binary(path)
+                    else:
+                        snapshot_gen = self._load_json(path)
+                    self.journal.snapshot_bytes = os.path.getsize(path)
+                    if path != self.save_file:
+                        self._migrate_from = path
+                except Exception as e:
+                    print("Error loading save file:", e)
+                break
+
+            buckets_gen = self._load_buckets()
+            # compactions rewrite these along with the snapshot (see _snapshot_job)
+            for path in (self.buckets_file, self.totals_file if self._encode is None else None):
+                if path is not None and os.path.exists(path):
+                    self.journal.snapshot_bytes += os.path.getsize(path)
+            # buckets older than the journal haven't seen its intervals yet (see _snapshot_job)
+            credit_buckets = t.buckets.credit if read_gen(self.journal.path) > buckets_gen else None
+
+            # replay whatever was journaled after the snapshot
+            try:
+                t.AFK_time += self.journal.replay(snapshot_gen, t.window_times, t.window_original_titles,
+                                                  t.rollups, t.titles.set_last_seen, credit_buckets,
+                                                  t.titles.set_process)
+            except Exception as e:
+                print("Error replaying journal:", e)
+            t.aggregates.rebuild()
+            self._loaded = True
+            # a new install would otherwise have only the journal until it reaches the compaction size
+            self._snapshot_missing = self._migrate_from is None and not os.path.exists(self.save_file)
+        if self._migrate_from is not None:
+            self.compact()
+
+    def _load_buckets(self):
+        """Load the bucketed history; returns its journal_gen (-1 if there is none)."""
+        if not os.path.exists(self.buckets_file):
+            return -1
+        try:
+            with open(self.buckets_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.tracker.buckets.load_json(data)
+            return int(data.get("journal_gen", 0))
+        except Exception as e:
+            print("Error loading history buckets:", e)
+            self.tracker.buckets.clear()
+            return -1
+
+    def _load_json(self, path):
+        t = self.tracker
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        wt = data.get("window_times", {})
+        # ensure numeric values
+        for k, v in wt.items():
+            t.window_times[k] = float(v)
+        self._load_meta(data)
+        t.window_original_titles.update(data.get("window_original_titles", {}))
+        for k, seen in data.get("last_seen", {}).items():
+            t.titles.set_last_seen(k, float(seen))
+        for k, process in data.get("window_processes", {}).items():
+            if k in t.window_times:
+                t.titles.set_process(k, process)
+        return int(data.get("journal_gen", 0))
+
+    def _load_binary(self, path):
+        t = self.tracker
+        snap = binary_snapshot.BinarySnapshot(path)
+        try:
+            titles = snap.titles()
+            processes = (snap.processes, snap.process_names) if snap.processes is not None else None
+            t.titles.load_times(titles, snap.copy_column(snap.durations), snap.copy_column(snap.last_seen), processes)
+        except Exception:
+            snap.close()
+            raise
+        self._load_meta(snap.meta)
+        if len(t.titles) == snap.count:
+            # IDs follow snapshot order, so an original can be looked up by ID until something overrides it
+            self._snapshot = snap
+            t.titles.original_fallback = self._snapshot_original
+        else:
+            # titles were already present and got merged: copy the originals now
+            for i, title in enumerate(titles):
+                original = snap.original(i)
+                if original != title:
+                    t.window_original_titles[title] = original
+            snap.close()
+        return int(snap.meta.get("journal_gen", 0))
+
+    def _load_meta(self, data):
+        t = self.tracker
+        t.AFK_time = float(data.get("AFK_time", 0.0))
+        t.reset_date = data.get("reset_date", t.reset_date)
+        for group, (seconds, count) in data.get("rollups", {}).items():
+            t.rollups[group] = [float(seconds), int(count)]
+
+    def _snapshot_original(self, tid, title):
+        snap = self._snapshot
+        if snap is None or tid >= snap.count or snap.title(tid) != title:
+            return None
+        return snap.original(tid)
+
+    def _release_snapshot(self):
+        """Copy originals still only in the mapped snapshot into memory and unmap it."""
+        snap = self._snapshot
+        if snap is None:
+            return
+        originals = self.tracker.window_original_titles
+        if self.tracker.titles.original_fallback is None:
+            snap_count = 0  # cleared since: nothing in the snapshot applies any more
+        else:
+            snap_count = snap.count
+        for tid in range(snap_count):
+            title = self.tracker.titles.title_of(tid)
+            if title is not None and title not in originals:
+                original = self._snapshot_original(tid, title)
+                if original is not None and title in self.tracker.window_times:
+                    originals[title] = original
+        self.tracker.titles.original_fallback = None
+        self._snapshot = None
+        snap.close()
+
+    def compact(self):
+        """Write the full snapshot now and start a fresh journal."""
+        with self.tracker.lock:
+            self._snapshot_missing = False
+            gen, lines = self.journal.begin_compact()
+            payload = self.snapshot_payload()
+            buckets = self.tracker.buckets.to_json()
+        self._write(self._snapshot_job(payload, buckets, gen, lines))
+
+    def _snapshot_job(self, payload, buckets, gen, lines):
+        migrate_from, self._migrate_from = self._migrate_from, None
+
+        def write():
+            # The records begin_compact() took go to the current journal first. Both files are then written
+            # to temp files; nothing else on disk changes until both are complete. Then the snapshot replaces
+            # the old one, then the buckets, and only then does the journal move on: a crash in between
+            # leaves buckets older than the journal, which load() credits it to.
+            temps = []
+            try:
+                self.journal.append(lines)
+                snapshot_data = self.journal.encode_snapshot(payload, gen, self._encode)
+                buckets_data = json.dumps(dict(buckets, journal_gen=gen)).encode("utf-8")
+                temps.append(write_temp(self.save_file, snapshot_data))
+                temps.append(write_temp(self.buckets_file, buckets_data))
+                written = len(snapshot_data) + len(buckets_data)
+                if self._encode is None:
+                    totals_data = json.dumps(self._totals_record(payload, gen)).encode("utf-8")
+                    temps.append(write_temp(self.totals_file, totals_data))
+                    written += len(totals_data)
+                os.replace(temps[0], self.save_file)
+            except Exception:
+                for tmp in temps:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+                self._migrate_from = self._migrate_from or migrate_from
+                self._snapshot_missing = not os.path.exists(self.save_file)
+                self.journal.abort_compact()
+                raise
+            try:
+                if len(temps) > 2:
+                    # only the first paint reads it, so it may trail the snapshot if this fails
+                    os.replace(temps[2], self.totals_file)
+                os.replace(temps[1], self.buckets_file)
+            except Exception:
+                # the snapshot is in place, so the journal moves on either way; the buckets file misses what the
+                # old journal held until the next save writes it again from memory
+                self._buckets_stale = True
+                raise
+            finally:
+                # all of it is rewritten by every compaction, so all of it sets the next threshold
+                self.journal.commit_compact(gen, written)
+            self._buckets_stale = False
+            if migrate_from is not None:
+                # keep the old file around, but out of the way of the next load
+                os.replace(migrate_from, migrate_from + ".migrated")
+            return written
+        return write
+
+    def save(self):
+        # Append new activity to the journal; fold it into a full snapshot only once it has grown enough
+        # (or right away if there is no snapshot yet)
+        t = self.tracker
+        start = time.perf_counter()
+        with t.lock:
+            history_db = t.history_db
+            history_rows = history_db.take_pending() if history_db is not None else None
+            if self.journal.needs_compaction() or self._buckets_stale or self._snapshot_missing:
+                self._snapshot_missing = False
+                gen, lines = self.journal.begin_compact()
+                payload = self.snapshot_payload()
+                buckets = t.buckets.to_json()
+            else:
+                gen = payload = buckets = None
+                lines = self.journal.take_pending()
+        self.last_capture = time.perf_counter() - start
+        self.saves += 1
+        # lines == [] still means a retry of lines an earlier append couldn't write
+        if payload is None and lines is None and not history_rows:
+            self.skipped += 1
+            return
+
+        snapshot = self._snapshot_job(payload, buckets, gen, lines) if payload is not None else None
+
+        def write():
+            try:
+                if snapshot is not None:
+                    return snapshot()
+                return self.journal.append(lines)
+            finally:
+                # batched insert of the intervals recorded since the last save, even if the journal write failed
+                if history_rows:
+                    try:
+                        history_db.write_rows(history_rows)
+                    except Exception as e:
+                        print("Error saving history:", e)
+        self._write(write)
+
+    def _write(self, job):
+        def tracked():
+            try:
+                written = job()
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_error = None
+            return written
+
+        if self.writer is not None:
+            self.writer.submit(tracked)
+            return
+        try:
+            tracked()
+        except Exception as e:
+            print("Error saving:", e)
+
+    def drain(self):
+        """Wait for queued writes to finish."""
+        if self.writer is not None:
+            self.writer.drain()
+
+    def close(self):
+        """Save what's left and stop the writer thread."""
+        self.save()
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        with self.tracker.lock:
+            self._release_snapshot()
+
+    def stats(self):
+        out = {"saves": self.saves, "skipped": self.skipped, "capture_ms": self.last_capture * 1000,
+               "journal_bytes": self.journal.journal_bytes, "snapshot_bytes": self.journal.snapshot_bytes,
+               "bytes_written": self.journal.bytes_written, "last_error": self.last_error}
+        if self.writer is not None:
+            out["writer"] = self.writer.stats()
+        return out
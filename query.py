@@ -0,0 +1,336 @@
+"""Answer questions about the saved data from scripts, without opening the window.
+
+    python query.py top 20                   # the 20 titles with the most time
+    python query.py top 10 --group Work
+    python query.py groups                   # per-group totals (rollups included)
+    python query.py find "Inbox"             # titles containing a string (--regex for a pattern)
+    python query.py range --period week      # this week, from the history buckets
+    python query.py range --start 2026-10-01 --end 2026-10-08
+    python query.py summary
+
+Add --json to any of them (before or after the command) for machine-readable output. The same queries are
+available from Python:
+
+    from query import TimeKeeperData
+    data = TimeKeeperData("window_times.json")
+    data.top(5)
+
+Only headless modules are imported here (no tkinter, win32 or display code), and
+nothing is read until a query needs it: `summary` answers from the binary
+snapshot's meta block when the journal has nothing newer, lifetime queries read the
+snapshot's title and duration columns (not the originals) plus the journal, and
+only the titles a query returns (or filters on) get classified. Range queries use
+the hourly/daily/monthly buckets and fall back to the interval database.
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import binary_snapshot
+from journal import apply_records, has_records, read_gen, read_records
+
+
+def format_seconds(seconds):
+    """Same format as the window: 45s, 12:05, 3:04:05."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}:{seconds % 60:02d}"
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class TimeKeeperData:
+    """Read-only queries over a TimeKeeper data folder (snapshot, journal, buckets, history).
+
+    save_file: the snapshot path as configured (SAVE_FILE); the .tksnap next to it is
+    used if it is newer. classifier: a classifier.Classifier (default: GROUP_RULES).
+    """
+
+    def __init__(self, save_file="window_times.json", journal_file=None, history_file=None, classifier=None):
+        base = os.path.splitext(save_file)[0]
+        candidates = [p for p in (base + ".tksnap", save_file) if os.path.exists(p)]
+        self.snapshot_file = max(candidates, key=os.path.getmtime) if candidates else None
+        self.journal_file = journal_file or base + ".journal"
+        self.buckets_file = base + ".buckets.json"
+        self.history_file = history_file or os.path.join(os.path.dirname(save_file), "timekeeper_history.sqlite3")
+        self._classifier = classifier
+        self._journal = None  # (gen, records)
+        self._data = None
+        self._buckets = None
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            from classifier import Classifier
+            self._classifier = Classifier()
+        return self._classifier
+
+    # region loading
+    def _journal_records(self):
+        if self._journal is None:
+            gen, records, _ = read_records(self.journal_file)
+            self._journal = (gen, records)
+        return self._journal
+
+    def _meta(self):
+        """The binary snapshot's meta block, or None for JSON (or no) snapshots."""
+        if self.snapshot_file is not None and binary_snapshot.is_binary_snapshot(self.snapshot_file):
+            return binary_snapshot.read_meta(self.snapshot_file)
+        return None
+
+    def load(self):
+        """Lifetime state as a plain payload dict (window_times, window_processes, AFK_time, rollups, ...).
+
+        A binary snapshot only has its title and duration columns decoded (and the
+        process column when a rule needs it); originals and last-seen times stay on disk.
+        """
+        if self._data is not None:
+            return self._data
+        data = {"window_times": {}, "window_original_titles": {}, "last_seen": {}, "window_processes": {},
+                "AFK_time": 0.0, "reset_date": None, "rollups": {}, "journal_gen": 0}
+        path = self.snapshot_file
+        if path is not None and binary_snapshot.is_binary_snapshot(path):
+            snap = binary_snapshot.BinarySnapshot(path)
+            try:
+                titles = snap.titles()
+                data["window_times"] = dict(zip(titles, snap.durations))
+                if snap.processes is not None and self.classifier.uses_process:
+                    names = snap.process_names
+                    data["window_processes"] = {titles[i]: names[pid] for i, pid in enumerate(snap.processes)
+                                                if pid >= 0}
+                meta = snap.meta
+            finally:
+                snap.close()
+            data["AFK_time"] = float(meta.get("AFK_time", 0.0))
+            data["reset_date"] = meta.get("reset_date")
+            data["rollups"] = {g: [float(s), int(c)] for g, (s, c) in meta.get("rollups", {}).items()}
+            data["journal_gen"] = int(meta.get("journal_gen", 0))
+        elif path is not None:
+            from persistence import read_snapshot
+            data = read_snapshot(path)
+        gen, records = self._journal_records()
+        if gen > data["journal_gen"]:
+            apply_records(data, records)
+        self._data = data
+        return data
+
+    def group_of(self, title):
+        return self.classifier.group_of(title, self.load()["window_processes"].get(title))
+
+    def buckets(self):
+        """The bucketed history with the journal's newer intervals credited, or None if there is none.
+
+        Without a buckets file (none saved yet) the journal's intervals are credited to an
+        empty history, as TrackerStore.load does.
+        """
+        if self._buckets is None:
+            from bucket_history import BucketHistory
+            gen, records = self._journal_records()
+            saved = None
+            if os.path.exists(self.buckets_file):
+                with open(self.buckets_file, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            elif not any("w" in rec for rec in records):
+                return None
+            buckets = BucketHistory(self.group_of, hour_days=0, day_days=0, month_count=0)
+            if saved is not None:
+                buckets.load_json(saved)
+            # same rule as TrackerStore.load: the buckets may already hold the journal's intervals
+            if saved is None or read_gen(self.journal_file) > int(saved.get("journal_gen", 0)):
+                for rec in records:
+                    if "w" in rec:
+                        buckets.credit(rec["w"], float(rec["s"]), float(rec["e"]))
+            self._buckets = buckets
+        return self._buckets
+    # endregion
+
+    # region queries
+    def _row(self, title, seconds):
+        group, display = self.classifier.classify(title, self.load()["window_processes"].get(title))
+        return {"title": title, "display": display, "group": group, "seconds": seconds}
+
+    def top(self, n=10, group=None):
+        """The `n` titles with the most lifetime time, largest first, optionally only those in `group`.
+
+        Rows are {"title", "display", "group", "seconds"}; only the returned titles
+        (or, with a group, the ones looked at) are classified.
+        """
+        times = self.load()["window_times"]
+        if group is None:
+            return [self._row(t, s) for t, s in heapq.nlargest(n, times.items(), key=lambda kv: kv[1])]
+        rows = []
+        for title, seconds in sorted(times.items(), key=lambda kv: kv[1], reverse=True):
+            if len(rows) >= n:
+                break
+            if self.group_of(title) == group:
+                rows.append(self._row(title, seconds))
+        return rows
+
+    def group_totals(self):
+        """{group: {"seconds": s, "count": titles}} over all titles plus rollups, largest first."""
+        data = self.load()
+        totals = {}
+        for title, seconds in data["window_times"].items():
+            entry = totals.setdefault(self.group_of(title), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+        for group, (seconds, count) in data["rollups"].items():
+            entry = totals.setdefault(group, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+        return {g: {"seconds": s, "count": c}
+                for g, (s, c) in sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)}
+
+    def find(self, pattern, regex=False, ignore_case=True, limit=None):
+        """Titles containing `pattern` (a regular expression with regex=True), largest first."""
+        flags = re.IGNORECASE if ignore_case else 0
+        matcher = re.compile(pattern if regex else re.escape(pattern), flags).search
+        found = [(t, s) for t, s in self.load()["window_times"].items() if matcher(t)]
+        found.sort(key=lambda kv: kv[1], reverse=True)
+        if limit is not None:
+            found = found[:limit]
+        return [self._row(t, s) for t, s in found]
+
+    def range_totals(self, start, end, top=10):
+        """Time credited between the `start` and `end` timestamps, or None without any history.
+
+        {"start", "end", "source": "buckets" | "history", "total", "groups": {group: s},
+         "top": [rows]}. Buckets have one-hour resolution; the interval database is exact.
+        """
+        buckets = self.buckets()
+        if buckets is not None:
+            groups = buckets.group_totals(start, end)
+            top_rows = [self._row(t, s) for t, _, s in buckets.top_titles(start, end, top)]
+            source = "buckets"
+        elif os.path.exists(self.history_file):
+            from history_db import HistoryDB
+            db = HistoryDB(self.history_file)
+            try:
+                groups = db.totals_by_group(start, end)
+                top_rows = [dict(self._row(t, s), group=g) for t, g, s in db.top_titles(start, end, top)]
+            finally:
+                db.close()
+            source = "history"
+        else:
+            return None
+        groups = dict(sorted(groups.items(), key=lambda kv: kv[1], reverse=True))
+        return {"start": start, "end": end, "source": source, "total": sum(groups.values()),
+                "groups": groups, "top": top_rows}
+
+    def summary(self):
+        """{"total", "afk", "reset_date", "titles", "snapshot"}: lifetime totals.
+
+        Straight from the binary snapshot's meta block when the journal has nothing newer.
+        """
+        meta = self._data is None and self._meta()
+        # a fresh journal (just its header) or one the snapshot already covers adds nothing
+        if meta and "totals" in meta and (not has_records(self.journal_file)
+                                          or read_gen(self.journal_file) <= int(meta.get("journal_gen", 0))):
+            total = meta["totals"]["total"]
+            return {"total": total, "afk": float(meta.get("AFK_time", 0.0)), "reset_date": meta.get("reset_date"),
+                    "titles": meta["count"], "snapshot": self.snapshot_file}
+        data = self.load()
+        total = sum(data["window_times"].values()) + sum(s for s, _ in data["rollups"].values())
+        return {"total": total, "afk": data["AFK_time"], "reset_date": data["reset_date"],
+                "titles": len(data["window_times"]), "snapshot": self.snapshot_file}
+    # endregion
+
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _print_rows(rows):
+    for row in rows:
+        print(f"{format_seconds(row['seconds']):>10}  {row['group']:<16} {row['display']}")
+
+
+def _common_options(default=None):
+    """The options every command takes, before or after the command name.
+
+    The subcommands' copies use default=SUPPRESS so they don't overwrite a value given before the command.
+    """
+    options = argparse.ArgumentParser(add_help=False, argument_default=default)
+    options.add_argument("--save-file", help="snapshot as configured (default window_times.json; "
+                                             "the .tksnap next to it is used if newer)")
+    options.add_argument("--journal", help="default: the .journal next to the snapshot")
+    options.add_argument("--history", help="interval history database (default: next to the snapshot)")
+    options.add_argument("--json", action="store_true", help="print JSON instead of text")
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query saved TimeKeeper data without opening the window.",
+                                     parents=[_common_options()])
+    common = [_common_options(argparse.SUPPRESS)]
+    commands = parser.add_subparsers(dest="command", required=True)
+    top = commands.add_parser("top", help="titles with the most time", parents=common)
+    top.add_argument("n", type=int, nargs="?", default=10)
+    top.add_argument("--group")
+    commands.add_parser("groups", help="per-group totals", parents=common)
+    find = commands.add_parser("find", help="titles matching a pattern", parents=common)
+    find.add_argument("pattern")
+    find.add_argument("--regex", action="store_true", help="treat the pattern as a regular expression")
+    find.add_argument("--case", action="store_true", help="match case")
+    find.add_argument("--limit", type=int)
+    span = commands.add_parser("range", help="totals for a time range (needs history buckets or RECORD_HISTORY)",
+                                  parents=common)
+    span.add_argument("--period", choices=("day", "week", "month"), default="day", help="the current day/week/month")
+    span.add_argument("--start", type=_timestamp, help="ISO date/time; overrides --period")
+    span.add_argument("--end", type=_timestamp, help="ISO date/time (default: now)")
+    span.add_argument("--top", type=int, default=10)
+    commands.add_parser("summary", help="lifetime total, AFK time and reset date", parents=common)
+    args = parser.parse_args(argv)
+
+    data = TimeKeeperData(args.save_file or "window_times.json", args.journal, args.history)
+    if args.command == "top":
+        result = data.top(args.n, args.group)
+    elif args.command == "groups":
+        result = data.group_totals()
+    elif args.command == "find":
+        result = data.find(args.pattern, args.regex, not args.case, args.limit)
+    elif args.command == "range":
+        if args.start is not None:
+            start, end = args.start, args.end if args.end is not None else time.time()
+        else:
+            from bucket_history import period_range
+            start, end = period_range(args.period)
+        result = data.range_totals(start, end, args.top)
+        if result is None:
+            print("No history: neither history buckets nor an interval database were found.", file=sys.stderr)
+            return 1
+    else:
+        result = data.summary()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif args.command in ("top", "find"):
+        _print_rows(result)
+    elif args.command == "groups":
+        for group, entry in result.items():
+            print(f"{format_seconds(entry['seconds']):>10}  {group:<16} ({entry['count']} titles)")
+    elif args.command == "range":
+        print(f"{datetime.fromtimestamp(result['start']):%Y-%m-%d %H:%M} - "
+              f"{datetime.fromtimestamp(result['end']):%Y-%m-%d %H:%M} ({result['source']}): "
+              f"{format_seconds(result['total'])}")
+        for group, seconds in result["groups"].items():
+            print(f"{format_seconds(seconds):>10}  {group}")
+        if result["top"]:
+            print("Top titles:")
+            _print_rows(result["top"])
+    else:
+        print(f"Total: {format_seconds(result['total'])} over {result['titles']} titles")
+        print(f"AFK: {format_seconds(result['afk'])}")
+        if result["reset_date"]:
+            print(f"Since: {result['reset_date']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Apply GROUP_RULES edits to the stored groups without reclassifying everything.
+
+Every tracked title's group is stored in the AggregateIndex (and its time in the
+history buckets is filed under it). When the rules change, the old answer was to
+rebuild: classify every title again, O(titles x rules). Reclassifier instead diffs
+the compiled rules (rules.changed_rules) and only looks at titles that one of the
+changed rules matches, then moves just the ones whose group actually changed.
+
+Finding those titles without a full pass is what TitleIndex is for: the tracked
+titles reversed and sorted, so the titles with a given suffix (what most rules are)
+are one bisect away. Prefix, substring and regex rules are checked with a single
+C-level scan per rule over the same list (str.endswith / str.__contains__ with the
+pattern reversed, and a regex's required literal as a prefilter); process rules use
+the title store's process column.
+
+Entries already folded into rollups keep the group they were folded under.
+"""
+import bisect
+import heapq
+import ntpath
+import re
+import time
+
+from rules import changed_rules, required_literal
+
+
+class TitleIndex:
+    """The keys of a title_store.TimesView, reversed and sorted.
+
+    Only the reversed copy is kept: suffixes are one bisect away, and prefix, substring
+    and regex lookups scan it (their patterns reversed instead of every title).
+
+    sync() catches up with the keys the view logged as added or removed since the
+    last call, and re-sorts from scratch after a clear or bulk load. The view hands
+    over a full log (on_full) instead of dropping it; a batch that size is merged in
+    with one pass over the index.
+    """
+
+    MERGE_AT = 64  # changes from which one merge pass beats inserting them one by one
+
+    def __init__(self, times):
+        self.times = times
+        self._resets = None
+        self._backward = []  # reversed titles
+        times.on_full = self.sync
+
+    def sync(self):
+        times = self.times
+        if self._resets != times.resets or times.changes is None:
+            times.changes = []
+            self._resets = times.resets
+            self._backward = sorted(title[::-1] for title in times)
+            return
+        changed, times.changes = times.changes, []
+        if len(changed) >= self.MERGE_AT:
+            self._merge(dict.fromkeys(changed))
+            return
+        backward = self._backward
+        for title in dict.fromkeys(changed):
+            key = title[::-1]
+            i = bisect.bisect_left(backward, key)
+            present = i < len(backward) and backward[i] == key
+            if title in times:
+                if not present:
+                    backward.insert(i, key)
+            elif present:
+                del backward[i]
+
+    def _merge(self, changed):
+        times = self.times
+        # anything changed is dropped first, then what is still tracked goes back in sorted
+        dropped = {title[::-1] for title in changed}
+        kept = [key for key in self._backward if key not in dropped] if dropped else self._backward
+        added = sorted(title[::-1] for title in changed if title in times)
+        self._backward = list(heapq.merge(kept, added))
+
+    def with_prefix(self, prefix):
+        reversed_prefix = prefix[::-1]
+        return [key[::-1] for key in self._backward if key.endswith(reversed_prefix)]
+
+    def with_suffix(self, suffix):
+        backward = self._backward
+        key = suffix[::-1]
+        i = bisect.bisect_left(backward, key)
+        found = []
+        while i < len(backward) and backward[i].startswith(key):
+            found.append(backward[i][::-1])
+            i += 1
+        return found
+
+    def containing(self, text):
+        reversed_text = text[::-1]
+        return [key[::-1] for key in self._backward if reversed_text in key]
+
+    def matching(self, pattern):
+        compiled = re.compile(pattern)
+        keys = self._backward
+        literal = required_literal(pattern)
+        if literal is not None:
+            reversed_literal = literal[::-1]
+            keys = [key for key in keys if reversed_literal in key]
+        return [title for title in (key[::-1] for key in keys) if compiled.search(title)]
+
+    def __len__(self):
+        return len(self._backward)
+
+
+class Reclassifier:
+    """Keeps a tracker's stored groups in step with its classifier's rules.
+
+    apply() is cheap while the rules are unchanged (one signature check), so it can be
+    called before every refresh. Rebuilding the aggregates resets the baseline.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.index = TitleIndex(tracker.window_times)
+        self.runs = 0
+        self.last = None  # {"rules": changed, "checked": n, "moved": n, "ms": t} of the last run
+        self.total_moved = 0
+        self.reset()
+
+    def reset(self):
+        """Take the current rules as the ones the stored groups were computed with."""
+        self._version = self.tracker.classifier.version  # syncs with any pending edits first
+        self._entries = self.tracker.classifier.rule_engine.entries
+
+    def apply(self):
+        """Regroup the titles the latest rule edits affect. Returns how many entries moved (None if the rules are unchanged)."""
+        t = self.tracker
+        engine = t.classifier.rule_engine
+        if t.classifier.version == self._version:
+            return None
+        start = time.perf_counter()
+        changed = changed_rules(self._entries, engine.entries)
+        candidates = self.candidates(changed)
+        moves = {}
+        aggregates = t.aggregates
+        for title in candidates:
+            group = t.classifier.group_of(title)
+            old = aggregates.group_of_key(title)
+            if old is not None and old != group:
+                aggregates.regroup(title, group)
+                moves[title] = (old, group)
+        if moves:
+            t.buckets.regroup(moves)
+        self._entries = engine.entries
+        self._version = engine.version
+        self.runs += 1
+        self.total_moved += len(moves)
+        self.last = {"rules": len(changed), "checked": len(candidates), "moved": len(moves),
+                     "ms": (time.perf_counter() - start) * 1000.0}
+        return len(moves)
+
+    def candidates(self, changed):
+        """Tracked titles matched by any of the (kind, pattern) rules in `changed`."""
+        index = self.index
+        index.sync()
+        found = set()
+        for kind, pattern in changed:
+            if kind == "suffix":
+                found.update(index.with_suffix(pattern))
+            elif kind == "prefix":
+                found.update(index.with_prefix(pattern))
+            elif kind == "contains":
+                found.update(index.containing(pattern))
+            elif kind == "regex":
+                found.update(index.matching(pattern))
+            elif kind == "process":
+                name = pattern.lower()
+                found.update(self.tracker.titles.titles_with_process(
+                    lambda process: ntpath.basename(process).lower() == name))
+        return found
+
+    def stats(self):
+        return {"runs": self.runs, "moved": self.total_moved, "last": self.last, "indexed": len(self.index)}
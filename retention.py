@@ -0,0 +1,64 @@
+"""Automatic retention: fold long-idle, low-time entries into per-group rollups.
+
+An entry whose total stays below `threshold` seconds and that hasn't had focus for
+`max_age` seconds is removed from window_times and its time added to its group's
+rollup bucket (shown in the group's "Other" row), so totals are unchanged while the
+number of entries, refresh cost and save size stay bounded. It is off by default:
+the folded entries can't be brought back, so users opt in (RETENTION_DAYS).
+
+The sweep is incremental: each step() looks at the next `batch` title IDs, holding
+the tracker lock only for that batch, and wraps around when it reaches the end.
+"""
+
+
+class RetentionPolicy:
+    """Off unless given a max_age: None or <= 0 disables retention (folding can't be undone)."""
+
+    def __init__(self, tracker, threshold=60, max_age=None, batch=2000):
+        self.tracker = tracker
+        self.threshold = threshold
+        self.max_age = max_age
+        self.batch = batch
+        self.cursor = 0  # next title ID to look at
+        self.scanned = 0
+        self.folded = 0
+        self.folded_seconds = 0.0
+        self.sweeps = 0  # completed passes over all titles
+
+    def step(self, now=None):
+        """Examine the next batch of titles; returns how many were folded."""
+        if not self.max_age or self.max_age <= 0:
+            return 0
+        tracker = self.tracker
+        folded = 0
+        with tracker.lock:
+            now = tracker.clock() if now is None else now
+            batch, self.cursor = tracker.titles.scan(self.cursor, self.batch)
+            for title, seconds, last_seen in batch:
+                if seconds >= self.threshold:
+                    continue
+                if not last_seen:
+                    # never seen since it was loaded without a timestamp: start its clock now
+                    tracker.titles.set_last_seen(title, now)
+                    continue
+                if now - last_seen >= self.max_age:
+                    moved = tracker.fold(title)
+                    if moved is not None:
+                        folded += 1
+                        self.folded_seconds += moved
+        self.scanned += len(batch)
+        self.folded += folded
+        if self.cursor == 0:
+            self.sweeps += 1
+        return folded
+
+    def sweep(self, now=None):
+        """Run one full pass (in batches). Returns how many entries were folded."""
+        folded = self.step(now)
+        while self.cursor:
+            folded += self.step(now)
+        return folded
+
+    def stats(self):
+        return {"scanned": self.scanned, "folded": self.folded, "folded_seconds": self.folded_seconds,
+                "sweeps": self.sweeps, "rollup_groups": len(self.tracker.rollups)}
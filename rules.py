@@ -0,0 +1,387 @@
+"""Compiled matcher for GROUP_RULES.
+
+GROUP_RULES maps a group name to a list of rules. A plain string is an "ends with"
+suffix; other rule types are written as (kind, pattern) pairs:
+    ("prefix", "Inbox - ")          title starts with
+    ("contains", "YouTube")         title contains
+    ("regex", r"\\(\\d+\\) Inbox")  re.search matches the title
+    ("process", "chrome.exe")       the window belongs to that executable (case-insensitive)
+
+The first matching rule wins, in the order the rules are listed. Checking rules one
+by one costs O(rules) per title, so each kind is compiled into one structure and
+all of a kind's rules are tried at once:
+  suffix    a trie of reversed suffixes, walked backwards from the end of the title
+  prefix    a trie of prefixes, walked forwards
+  contains  an Aho-Corasick automaton: one pass over the title finds every pattern
+  regex     prefiltered by the literal text each rule requires (found with another
+            Aho-Corasick pass); the rest in a single alternation with a named group
+            per rule
+  process   a dict lookup
+Lookups in the tries and the automaton depend on the title length rather than on
+how many rules there are. Priority is the position of a rule when iterating the
+rules in order, so the lowest priority among all matches is exactly the match the
+original nested loop would have returned.
+"""
+import ntpath
+import re
+
+RULE_KINDS = ("suffix", "prefix", "contains", "regex", "process")
+
+
+def parse_rule(rule):
+    """(kind, pattern) for a GROUP_RULES entry."""
+    if isinstance(rule, str):
+        return "suffix", rule
+    kind, pattern = rule
+    if kind not in RULE_KINDS:
+        raise ValueError(f"unknown rule kind {kind!r}; expected one of {RULE_KINDS}")
+    return kind, pattern
+
+
+class _Node:
+    __slots__ = ("children", "priority", "subtree_min")
+
+    def __init__(self):
+        self.children = {}
+        self.priority = None  # priority of the pattern ending here, if any
+        self.subtree_min = None  # best priority anywhere below (and at) this node
+
+
+class _Trie:
+    """Patterns as paths of characters; best() walks a title along it."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, chars, priority):
+        node = self.root
+        path = [node]
+        for ch in chars:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        if node.priority is None:
+            # duplicate patterns keep the earliest rule, same as the linear scan
+            node.priority = priority
+        for n in path:
+            if n.subtree_min is None:
+                n.subtree_min = priority
+
+    def best(self, chars, best=None):
+        """Lowest priority of a pattern that `chars` starts with, or `best` if that's lower."""
+        node = self.root
+        if node.priority is not None and (best is None or node.priority < best):
+            best = node.priority  # an empty pattern matches everything
+        for ch in chars:
+            if best is not None and node.subtree_min >= best:
+                break  # nothing deeper can beat the current match
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.priority is not None and (best is None or node.priority < best):
+                best = node.priority
+        return best
+
+
+class _AhoCorasick:
+    """Multi-pattern substring search over (pattern, value) pairs.
+
+    best() gives the lowest value of any pattern occurring in a text, found() all of them.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]  # values of the patterns ending at each state, including via fail links
+        self.low = [None]  # min(outputs[state])
+
+    def add(self, pattern, value):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = self.goto[state][ch] = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.low.append(None)
+            state = nxt
+        self.outputs[state].append(value)
+
+    def build(self):
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        queue = list(goto[0].values())
+        for state in queue:
+            outputs[state].extend(outputs[0])  # an empty pattern occurs everywhere
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outputs[nxt].extend(outputs[fail[nxt]])
+        self.low = [min(values) if values else None for values in outputs]
+
+    def best(self, text, best=None):
+        goto, fail, low = self.goto, self.fail, self.low
+        if low[0] is not None and (best is None or low[0] < best):
+            best = low[0]
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = low[state]
+            if found is not None and (best is None or found < best):
+                best = found
+        return best
+
+    def found(self, text):
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        values = set(outputs[0])
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                values.update(outputs[state])
+        return values
+
+
+def required_literal(pattern):
+    """Longest run of plain characters every match of `pattern` must contain, or None if there isn't one.
+
+    Only top-level literals count (nothing inside groups, alternations or repeats),
+    and case-insensitive patterns have none.
+    """
+    try:
+        from re import _parser as sre_parse
+    except ImportError:  # Python < 3.11
+        import sre_parse
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    state = getattr(parsed, "state", None) or getattr(parsed, "pattern", None)
+    if state is None or state.flags & re.IGNORECASE:
+        return None
+    best = run = ""
+    for op, arg in parsed:
+        if op == sre_parse.LITERAL:
+            run += chr(arg)
+            continue
+        if len(run) > len(best):
+            best = run
+        run = ""
+    if len(run) > len(best):
+        best = run
+    return best or None
+
+
+class _RegexSet:
+    """Regex rules, prefiltered by their required literals and otherwise combined into one alternation.
+
+    A rule with a literal every match must contain (e.g. "Inbox" in r"\\(\\d+\\) Inbox") is
+    only tried when an Aho-Corasick pass finds that literal in the title, so rules that
+    can't match cost nothing. The rest become one alternation of
+    (?=[\\s\\S]*?(?:pattern))(?P<_N>) tried at position 0: the alternatives are tried in
+    priority order, so the first that succeeds is the lowest-priority such rule that
+    matches anywhere. Patterns that can't be combined (backreferences, global inline
+    flags) are tried one by one.
+    """
+
+    def __init__(self, rules):
+        self.combined = None
+        self.compiled = {}  # priority -> compiled, for the prefiltered and separate rules
+        self.prefilter = None
+        self.separate = []  # priorities tried one by one
+        parts = []
+        literals = []
+        for priority, pattern in rules:
+            compiled = re.compile(pattern)
+            literal = required_literal(pattern)
+            if literal is not None:
+                self.compiled[priority] = compiled
+                literals.append((literal, priority))
+            elif compiled.groups and re.search(r"\\\d|\(\?P=", pattern):
+                self.compiled[priority] = compiled
+                self.separate.append(priority)
+            else:
+                parts.append((priority, pattern, compiled))
+        if literals:
+            self.prefilter = _AhoCorasick()
+            for literal, priority in literals:
+                self.prefilter.add(literal, priority)
+            self.prefilter.build()
+        if parts:
+            try:
+                self.combined = re.compile("|".join(f"(?=[\\s\\S]*?(?:{pattern}))(?P<_{priority}>)"
+                                                    for priority, pattern, _ in parts))
+            except re.error:
+                for priority, _, compiled in parts:
+                    self.compiled[priority] = compiled
+                    self.separate.append(priority)
+        self.separate.sort()
+
+    def best(self, text, best=None):
+        if self.combined is not None:
+            m = self.combined.match(text)
+            if m is not None:
+                priority = int(m.lastgroup[1:])
+                if best is None or priority < best:
+                    best = priority
+        candidates = self.separate
+        if self.prefilter is not None:
+            candidates = sorted(self.prefilter.found(text).union(self.separate))
+        for priority in candidates:
+            if best is not None and priority >= best:
+                break
+            if self.compiled[priority].search(text):
+                best = priority
+                break
+        return best
+
+
+def changed_rules(old, new):
+    """(kind, pattern) of every rule whose matches may be grouped differently going from `old` to `new`.
+
+    Both are RuleEngine.entries lists. A title that matches none of these rules
+    keeps its group: its matching rules are all unchanged and still in the same order.
+    Removed and added rules count, and so does every common rule from the first
+    point where the common rules stop being in the same order.
+    """
+    remaining = {}
+    for entry in new:
+        remaining[entry] = remaining.get(entry, 0) + 1
+    common_old = []
+    removed = []
+    for entry in old:
+        if remaining.get(entry):
+            remaining[entry] -= 1
+            common_old.append(entry)
+        else:
+            removed.append(entry)
+    remaining = {}
+    for entry in common_old:
+        remaining[entry] = remaining.get(entry, 0) + 1
+    common_new = []
+    added = []
+    for entry in new:
+        if remaining.get(entry):
+            remaining[entry] -= 1
+            common_new.append(entry)
+        else:
+            added.append(entry)
+    same = 0
+    while same < len(common_old) and common_old[same] == common_new[same]:
+        same += 1
+    changed = removed + added + common_old[same:]
+    return list(dict.fromkeys((kind, pattern) for _, kind, pattern in changed))
+
+
+def _rules_signature(rules):
+    """Fingerprint of a rules mapping's contents: any edit shows, including same-length edits in place.
+
+    Rules are strings and (kind, pattern) tuples, so copying each group's list (a C-level
+    copy, no per-rule work) is enough to keep what was compiled.
+    """
+    return tuple((group, tuple(entries)) for group, entries in rules.items())
+
+
+class RuleEngine:
+    """All GROUP_RULES kinds compiled into per-kind matchers, with first-match-wins priority."""
+
+    def __init__(self, rules=None):
+        self.version = 0
+        self._signature = None
+        self._entries = []  # priority -> (group, kind, pattern)
+        self._matchers = []  # [(lowest priority of the kind, kind, matcher)], in that order
+        self.uses_process = False
+        if rules is not None:
+            self.set_rules(rules)
+
+    def set_rules(self, rules):
+        """Recompile from a {group: [rule, ...]} mapping."""
+        entries = []
+        by_kind = {kind: [] for kind in RULE_KINDS}
+        for group, group_rules in rules.items():
+            for rule in group_rules:
+                kind, pattern = parse_rule(rule)
+                priority = len(entries)
+                entries.append((group, kind, pattern))
+                by_kind[kind].append((priority, pattern))
+
+        matchers = []
+        if by_kind["suffix"]:
+            trie = _Trie()
+            for priority, suffix in by_kind["suffix"]:
+                trie.add(reversed(suffix), priority)
+            matchers.append((by_kind["suffix"][0][0], "suffix", trie))
+        if by_kind["prefix"]:
+            trie = _Trie()
+            for priority, prefix in by_kind["prefix"]:
+                trie.add(prefix, priority)
+            matchers.append((by_kind["prefix"][0][0], "prefix", trie))
+        if by_kind["contains"]:
+            automaton = _AhoCorasick()
+            for priority, pattern in by_kind["contains"]:
+                automaton.add(pattern, priority)
+            automaton.build()
+            matchers.append((by_kind["contains"][0][0], "contains", automaton))
+        if by_kind["regex"]:
+            matchers.append((by_kind["regex"][0][0], "regex", _RegexSet(by_kind["regex"])))
+        if by_kind["process"]:
+            processes = {}
+            for priority, name in by_kind["process"]:
+                processes.setdefault(name.lower(), priority)
+            matchers.append((by_kind["process"][0][0], "process", processes))
+        matchers.sort(key=lambda m: m[0])
+
+        self._entries = entries
+        self._matchers = matchers
+        self.uses_process = bool(by_kind["process"])
+        self._signature = _rules_signature(rules)
+        self.version += 1
+
+    @property
+    def entries(self):
+        """[(group, kind, pattern), ...] in priority order, as last compiled."""
+        return self._entries
+
+    def sync(self, rules):
+        """Rebuild if `rules` looks different from what was compiled. Returns True if a rebuild happened."""
+        if self._signature != _rules_signature(rules):
+            self.set_rules(rules)
+            return True
+        return False
+
+    def match(self, title, process=None):
+        """Return (group, kind, pattern) of the first rule matching `title` (and `process`), or None."""
+        best = None
+        for lowest, kind, matcher in self._matchers:
+            if best is not None and lowest >= best:
+                break  # kinds are in order of their first rule: nothing further can win
+            if kind == "suffix":
+                best = matcher.best(reversed(title), best)
+            elif kind == "prefix":
+                best = matcher.best(title, best)
+            elif kind == "process":
+                if process:
+                    found = matcher.get(ntpath.basename(process).lower())
+                    if found is not None and (best is None or found < best):
+                        best = found
+            else:
+                best = matcher.best(title, best)
+        if best is None:
+            return None
+        return self._entries[best]
+
+    def __len__(self):
+        return len(self._entries)
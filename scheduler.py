@@ -0,0 +1,164 @@
+"""One timer for all periodic work (tracker polling, refresh, save), with adaptive rates.
+
+Each job has a base interval used while the user is active. When nothing has happened
+for a while (idle) or the user is AFK, a job's interval grows by `backoff` after each
+run, up to that state's cap. Jobs marked pause_when_hidden (rendering) stop entirely
+while the window is hidden; the others keep running at the rate the activity state gives them. Any activity snaps every job back to its base interval. Jobs that
+fall due close together are run in the same wakeup, so refresh and save coalesce
+instead of waking the process separately.
+
+The scheduler does not own a timer itself: it is given call_later(delay, fn) and
+cancel(handle), e.g. Tk's root.after/after_cancel, or a fake for tests.
+"""
+import time
+
+ACTIVE, IDLE, AFK = "active", "idle", "afk"
+
+
+class Job:
+    __slots__ = ("name", "func", "base", "caps", "pause_when_hidden", "interval", "next_due", "runs")
+
+    def __init__(self, name, func, base, idle_interval, afk_interval, pause_when_hidden):
+        self.name = name
+        self.func = func
+        self.base = base
+        self.caps = {IDLE: idle_interval or base, AFK: afk_interval or idle_interval or base}
+        self.pause_when_hidden = pause_when_hidden
+        self.interval = base
+        self.next_due = 0.0
+        self.runs = 0
+
+
+class AdaptiveScheduler:
+    """Runs registered jobs from a single timer, adapting their rates to user activity.
+
+    probe() is called at every wakeup and returns (afk, hidden) for the current moment.
+    Call wake() when something changes that shouldn't wait for the next wakeup (e.g.
+    the window was shown again); it must run on the thread that owns the timer.
+    idle_after: seconds without activity() before the IDLE back-off starts.
+    coalesce: a job due within this fraction of its interval runs in the current wakeup.
+    instruments: optional instrumentation.Instrumentation that gets each timer's drift.
+    """
+
+    def __init__(self, call_later, cancel, probe=None, clock=time.monotonic,
+                 backoff=1.5, idle_after=30.0, coalesce=0.25, instruments=None):
+        self.call_later = call_later
+        self.cancel = cancel
+        self.probe = probe if probe is not None else (lambda: (False, False))
+        self.clock = clock
+        self.backoff = backoff
+        self.idle_after = idle_after
+        self.coalesce = coalesce
+        self.instruments = instruments
+        self.jobs = {}
+        self.state = ACTIVE
+        self.hidden = False
+        self.wakeups = 0
+        self._handle = None
+        self._planned = None  # when the pending timer was asked to fire
+        self._activity_pending = False
+        self._last_activity = clock()
+        self._started = None
+
+    def add(self, name, func, interval, idle_interval=None, afk_interval=None, pause_when_hidden=False):
+        self.jobs[name] = Job(name, func, interval, idle_interval, afk_interval, pause_when_hidden)
+
+    def remove(self, name):
+        self.jobs.pop(name, None)
+
+    def set_interval(self, name, interval, idle_interval=None, afk_interval=None):
+        """Change a job's base interval (and caps), e.g. after SAVE_TIME changed in settings."""
+        job = self.jobs[name]
+        job.base = interval
+        job.caps = {IDLE: idle_interval or interval, AFK: afk_interval or idle_interval or interval}
+        job.interval = min(max(job.interval, interval), job.caps.get(self.state, interval))
+
+    def activity(self):
+        """Note user activity. Safe to call from any thread; takes effect at the next wakeup."""
+        self._activity_pending = True
+
+    def start(self):
+        now = self.clock()
+        self._started = now
+        for job in self.jobs.values():
+            job.next_due = now
+        self.wake()
+
+    def wake(self):
+        """Run whatever is due right now and re-arm the timer (e.g. when the window is shown again)."""
+        if self._handle is not None:
+            self.cancel(self._handle)
+            self._handle = None
+        self._planned = None
+        self._wakeup()
+
+    def _current_state(self, now):
+        afk, hidden = self.probe()
+        if self._activity_pending:
+            self._activity_pending = False
+            self._last_activity = now
+            for job in self.jobs.values():
+                if job.interval != job.base:
+                    # snap back: run at the base rate starting now
+                    job.interval = job.base
+                    job.next_due = min(job.next_due, now + job.base)
+        self.hidden = bool(hidden)
+        if afk:
+            return AFK
+        if now - self._last_activity >= self.idle_after:
+            return IDLE
+        return ACTIVE
+
+    def _wakeup(self):
+        self._handle = None
+        self.wakeups += 1
+        now = self.clock()
+        if self._planned is not None and self.instruments is not None:
+            self.instruments.record_drift(now - self._planned)
+        self.state = self._current_state(now)
+
+        for job in list(self.jobs.values()):
+            if self.hidden and job.pause_when_hidden:
+                job.next_due = now + job.interval
+                continue
+            if job.next_due - now > job.interval * self.coalesce:
+                continue
+            try:
+                job.func()
+            except Exception as e:
+                print(f"Error in scheduled job {job.name}:", e)
+            job.runs += 1
+            # back off while idle/AFK, run at the base rate while active
+            if self.state == ACTIVE:
+                job.interval = job.base
+            else:
+                job.interval = min(job.caps[self.state], max(job.base, job.interval * self.backoff))
+            job.next_due = now + job.interval
+
+        runnable = [job.next_due for job in self.jobs.values()
+                    if not (self.hidden and job.pause_when_hidden)]
+        if runnable:
+            delay = max(0.0, min(runnable) - self.clock())
+            self._planned = self.clock() + delay
+            self._handle = self.call_later(delay, self._wakeup)
+
+    def rates(self):
+        """Effective rates: current interval/Hz per job, plus measured runs/s and wakeups/s since start()."""
+        now = self.clock()
+        elapsed = (now - self._started) if self._started is not None else 0.0
+        out = {
+            "state": self.state,
+            "hidden": self.hidden,
+            "wakeups": self.wakeups,
+            "wakeups_per_s": (self.wakeups / elapsed) if elapsed > 0 else 0.0,
+        }
+        for name, job in self.jobs.items():
+            paused = self.hidden and job.pause_when_hidden
+            out[name] = {
+                "interval_s": job.interval,
+                "rate_hz": 0.0 if paused else 1.0 / job.interval,
+                "runs": job.runs,
+                "measured_hz": (job.runs / elapsed) if elapsed > 0 else 0.0,
+                "paused": paused,
+            }
+        return out
@@ -0,0 +1,110 @@
+"""BucketHistory: range totals, retention of each level, and save copies."""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bucket_history import BucketHistory, period_range
+
+DAY = 86400.0
+
+
+def local(*args):
+    return datetime(*args).timestamp()
+
+
+def group_of(title):
+    return title.split(" - ")[-1]
+
+
+def test_ranges_add_up():
+    buckets = BucketHistory(group_of)
+    start = local(2025, 3, 31, 22)
+    buckets.credit("a - Word", start, start + 5 * 3600)  # crosses a day and a month boundary
+    buckets.credit("b - Slack", local(2025, 4, 2, 9), local(2025, 4, 2, 9, 30))
+    assert buckets.total(local(2025, 3, 1), local(2025, 5, 1)) == pytest.approx(5 * 3600 + 1800)
+    assert buckets.total(*period_range("month", local(2025, 3, 15))) == pytest.approx(2 * 3600)
+    assert buckets.group_totals(*period_range("day", local(2025, 4, 2))) == {"Slack": 1800.0}
+
+
+@pytest.fixture
+def timezone(monkeypatch):
+    def use(name):
+        monkeypatch.setenv("TZ", name)
+        time.tzset()
+    yield use
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize("zone", ["Asia/Kolkata", "Asia/Kathmandu", "America/St_Johns"])
+def test_days_split_at_local_midnight_with_sub_hour_offsets(timezone, zone):
+    timezone(zone)
+    buckets = BucketHistory(group_of)
+    start = local(2025, 3, 31, 22)
+    buckets.credit("a - Word", start, start + 5 * 3600)
+    assert sorted(b.total for b in buckets.days.values()) == [2 * 3600, 3 * 3600]
+    assert buckets.total(*period_range("day", start)) == pytest.approx(2 * 3600)
+    assert buckets.total(*period_range("month", start + 4 * 3600)) == pytest.approx(3 * 3600)
+    assert buckets.total(local(2025, 3, 31, 23), local(2025, 4, 1, 1)) == pytest.approx(2 * 3600)
+    assert buckets.total(local(2025, 4, 1, 2, 15), local(2025, 4, 1, 2, 45)) == pytest.approx(3600)
+
+
+def test_old_levels_are_dropped():
+    buckets = BucketHistory(group_of, hour_days=2, day_days=40, month_count=3)
+    first = local(2025, 1, 10, 12)
+    t = first
+    while t < local(2025, 6, 20):
+        buckets.credit("a - Word", t, t + 600)
+        t += DAY
+    assert len(buckets.hours) <= 3 * 24
+    assert len(buckets.days) <= 41
+    assert sorted(buckets.months) == [2025 * 12 + 3, 2025 * 12 + 4, 2025 * 12 + 5]
+    # a range reaching back past the daily buckets counts the whole month instead
+    april = buckets.total(local(2025, 4, 15), local(2025, 5, 1))
+    assert april == pytest.approx(30 * 600)
+    # the monthly buckets for January are gone
+    assert buckets.total(local(2025, 1, 1), local(2025, 2, 1)) == 0
+
+
+def test_credits_before_the_cutoff_are_ignored():
+    buckets = BucketHistory(group_of, hour_days=1, day_days=2, month_count=1)
+    now = local(2025, 6, 20, 12)
+    buckets.credit("a - Word", now, now + 60)
+    buckets.credit("a - Word", now - 40 * DAY, now - 40 * DAY + 60)
+    assert len(buckets.hours) == len(buckets.days) == len(buckets.months) == 1
+
+
+def test_to_json_copies_only_what_changed():
+    buckets = BucketHistory(group_of)
+    now = local(2025, 6, 20, 12)
+    buckets.credit("a - Word", now, now + 60)
+    buckets.credit("b - Word", now - 3 * DAY, now - 3 * DAY + 60)
+    first = buckets.to_json()
+    buckets.credit("a - Word", now + 60, now + 120)
+    second = buckets.to_json()
+
+    hour = str(int(now // 3600))
+    old_hour = str(int((now - 3 * DAY) // 3600))
+    # the first copy doesn't see later credits; unchanged buckets are shared between copies
+    assert first["hours"][hour]["t"] == {"a - Word": 60.0}
+    assert second["hours"][hour]["t"] == {"a - Word": 120.0}
+    assert second["hours"][old_hour] is first["hours"][old_hour]
+
+    restored = BucketHistory(group_of)
+    restored.load_json(second)
+    assert restored.to_json() == second
+    restored.regroup({"a - Word": ("Word", "Editor")})
+    assert restored.to_json()["days"][str((datetime.fromtimestamp(now)).date().toordinal())]["g"] == {"Editor": 120.0}
+
+
+def test_retention_cutoffs_survive_a_reload():
+    buckets = BucketHistory(group_of, hour_days=1, day_days=2, month_count=1)
+    now = local(2025, 6, 20, 12)
+    buckets.credit("a - Word", now, now + 60)
+    buckets.credit("a - Word", now + 5 * DAY, now + 5 * DAY + 60)
+    restored = BucketHistory(group_of, hour_days=1, day_days=2, month_count=1)
+    restored.load_json(buckets.to_json())
+    assert (restored.hours_before, restored.days_before, restored.months_before) == (
+        buckets.hours_before, buckets.days_before, buckets.months_before)
+    assert restored.days_before == (datetime.fromtimestamp(now) + timedelta(days=3)).date().toordinal()
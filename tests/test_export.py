@@ -0,0 +1,65 @@
+"""export.py: title rows straight from the save files."""
+import csv
+import json
+
+import pytest
+
+import export
+from persistence import TrackerStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+
+
+def write_journal(path, gen, records):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"gen": gen}) + "\n")
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+
+def test_titles_from_a_journal_without_snapshot(tmp_path):
+    journal = tmp_path / "window_times.journal"
+    write_journal(journal, 1, [
+        {"w": "a - Word", "s": START, "e": START + 60},
+        {"o": "a - Word", "t": "a - Word (2)"},
+        {"p": "a - Word", "n": "winword.exe"},
+        {"w": "b - Discord", "s": START + 60, "e": START + 90},
+        {"w": "a - Word", "s": START + 90, "e": START + 100},
+    ])
+    output = tmp_path / "titles.csv"
+    export.main(["titles", "--output", str(output), "--save-file", str(tmp_path / "window_times.json"),
+                 "--journal", str(journal)])
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = {row["title"]: row for row in csv.DictReader(f)}
+    assert float(rows["a - Word"]["seconds"]) == pytest.approx(70)
+    assert rows["a - Word"]["original_title"] == "a - Word (2)"
+    assert rows["a - Word"]["process"] == "winword.exe"
+    assert float(rows["b - Discord"]["last_seen"]) == pytest.approx(START + 90)
+
+
+def test_titles_without_any_save_files(tmp_path):
+    with pytest.raises(SystemExit):
+        export.main(["titles", "--output", str(tmp_path / "titles.csv"),
+                     "--save-file", str(tmp_path / "window_times.json"),
+                     "--journal", str(tmp_path / "window_times.journal")])
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_snapshot_originals(tmp_path, snapshot_format):
+    tracker = Tracker(ReplayWindowSource([]))
+    store = TrackerStore(tracker, str(tmp_path / "window_times.json"), str(tmp_path / "window_times.journal"),
+                         snapshot_format=snapshot_format)
+    store.load()
+    tracker.handle_event("focus", START, "a - Word")
+    tracker.handle_event("focus", START + 10, "b - Word")
+    tracker.settle(START + 20)
+    with tracker.lock:
+        tracker.window_original_titles["a - Word"] = "a - Word (draft)"
+    store.compact()
+    store.close()
+    snapshot = store.binary_file if snapshot_format == "binary" else store.save_file
+    originals = export.snapshot_originals(snapshot)
+    assert originals["a - Word"] == "a - Word (draft)"
+    assert originals.get("b - Word", "b - Word") == "b - Word"
@@ -0,0 +1,146 @@
+"""Journal replay on load, before and after compaction."""
+import json
+import os
+
+import pytest
+
+from journal import Journal, read_journal
+from persistence import TrackerStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+
+
+def make_tracker():
+    return Tracker(ReplayWindowSource([]), afk_timeout=60)
+
+
+def focus(tracker, t, title):
+    tracker.handle_event("focus", t, title)
+
+
+def state(tracker):
+    times = dict(tracker.window_times.items())
+    # originals of a binary snapshot are looked up lazily, so ask for each one
+    originals = {k: tracker.window_original_titles.get(k) for k in times}
+    return times, tracker.AFK_time, originals, tracker.buckets.title_totals(START, START + 86400)
+
+
+@pytest.fixture(params=["json", "binary"])
+def files(request, tmp_path):
+    return str(tmp_path / "window_times.json"), str(tmp_path / "window_times.journal"), request.param
+
+
+def reload(files):
+    save_file, journal_file, snapshot_format = files
+    tracker = make_tracker()
+    store = TrackerStore(tracker, save_file, journal_file, snapshot_format=snapshot_format)
+    store.load()
+    return tracker, store
+
+
+def test_first_save_writes_a_snapshot(files):
+    tracker, store = reload(files)
+    focus(tracker, START, "notes - Word")
+    tracker.settle(START + 30)
+    store.save()
+    # a new install gets its snapshot and buckets right away, not once the journal is big enough
+    assert os.path.exists(store.save_file) and os.path.exists(store.buckets_file)
+    assert read_journal(store.journal.path)[1] == []
+    store.save()
+    assert store.journal.gen == 2  # later saves only append
+
+    loaded, _ = reload(files)
+    assert state(loaded) == state(tracker)
+
+
+def test_replay_on_top_of_the_snapshot(files):
+    tracker, store = reload(files)
+    store.save()
+    focus(tracker, START, "notes - Word")
+    focus(tracker, START + 30, "chat - Discord")
+    tracker.handle_event("idle", START + 50, True)
+    tracker.handle_event("idle", START + 80, False)
+    focus(tracker, START + 90, "notes - Word")
+    tracker.settle(START + 120)
+    store.save()
+    assert not store.journal.needs_compaction()
+    _, records = read_journal(store.journal.path)
+    assert any("afk" in rec for rec in records)
+
+    loaded, _ = reload(files)
+    assert state(loaded) == state(tracker)
+    # idle from 50 to 80 is AFK; the rest of Discord's focus counts
+    assert loaded.window_times["chat - Discord"] == pytest.approx(30)
+    assert loaded.AFK_time == pytest.approx(30)
+
+
+def test_replay_after_compaction(files):
+    tracker, store = reload(files)
+    focus(tracker, START, "a - Word")
+    focus(tracker, START + 60, "b - Slack")
+    store.compact()
+    gen = store.journal.gen
+    assert read_journal(store.journal.path) == (gen, [])
+
+    # more activity after the snapshot goes to the new journal only
+    focus(tracker, START + 100, "a - Word")
+    focus(tracker, START + 130, "c - Visual Studio Code")
+    tracker.settle(START + 150)
+    store.save()
+    assert read_journal(store.journal.path)[0] == gen
+
+    loaded, loaded_store = reload(files)
+    assert state(loaded) == state(tracker)
+    assert loaded.window_times["a - Word"] == pytest.approx(90)
+    assert loaded.window_times["b - Slack"] == pytest.approx(40)
+    assert loaded_store.journal.gen == gen
+
+    # appending to the reloaded journal and loading again doesn't double count
+    focus(loaded, START + 200, "a - Word")
+    loaded.settle(START + 260)
+    loaded_store.save()
+    again, _ = reload(files)
+    assert state(again) == state(loaded)
+
+
+def test_stale_journal_is_ignored(files):
+    tracker, store = reload(files)
+    focus(tracker, START, "a - Word")
+    focus(tracker, START + 60, "b - Slack")
+    store.save()
+    _, journal_file, _ = files
+    with open(journal_file, encoding="utf-8") as f:
+        stale = f.read()
+    store.compact()
+    # a crash between writing the snapshot and resetting the journal leaves the old one behind
+    with open(journal_file, "w", encoding="utf-8") as f:
+        f.write(stale)
+
+    loaded, _ = reload(files)
+    assert state(loaded) == state(tracker)
+
+
+def test_records_survive_failed_append(tmp_path):
+    journal = Journal(str(tmp_path / "missing" / "j.journal"))
+    journal.record_interval("a", START, START + 10)
+    journal.record_interval("a", START + 10, START + 25)
+    with pytest.raises(OSError):
+        journal.flush()
+    assert journal.has_pending()
+
+    journal.path = str(tmp_path / "j.journal")
+    journal.record_afk(5)
+    journal.flush()
+    with open(journal.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [{"w": "a", "s": START, "e": START + 25}, {"afk": 5}]
+
+
+def test_no_snapshot_before_load(files):
+    save_file, journal_file, snapshot_format = files
+    store = TrackerStore(make_tracker(), save_file, journal_file, snapshot_format=snapshot_format)
+    store.save()
+    # an unloaded store mustn't write its empty state over a snapshot it hasn't read
+    assert not os.path.exists(store.save_file)
@@ -0,0 +1,67 @@
+"""merge_hosts: incremental merges and the per-host caches they keep."""
+import os
+
+import pytest
+
+from merge_hosts import HostMerger, main
+from persistence import TrackerStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+
+
+def make_host(directory, activity):
+    os.makedirs(directory, exist_ok=True)
+    tracker = Tracker(ReplayWindowSource([]))
+    store = TrackerStore(tracker, os.path.join(directory, "window_times.json"),
+                         os.path.join(directory, "window_times.journal"))
+    store.load()
+    t = START
+    for title, seconds in activity:
+        tracker.handle_event("focus", t, title)
+        t += seconds
+    tracker.settle(t)
+    return store
+
+
+def caches(output):
+    return sorted(os.listdir(os.path.join(output, "hosts")))
+
+
+def test_merge_sums_hosts_and_replaces_caches(tmp_path):
+    a = make_host(str(tmp_path / "a"), [("x - Word", 100), ("y - Slack", 50)])
+    b = make_host(str(tmp_path / "b"), [("x - Word", 30)])
+    a.compact()
+    b.save()
+    output = str(tmp_path / "combined")
+    merger = HostMerger(output, jobs=1)
+    report = merger.merge([str(tmp_path / "a"), str(tmp_path / "b")])
+    assert report["changed"] == 2
+    assert merger.data["window_times"] == {"x - Word": 130.0, "y - Slack": 50.0}
+    assert len(caches(output)) == 2
+
+    a.tracker.handle_event("focus", START + 500, "y - Slack")
+    a.tracker.settle(START + 520)
+    a.save()
+    report = merger.merge([str(tmp_path / "a"), str(tmp_path / "b")])
+    assert report["notes"][str(tmp_path / "a")].startswith("journal")
+    # Slack kept focus from 150 to 520
+    assert merger.data["window_times"]["y - Slack"] == pytest.approx(420.0)
+    assert len(caches(output)) == 2  # a's old cache was replaced
+
+
+def test_rebuild_removes_old_caches(tmp_path, capsys):
+    make_host(str(tmp_path / "a"), [("x - Word", 100)]).compact()
+    make_host(str(tmp_path / "b"), [("x - Word", 30)]).compact()
+    output = str(tmp_path / "combined")
+    hosts = [str(tmp_path / "a"), str(tmp_path / "b")]
+    main(hosts + ["--output", output, "--jobs", "1"])
+    before = caches(output)
+    main(hosts + ["--output", output, "--jobs", "1", "--rebuild"])
+    after = caches(output)
+    assert len(after) == 2 and not set(before) & set(after)
+    assert HostMerger(output).data["window_times"] == {"x - Word": 130.0}
+    # dropping a host on rebuild drops its cache too
+    main(hosts[:1] + ["--output", output, "--jobs", "1", "--rebuild"])
+    assert len(caches(output)) == 1
@@ -0,0 +1,24 @@
+"""query.py: answering from the save files without a window."""
+import json
+
+import pytest
+
+from query import TimeKeeperData
+
+START = 1_700_000_000.0
+
+
+def test_range_from_the_journal_without_buckets(tmp_path):
+    with open(tmp_path / "window_times.journal", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"gen": 1}) + "\n")
+        f.write(json.dumps({"w": "a - Word", "s": START, "e": START + 600}) + "\n")
+        f.write(json.dumps({"w": "b - Discord", "s": START + 600, "e": START + 900}) + "\n")
+    data = TimeKeeperData(str(tmp_path / "window_times.json"))
+    result = data.range_totals(START - 3600, START + 3600)
+    assert result["source"] == "buckets"
+    assert result["total"] == pytest.approx(900)
+    assert result["groups"]["Office"] == pytest.approx(600)
+
+
+def test_range_without_any_history(tmp_path):
+    assert TimeKeeperData(str(tmp_path / "window_times.json")).range_totals(START, START + 3600) is None
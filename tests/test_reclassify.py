@@ -0,0 +1,139 @@
+"""Reclassifier: rule edits move exactly the entries a full rebuild would."""
+from collections import OrderedDict
+
+import pytest
+
+from classifier import Classifier
+from reclassify import TitleIndex
+from title_store import CHANGE_LOG_SIZE, TitleStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+
+TITLES = ["a.py - Visual Studio Code", "b.py - Visual Studio Code", "notes - Word", "plan - Word",
+          "Inbox - Mail", "(2) Inbox - Mail", "general - Discord", "random - Slack", "cats - YouTube",
+          "paper.pdf", "Untitled"]
+
+
+def make_tracker(rules):
+    tracker = Tracker(ReplayWindowSource([]), classifier=Classifier(rules=rules), min_display_time=60)
+    t = START
+    for i, title in enumerate(TITLES * 3):
+        tracker.handle_event("focus", t, title)
+        t += 20 + 15 * (i % 7)
+    tracker.settle(t)
+    return tracker
+
+
+def expected(tracker):
+    """Group totals/counts and bucket groups as a rebuild from scratch computes them."""
+    group_of = tracker.classifier.group_of
+    totals, counts, buckets = {}, {}, {}
+    for title, seconds in tracker.window_times.items():
+        group = group_of(title)
+        buckets[group] = buckets.get(group, 0.0) + seconds
+        if seconds >= tracker.aggregates.min_display_time:
+            totals[group] = totals.get(group, 0.0) + seconds
+            counts[group] = counts.get(group, 0) + 1
+    return totals, counts, buckets
+
+
+def actual(tracker):
+    a = tracker.aggregates
+    return ({g: s for g, s in a.group_totals.items() if a.group_counts.get(g)},
+            {g: n for g, n in a.group_counts.items() if n},
+            tracker.buckets.group_totals(START, START + 86400))
+
+
+def assert_matches_rebuild(tracker):
+    want = expected(tracker)
+    got = actual(tracker)
+    for w, g in zip(want, got):
+        assert g.keys() == w.keys()
+        for group in w:
+            assert g[group] == pytest.approx(w[group])
+    for title in tracker.window_times:
+        assert tracker.aggregates.group_of_key(title) == tracker.classifier.group_of(title)
+
+
+def test_unchanged_rules_do_nothing():
+    tracker = make_tracker({"Work": [" - Visual Studio Code"]})
+    assert tracker.reclassify() is None
+
+
+@pytest.mark.parametrize("edit", [
+    lambda rules: rules["Work"].append(" - Word"),
+    lambda rules: rules["Work"].insert(0, ("contains", "Inbox")),
+    lambda rules: rules.pop("Chat"),
+    lambda rules: rules.update(Video=[("regex", r"You[Tt]ube$")]),
+    lambda rules: rules.update(Top=[("prefix", "(2)")]) or rules.move_to_end("Top", last=False),
+    lambda rules: rules["Chat"].reverse(),
+    lambda rules: rules["Chat"].__setitem__(0, " - Mail"),
+    lambda rules: rules["Work"].clear(),
+])
+def test_edit_matches_rebuild(edit):
+    rules = OrderedDict(Work=[" - Visual Studio Code", ".pdf"], Mail=[" - Mail"],
+                        Chat=[" - Discord", " - Slack", ("contains", "random")])
+    tracker = make_tracker(rules)
+    edit(rules)
+    moved = tracker.reclassify()
+    assert moved is not None
+    assert_matches_rebuild(tracker)
+    assert tracker.reclassify() is None
+
+
+def test_only_affected_titles_are_checked():
+    rules = {"Work": [" - Visual Studio Code"], "Office": [" - Word"]}
+    tracker = make_tracker(rules)
+    rules["Office"].append(" - Mail")
+    # "(2) Inbox - Mail" was normalized to "Inbox - Mail": one entry
+    assert tracker.reclassify() == 1
+    last = tracker.reclassifier.last
+    assert last["checked"] == 1 and last["rules"] == 1
+    assert_matches_rebuild(tracker)
+
+
+def test_process_rules():
+    rules = {"Work": [" - Visual Studio Code"]}
+    tracker = make_tracker(rules)
+    tracker.titles.set_process("Untitled", r"C:\Windows\notepad.exe")
+    rules["Work"].append(("process", "NOTEPAD.EXE"))
+    assert tracker.reclassify() == 1
+    assert tracker.aggregates.group_of_key("Untitled") == "Work"
+    assert_matches_rebuild(tracker)
+
+
+def test_new_titles_after_a_run_are_indexed():
+    rules = {"Work": [" - Visual Studio Code"]}
+    tracker = make_tracker(rules)
+    rules["Work"].append(" - Word")
+    tracker.reclassify()
+    tracker.handle_event("focus", START + 10_000, "draft - Notes")
+    tracker.settle(START + 10_100)
+    rules["Work"].append(" - Notes")
+    assert tracker.reclassify() == 1
+    assert_matches_rebuild(tracker)
+
+
+def test_index_merges_large_batches_without_starting_over():
+    store = TitleStore()
+    times = store.times
+    for i in range(1000):
+        times[f"{i} - Word"] = 1.0
+    index = TitleIndex(times)
+    index.sync()
+    resets = times.resets
+    for i in range(0, 1000, 2):
+        del times[f"{i} - Word"]
+    for i in range(2 * CHANGE_LOG_SIZE):
+        times[f"p{i} - Mail"] = 1.0
+    for i in range(5):
+        times[f"q{i} - Word"] = 1.0  # a small batch after the big ones
+    index.sync()
+    assert times.resets == resets
+    assert len(index) == len(times)
+    assert sorted(index.with_suffix(" - Word")) == sorted(t for t in times if t.endswith(" - Word"))
+    assert sorted(index.with_prefix("p1")) == sorted(t for t in times if t.startswith("p1"))
+    assert sorted(index.containing("9 -")) == sorted(t for t in times if "9 -" in t)
+    assert sorted(index.matching(r"^q\d - ")) == [f"q{i} - Word" for i in range(5)]
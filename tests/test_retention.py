@@ -0,0 +1,108 @@
+"""RetentionPolicy: folding small, long-unseen entries into per-group rollups."""
+import pytest
+
+from persistence import TrackerStore
+from retention import RetentionPolicy
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+DAY = 86400.0
+
+# (title, seconds of focus)
+ACTIVITY = [("a - Word", 30), ("b - Word", 500), ("c - Word", 10), ("x - Discord", 5), ("y - Discord", 20),
+            ("big - Discord", 300), ("loose end", 15), ("current - Word", 40)]
+
+
+def make_tracker():
+    tracker = Tracker(ReplayWindowSource([]), min_display_time=60)
+    t = START
+    for title, seconds in ACTIVITY:
+        tracker.handle_event("focus", t, title)
+        t += seconds
+    tracker.settle(t)
+    return tracker
+
+
+def totals(tracker):
+    a = tracker.aggregates
+    return a.total, dict(a.group_totals), dict(a.group_counts), a.insignificant_total
+
+
+def test_sweep_folds_small_old_entries():
+    tracker = make_tracker()
+    before = totals(tracker)
+    policy = RetentionPolicy(tracker, threshold=60, max_age=30 * DAY, batch=3)
+
+    assert policy.sweep(START + DAY) == 0  # nothing is old enough yet
+    folded = policy.sweep(START + 31 * DAY)
+    # everything below 60s except the window that still has focus
+    assert folded == 5
+    assert set(tracker.window_times) == {"b - Word", "big - Discord", "current - Word"}
+    assert tracker.rollups == {"Office": [40.0, 2], "Social": [25.0, 2], "Uncategorized": [15.0, 1]}
+    assert policy.folded_seconds == pytest.approx(80)
+    assert policy.sweeps == 2
+    # the total doesn't change; folded time shows in its group instead of below the display threshold
+    total, group_totals, group_counts, insignificant = totals(tracker)
+    assert total == before[0]
+    assert group_totals == {"Office": 540.0, "Social": 325.0, "Uncategorized": 15.0}
+    assert insignificant == 40.0  # just the current window
+    assert sum(group_totals.values()) + insignificant == total
+
+
+def test_rollups_add_up_across_sweeps():
+    tracker = make_tracker()
+    policy = RetentionPolicy(tracker, threshold=60, max_age=DAY)
+    policy.sweep(START + 2 * DAY)
+    tracker.handle_event("focus", START + 3 * DAY, "d - Word")
+    tracker.handle_event("focus", START + 3 * DAY + 12, "b - Word")
+    policy.sweep(START + 5 * DAY)
+    assert tracker.rollups["Office"] == [52.0, 3]
+    assert "d - Word" not in tracker.window_times
+
+
+@pytest.mark.parametrize("max_age", [None, 0])
+def test_disabled(max_age):
+    tracker = make_tracker()
+    policy = RetentionPolicy(tracker, threshold=60, max_age=max_age)
+    assert policy.sweep(START + 365 * DAY) == 0
+    assert not tracker.rollups
+
+
+def test_off_by_default():
+    tracker = make_tracker()
+    assert RetentionPolicy(tracker).sweep(START + 365 * DAY) == 0
+    assert len(tracker.window_times) == len(ACTIVITY)
+
+
+def test_unseen_entries_start_their_clock():
+    tracker = make_tracker()
+    # as loaded from a save file written before last-seen times were kept
+    tracker.window_times["old - Word"] = 10.0
+    tracker.aggregates.rebuild()
+    policy = RetentionPolicy(tracker, threshold=60, max_age=DAY)
+    policy.sweep(START + 2 * DAY)
+    assert "old - Word" in tracker.window_times
+    assert tracker.titles.last_seen("old - Word") == START + 2 * DAY
+    policy.sweep(START + 3 * DAY)
+    assert "old - Word" not in tracker.window_times
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_folds_survive_reload(tmp_path, snapshot_format):
+    save_file, journal_file = str(tmp_path / "w.json"), str(tmp_path / "w.journal")
+    tracker = make_tracker()
+    store = TrackerStore(tracker, save_file, journal_file, snapshot_format=snapshot_format)
+    store.compact()
+    RetentionPolicy(tracker, threshold=60, max_age=DAY).sweep(START + 2 * DAY)
+    store.save()  # the folds go to the journal
+
+    for _ in range(2):  # replayed from the journal, then from a compacted snapshot
+        loaded = Tracker(ReplayWindowSource([]), min_display_time=60)
+        loaded_store = TrackerStore(loaded, save_file, journal_file, snapshot_format=snapshot_format)
+        loaded_store.load()
+        assert loaded.rollups == tracker.rollups
+        assert dict(loaded.window_times.items()) == dict(tracker.window_times.items())
+        assert totals(loaded) == totals(tracker)
+        loaded_store.compact()
+        loaded_store.close()
@@ -0,0 +1,129 @@
+"""RuleEngine must return exactly what scanning the rules one by one in order returns."""
+import ntpath
+import random
+import re
+
+import pytest
+
+from classifier import GROUP_RULES, Classifier
+from rules import RuleEngine, changed_rules, parse_rule, required_literal
+
+
+def linear_match(rules, title, process=None):
+    """The original nested loop: the first rule in listing order that matches."""
+    for group, group_rules in rules.items():
+        for rule in group_rules:
+            kind, pattern = parse_rule(rule)
+            if kind == "suffix":
+                matched = title.endswith(pattern)
+            elif kind == "prefix":
+                matched = title.startswith(pattern)
+            elif kind == "contains":
+                matched = pattern in title
+            elif kind == "regex":
+                matched = re.search(pattern, title) is not None
+            else:
+                matched = bool(process) and ntpath.basename(process).lower() == pattern.lower()
+            if matched:
+                return group, kind, pattern
+    return None
+
+
+MIXED_RULES = {
+    "Mail": [("regex", r"\(\d+\) Inbox"), ("prefix", "Inbox - "), " - Mail"],
+    "Work": [" - Visual Studio Code", ("contains", "Jira"), ("process", "code.exe"), ".pdf"],
+    "Video": [("contains", "YouTube"), ("regex", r"(?i)netflix"), ("regex", r"^(\w+) \1$")],
+    "Chat": [" - Discord", ("contains", "Tube"), ("prefix", "Inbox"), "Code", ("process", "Discord.exe")],
+    "Other": [("contains", ""), " - Mail"],  # an empty pattern matches everything; duplicates lose
+}
+
+TITLES = [
+    "(3) Inbox - Mail", "Inbox - Mail", "Inbox zero", "main.py - Visual Studio Code", "Visual Studio Code",
+    "PROJ-1 - Jira", "paper.pdf", "cats - YouTube", "YouTubers", "Netflix", "echo echo", "echo foxtrot",
+    "general - Discord", "Tube map", "Code", "", "nothing matches here", "Inbox", "x - Mail - Discord",
+]
+PROCESSES = [None, "", r"C:\Program Files\VS Code\Code.exe", "/usr/bin/discord.exe", "firefox.exe"]
+
+
+@pytest.mark.parametrize("rules", [GROUP_RULES, MIXED_RULES, {}])
+def test_first_match_wins_like_linear_scan(rules):
+    engine = RuleEngine(rules)
+    for title in TITLES:
+        for process in PROCESSES:
+            assert engine.match(title, process) == linear_match(rules, title, process), (title, process)
+
+
+def test_random_rules_and_titles():
+    rng = random.Random(7)
+    alphabet = "ab -."
+    for _ in range(50):
+        rules = {}
+        for g in range(rng.randint(1, 4)):
+            rules[f"g{g}"] = []
+            for _ in range(rng.randint(0, 6)):
+                pattern = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+                kind = rng.choice(["suffix", "prefix", "contains", "regex"])
+                rules[f"g{g}"].append(pattern if kind == "suffix" else (kind, re.escape(pattern) if kind == "regex" else pattern))
+        engine = RuleEngine(rules)
+        for _ in range(40):
+            title = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+            assert engine.match(title) == linear_match(rules, title), (rules, title)
+
+
+def test_sync_picks_up_edits():
+    rules = {"Work": [" - Code"], "Chat": [" - Slack"]}
+    engine = RuleEngine(rules)
+    version = engine.version
+    assert not engine.sync(rules)
+    rules["Work"].insert(0, ("contains", "Slack"))
+    assert engine.sync(rules)
+    assert engine.version > version
+    assert engine.match("x - Slack") == ("Work", "contains", "Slack")
+
+
+def test_sync_picks_up_same_length_edits():
+    rules = {"Work": [" - Visual Studio Code", " - Slack"], "Chat": [" - Discord"]}
+    engine = RuleEngine(rules)
+    rules["Work"][0] = " - Code"
+    assert engine.sync(rules)
+    assert engine.match("x - Code") == ("Work", "suffix", " - Code")
+    rules["Work"].reverse()
+    assert engine.sync(rules)
+    assert engine.entries[0] == ("Work", "suffix", " - Slack")
+    rules["Chat"], rules["Work"] = rules["Work"], rules["Chat"]
+    assert engine.sync(rules)
+    assert engine.match("x - Discord") == ("Work", "suffix", " - Discord")
+    assert not engine.sync(rules)
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine({"Work": [("glob", "*.py")]})
+
+
+def test_required_literal():
+    assert required_literal(r"\(\d+\) Inbox") == ") Inbox"
+    assert required_literal(r"(?i)inbox") is None
+    assert required_literal(r"a|b") is None
+
+
+def test_changed_rules():
+    old = RuleEngine({"A": [" - x", " - y"], "B": [" - z"]}).entries
+    assert changed_rules(old, old) == []
+    new = RuleEngine({"A": [" - y", " - x"], "B": [" - z"], "C": [("prefix", "p")]}).entries
+    # the added rule, and every common rule from the first one out of order
+    assert set(changed_rules(old, new)) == {("suffix", " - x"), ("suffix", " - y"), ("suffix", " - z"),
+                                            ("prefix", "p")}
+    appended = RuleEngine({"A": [" - x", " - y"], "B": [" - z", " - w"]}).entries
+    assert changed_rules(old, appended) == [("suffix", " - w")]
+
+
+def test_classifier_syncs_edits_once_per_version_check():
+    rules = {"Work": [" - Code"]}
+    classifier = Classifier(rules=rules)
+    assert classifier.group_of("x - Slack") == "Uncategorized"
+    rules["Work"][0] = " - Slack"
+    # classify doesn't rescan the rules; reading version (once per refresh) does
+    assert classifier.group_of("x - Slack") == "Uncategorized"
+    classifier.version
+    assert classifier.group_of("x - Slack") == "Work"
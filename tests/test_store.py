@@ -0,0 +1,63 @@
+"""TrackerStore: what the window can show before loading, and what compactions write."""
+import os
+
+import pytest
+
+from persistence import TrackerStore
+from tracker import Tracker
+from window_sources import ReplayWindowSource
+
+START = 1_700_000_000.0
+
+
+def make_store(tmp_path, **kwargs):
+    tracker = Tracker(ReplayWindowSource([]))
+    store = TrackerStore(tracker, str(tmp_path / "window_times.json"), str(tmp_path / "window_times.journal"), **kwargs)
+    return tracker, store
+
+
+@pytest.mark.parametrize("snapshot_format", [None, "json", "binary"])
+def test_read_totals_without_loading(tmp_path, snapshot_format):
+    kwargs = {} if snapshot_format is None else {"snapshot_format": snapshot_format}
+    tracker, store = make_store(tmp_path, **kwargs)
+    assert store.read_totals() is None
+    store.load()
+    for i, title in enumerate(["a - Word", "b - Word", "c - Discord"]):
+        tracker.handle_event("focus", START + 100 * i, title)
+    tracker.handle_event("idle", START + 250, True)
+    tracker.handle_event("idle", START + 300, False)
+    store.save()
+
+    _, fresh = make_store(tmp_path, **kwargs)
+    cached = fresh.read_totals()
+    assert cached["totals"]["total"] == pytest.approx(250)
+    assert cached["totals"]["group_totals"] == {"Office": 200.0}
+    assert cached["count"] == 3
+    assert cached["AFK_time"] == pytest.approx(50)
+
+
+def test_totals_follow_compactions(tmp_path):
+    tracker, store = make_store(tmp_path)
+    store.load()
+    tracker.handle_event("focus", START, "a - Word")
+    tracker.settle(START + 100)
+    store.save()
+    tracker.settle(START + 400)
+    store.compact()
+    _, fresh = make_store(tmp_path)
+    assert fresh.read_totals()["totals"]["total"] == pytest.approx(400)
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_compaction_threshold_counts_every_rewritten_file(tmp_path, snapshot_format):
+    tracker, store = make_store(tmp_path, snapshot_format=snapshot_format)
+    store.load()
+    for i in range(50):
+        tracker.handle_event("focus", START + 3600 * i, f"{i} - Word")
+    store.compact()
+    files = [store.save_file, store.buckets_file] + ([store.totals_file] if snapshot_format == "json" else [])
+    written = sum(os.path.getsize(path) for path in files)
+    assert store.journal.snapshot_bytes == written
+    _, fresh = make_store(tmp_path, snapshot_format=snapshot_format)
+    fresh.load()
+    assert fresh.journal.snapshot_bytes == written
@@ -0,0 +1,69 @@
+"""LRUCache bounds and sharing between threads."""
+import threading
+
+from classifier import Classifier
+from title_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["hits"] == 3
+
+
+def test_put_with_stale_token_is_dropped():
+    cache = LRUCache()
+    cache.validate(1)
+    cache.put("a", "old", 1)
+    cache.validate(2)
+    cache.put("b", "old", 1)
+    cache.put("c", "new", 2)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, None, "new")
+
+
+def test_shared_between_threads():
+    cache = LRUCache(64)
+    errors = []
+
+    def hammer(offset):
+        try:
+            for i in range(20000):
+                key = (i * 7 + offset) % 200
+                if cache.get(key) is None:
+                    cache.put(key, key)
+                if i % 5000 == 0:
+                    cache.validate(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache) <= 64
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 80000
+
+
+def test_classifier_from_several_threads():
+    classifier = Classifier(cache_size=16)
+    titles = [f"doc {i} - Word" for i in range(50)] + [f"chat {i} - Discord" for i in range(50)]
+    results = {}
+
+    def classify(n):
+        results[n] = [classifier.group_of(classifier.normalize(title)) for title in titles * 20]
+
+    threads = [threading.Thread(target=classify, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expected = (["Office"] * 50 + ["Social"] * 50) * 20
+    assert [results[n] == expected for n in range(4)] == [True] * 4
@@ -0,0 +1,46 @@
+"""TitleStore: interned titles with array-backed columns."""
+import sys
+
+from title_store import TitleStore
+
+
+def test_more_than_32767_groups_and_processes():
+    store = TitleStore()
+    for i in range(40_000):
+        title = f"{i} - App"
+        store.times[title] = 1.0
+        store.groups[title] = f"g{i}"
+        store.set_process(title, f"app{i}.exe")
+    assert store.groups["39999 - App"] == "g39999"
+    assert store.process_of("39999 - App") == "app39999.exe"
+
+
+def test_process_names_are_freed_with_their_titles():
+    store = TitleStore()
+    store.times["a - Code"] = 1.0
+    store.times["b - Code"] = 1.0
+    store.set_process("a - Code", "code.exe")
+    store.set_process("b - Code", "code.exe")
+    store.set_process("a - Code", "vim.exe")
+    del store.times["b - Code"]
+    assert store.titles_with_process(lambda name: name == "code.exe") == []
+    assert "code.exe" not in store._process_index
+    store.times["c - Code"] = 1.0
+    store.set_process("c - Code", "emacs.exe")
+    assert len(store._process_names) == 2  # the freed index was reused
+    assert store.titles_with_process(lambda name: name.startswith("e")) == ["c - Code"]
+
+
+def test_memory_usage_keeps_running_totals():
+    store = TitleStore()
+    for i in range(100):
+        store.times[f"{i} - Word"] = 1.0
+        store.originals[f"{i} - Word"] = f"({i}) {i} - Word" if i % 3 else f"{i} - Word"
+    store.originals["5 - Word"] = "5 - Word"
+    for i in range(0, 100, 4):
+        del store.times[f"{i} - Word"]
+        del store.originals[f"{i} - Word"]
+    usage = store.memory_usage()
+    live = [t for t in store._titles if t is not None]
+    assert usage["title_strings"] == sum(map(sys.getsizeof, live))
+    assert usage["originals"] == sys.getsizeof(store._originals) + sum(map(sys.getsizeof, store._originals.values()))
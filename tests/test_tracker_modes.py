@@ -0,0 +1,114 @@
+"""Polling and event-driven tracking should attribute the same time."""
+import pytest
+
+from tracker import Tracker
+from window_sources import (RecordingWindowSource, ReplayWindowSource, SimulatedEventSource, generate_events,
+                            load_events, save_events)
+
+START = 1_700_000_000.0
+INTERVAL = 0.5
+
+EVENTS = [
+    (START, "Report - Word", 0.0),
+    (START + 100, "general - Discord", 0.0),
+    (START + 250, "general - Discord", 1.0),  # idle since START + 249
+    (START + 400, "Report - Word", 0.0),
+    (START + 430, "cats - YouTube — Mozilla Firefox", 0.0),
+    (START + 450, "cats - YouTube — Mozilla Firefox", 1.0),  # idle, but exempt
+    (START + 600, "Report - Word", 0.0),
+    (START + 700, "Report - Word", 0.0),
+]
+
+
+def poll(events, end, interval=INTERVAL):
+    tracker = Tracker(ReplayWindowSource(events), afk_timeout=60)
+    while tracker.clock() < end:
+        tracker.source.advance(interval)
+        tracker.tick()
+    return tracker
+
+
+def push(events, end):
+    source = SimulatedEventSource(events)
+    tracker = Tracker(source, afk_timeout=60)
+    assert tracker.start_events(fallback_interval=None)
+    source.advance_to(end)
+    tracker.settle(end)
+    return tracker
+
+
+def test_event_mode_credits_exact_boundaries():
+    tracker = push(EVENTS, START + 700)
+    times = dict(tracker.window_times.items())
+    # Word: 0-100, 400-430, 600-700; Discord until the idle threshold is crossed at 249 + 60
+    assert times["Report - Word"] == pytest.approx(230)
+    assert times["general - Discord"] == pytest.approx(209)
+    assert tracker.AFK_time == pytest.approx(91)
+    # watching a video while idle still counts
+    assert times["cats - YouTube — Mozilla Firefox"] == pytest.approx(170)
+    assert tracker.total_tracked_time() + tracker.AFK_time == pytest.approx(700)
+
+
+def test_polling_matches_event_mode():
+    polled = poll(EVENTS, START + 700)
+    pushed = push(EVENTS, START + 700)
+    for title, seconds in pushed.window_times.items():
+        assert polled.window_times[title] == pytest.approx(seconds, abs=2 * INTERVAL)
+    assert polled.AFK_time == pytest.approx(pushed.AFK_time, abs=2 * INTERVAL)
+    assert polled.wakeups() > 10 * pushed.wakeups()
+
+
+def test_polling_matches_event_mode_on_generated_stream():
+    titles = ["a - Word", "b - Discord", "c - Visual Studio Code", "d.pdf", "Untitled"]
+    events = generate_events(300, titles, start=START, mean_dwell=20.0, idle_chance=0.1, seed=3)
+    end = events[-1][0] + 30
+    polled = poll(events, end)
+    pushed = push(events, end)
+    error = sum(abs(polled.window_times.get(title, 0.0) - seconds) for title, seconds in pushed.window_times.items())
+    # each change can be misattributed by at most one polling interval
+    assert error <= 2 * INTERVAL * len(events)
+    assert polled.total_tracked_time() + polled.AFK_time == pytest.approx(
+        pushed.total_tracked_time() + pushed.AFK_time, abs=INTERVAL)
+    assert set(pushed.window_times) <= set(titles)
+
+
+def test_buckets_follow_credited_time():
+    tracker = push(EVENTS, START + 700)
+    assert tracker.buckets.total(START, START + 700) == pytest.approx(tracker.total_tracked_time())
+    groups = tracker.buckets.group_totals(START, START + 700)
+    assert groups["Office"] == pytest.approx(230)
+    assert groups["Social"] == pytest.approx(209)
+
+
+PROCESS_EVENTS = [
+    (START, "main.py", 0.0, r"C:\Tools\code.exe"),
+    (START + 50, "Untitled", 0.0),
+    (START + 80, "scratch", 0.0, r"C:\Tools\code.exe"),
+    (START + 140, "scratch", 0.0, r"C:\Tools\code.exe"),
+]
+
+
+@pytest.mark.parametrize("run", [poll, push])
+def test_events_with_process(run):
+    tracker = run(PROCESS_EVENTS, START + 140)
+    tracker.classifier.rules = dict(tracker.classifier.rules, Editor=[("process", "code.exe")])
+    tracker.reclassify()
+    assert tracker.titles.process_of("main.py") == r"C:\Tools\code.exe"
+    assert tracker.titles.process_of("Untitled") == ""
+    assert tracker.aggregates.group_of_key("scratch") == "Editor"
+    assert tracker.aggregates.group_of_key("Untitled") == "Uncategorized"
+
+
+def test_save_and_load_events(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    save_events(path, PROCESS_EVENTS)
+    assert load_events(path) == PROCESS_EVENTS
+
+
+def test_recording_keeps_the_process():
+    recorder = RecordingWindowSource(ReplayWindowSource(PROCESS_EVENTS))
+    tracker = Tracker(recorder, afk_timeout=60)
+    while tracker.clock() < START + 140:
+        recorder.inner.advance(INTERVAL)
+        tracker.tick()
+    assert [event[1:] for event in recorder.events] == [event[1:] for event in PROCESS_EVENTS[:3]]
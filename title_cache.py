@@ -0,0 +1,76 @@
+"""Bounded LRU cache used to memoize title normalization and classification."""
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used mapping with a size bound and hit/miss counters.
+
+    `token` is an arbitrary value describing the inputs the cached answers depend on
+    (e.g. rule version and truncation length). Calling validate() with a different
+    token drops every entry, so stale answers are never served.
+
+    Safe to share between threads (the tracker's event/poll thread and the UI both
+    classify titles): every operation holds an internal lock.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.token = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, token=_MISSING):
+        """Store `value`; if `token` is given, only while it is still the current token."""
+        with self._lock:
+            if token is not _MISSING and token != self.token:
+                return  # computed under inputs another thread has since invalidated
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def validate(self, token):
+        """Clear the cache if `token` differs from the one the entries were computed under."""
+        with self._lock:
+            if token != self.token:
+                if self._data:
+                    self._data.clear()
+                    self.invalidations += 1
+                self.token = token
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._data)
+        lookups = hits + misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
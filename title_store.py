@@ -0,0 +1,444 @@
+"""Compact storage for per-title data: interned titles, array-backed durations and group IDs.
+
+Each canonical title is stored once and given an integer ID. Durations live in an
+array of doubles and group assignments in an array of small ints indexed by that
+ID, instead of a dict of boxed floats plus a second dict of group names. Original
+titles are only kept when they differ from the canonical title.
+
+The data is reached through mapping views that behave like the containers they
+replace, so the rest of the code keeps using plain mapping operations:
+  store.times      like the old defaultdict(float) window_times
+  store.originals  like the old window_original_titles dict
+  store.groups     canonical -> group name (AggregateIndex's key -> group map)
+An ID is freed (and reused) once a title is in none of the three, and a process
+name once no title refers to it.
+"""
+import sys
+from array import array
+from collections import Counter
+from collections.abc import MutableMapping
+
+IN_TIMES, HAS_ORIGINAL, HAS_GROUP = 1, 2, 4
+CHANGE_LOG_SIZE = 4096  # keys a view logs for a watcher before it has to catch up or start over
+_MISSING = object()
+
+
+class TitleStore:
+    def __init__(self):
+        self._ids = {}  # title -> id
+        self._titles = []  # id -> title, None for a free id
+        self._free = []  # ids to reuse
+        self._flags = array("B")  # id -> IN_TIMES | HAS_ORIGINAL | HAS_GROUP
+        self._seconds = array("d")  # id -> seconds (while IN_TIMES)
+        self._group_ids = array("i")  # id -> index into _group_names (while HAS_GROUP)
+        self._last_seen = array("d")  # id -> when the title last had focus (0.0 = unknown)
+        self._process_ids = array("i")  # id -> index into _process_names, -1 = unknown
+        self._group_names = []
+        self._group_index = {}  # group name -> index
+        self._process_names = []  # None for a free index
+        self._process_index = {}  # process name -> index
+        self._process_refs = []  # index -> titles using it; the name is freed (and reused) at 0
+        self._free_processes = []
+        self._originals = {}  # id -> original title, only where it differs from the canonical one
+        # running sizes for memory_usage(), so it doesn't have to walk every title
+        self._title_bytes = 0
+        self._original_bytes = 0  # the originals a plain dict would hold (the title itself where no other)
+        self._stored_original_bytes = 0
+        # optional lazy source of originals: callable(id, title) -> original or None, consulted for
+        # timed titles that have no original in memory (e.g. still only in a memory-mapped snapshot)
+        self.original_fallback = None
+
+        self.times = TimesView(self)
+        self.originals = OriginalsView(self)
+        self.groups = GroupsView(self)
+
+    def __len__(self):
+        """Number of interned titles."""
+        return len(self._ids)
+
+    def intern(self, title):
+        """ID for `title`, allocating one if needed."""
+        tid = self._ids.get(title)
+        if tid is not None:
+            return tid
+        if self._free:
+            tid = self._free.pop()
+            self._titles[tid] = title
+        else:
+            tid = len(self._titles)
+            self._titles.append(title)
+            self._flags.append(0)
+            self._seconds.append(0.0)
+            self._group_ids.append(-1)
+            self._last_seen.append(0.0)
+            self._process_ids.append(-1)
+        self._ids[title] = tid
+        self._title_bytes += sys.getsizeof(title)
+        return tid
+
+    def load_times(self, titles, seconds, last_seen=None, processes=None):
+        """Bulk-add `titles` with their `seconds` (and optional `last_seen`) sequences.
+
+        processes: optional (process index per title, -1 for none; list of process names).
+        Much faster than assigning through `times` one by one when the store is empty,
+        and IDs then follow the order of `titles`. Falls back to assignment otherwise.
+        """
+        if self._titles:
+            for i, title in enumerate(titles):
+                self.times[title] = seconds[i]
+                if last_seen is not None:
+                    self.set_last_seen(title, last_seen[i])
+                if processes is not None and processes[0][i] >= 0:
+                    self.set_process(title, processes[1][processes[0][i]])
+            return
+        n = len(titles)
+        self._titles = list(titles)
+        self._ids = {title: tid for tid, title in enumerate(self._titles)}
+        if len(self._ids) != n:
+            raise ValueError("duplicate titles")
+        self._flags = array("B", bytes([IN_TIMES]) * n)
+        self._free = []
+        self._seconds = seconds if isinstance(seconds, array) else array("d", seconds)
+        self._group_ids = array("i", [-1]) * n
+        if last_seen is None:
+            self._last_seen = array("d", bytes(8 * n))
+        else:
+            self._last_seen = last_seen if isinstance(last_seen, array) else array("d", last_seen)
+        self._process_ids = array("i", [-1]) * n
+        if processes is not None:
+            ids, names = processes
+            remap = [self._process_id(name) for name in names]
+            self._process_ids = array("i", (remap[i] if i >= 0 else -1 for i in ids))
+            for i, refs in Counter(ids).items():
+                if i >= 0:
+                    self._process_refs[remap[i]] += refs
+            for pid in remap:
+                if not self._process_refs[pid]:
+                    self._release_process(pid)
+        self._title_bytes = sum(map(sys.getsizeof, self._titles))
+        self.times._count = n
+        self.times.resets += 1
+
+    def id_of(self, title):
+        return self._ids.get(title)
+
+    def title_of(self, tid):
+        return self._titles[tid]
+
+    def last_seen(self, title):
+        """When `title` last had focus, or 0.0 if unknown."""
+        tid = self._ids.get(title)
+        return self._last_seen[tid] if tid is not None else 0.0
+
+    def set_last_seen(self, title, timestamp):
+        tid = self._ids.get(title)
+        if tid is not None and timestamp > self._last_seen[tid]:
+            self._last_seen[tid] = timestamp
+
+    def process_of(self, title):
+        """Executable `title` was last seen in, or "" if unknown."""
+        tid = self._ids.get(title)
+        if tid is None:
+            return ""
+        pid = self._process_ids[tid]
+        return self._process_names[pid] if pid >= 0 else ""
+
+    def set_process(self, title, process):
+        """Remember the executable `title` was seen in (interns the title)."""
+        tid = self.intern(title)
+        self._set_process_id(tid, self._process_id(process) if process else -1)
+
+    def titles_with_process(self, matches):
+        """Timed titles whose executable name satisfies matches(name)."""
+        wanted = {pid for pid, name in enumerate(self._process_names) if name is not None and matches(name)}
+        if not wanted:
+            return []
+        titles, flags = self._titles, self._flags
+        return [titles[tid] for tid, pid in enumerate(self._process_ids)
+                if pid in wanted and flags[tid] & IN_TIMES]
+
+    def scan(self, start, count):
+        """(title, seconds, last_seen) for timed titles with IDs in [start, start + count), and the next start.
+
+        The next start is 0 once the end is reached, so repeated calls sweep all IDs in batches.
+        """
+        end = min(start, len(self._titles)) + count
+        flags, seconds, seen = self._flags, self._seconds, self._last_seen
+        batch = [(title, seconds[tid], seen[tid])
+                 for tid, title in enumerate(self._titles[start:end], start)
+                 if title is not None and flags[tid] & IN_TIMES]
+        return batch, (end if end < len(self._titles) else 0)
+
+    def _set_flag(self, tid, flag):
+        was = self._flags[tid] & flag
+        self._flags[tid] |= flag
+        return not was
+
+    def _clear_flag(self, tid, flag):
+        """Drop `flag` from tid, freeing the ID if nothing refers to it any more."""
+        self._flags[tid] &= ~flag & 0xFF
+        if not self._flags[tid]:
+            title = self._titles[tid]
+            del self._ids[title]
+            self._title_bytes -= sys.getsizeof(title)
+            self._titles[tid] = None
+            self._seconds[tid] = 0.0
+            self._group_ids[tid] = -1
+            self._last_seen[tid] = 0.0
+            self._set_process_id(tid, -1)
+            self._free.append(tid)
+
+    def _live(self, flag):
+        """(id, title) for every title carrying `flag`."""
+        flags = self._flags
+        for tid, title in enumerate(self._titles):
+            if title is not None and flags[tid] & flag:
+                yield tid, title
+
+    def _group_id(self, group):
+        gid = self._group_index.get(group)
+        if gid is None:
+            gid = self._group_index[group] = len(self._group_names)
+            self._group_names.append(group)
+        return gid
+
+    def _process_id(self, process):
+        """Index for `process`, allocating one if needed; it stays allocated while a title refers to it."""
+        pid = self._process_index.get(process)
+        if pid is None:
+            if self._free_processes:
+                pid = self._free_processes.pop()
+                self._process_names[pid] = process
+            else:
+                pid = len(self._process_names)
+                self._process_names.append(process)
+                self._process_refs.append(0)
+            self._process_index[process] = pid
+        return pid
+
+    def _set_process_id(self, tid, pid):
+        old = self._process_ids[tid]
+        if old == pid:
+            return
+        if pid >= 0:
+            self._process_refs[pid] += 1
+        self._process_ids[tid] = pid
+        if old >= 0:
+            self._process_refs[old] -= 1
+            if not self._process_refs[old]:
+                self._release_process(old)
+
+    def _release_process(self, pid):
+        del self._process_index[self._process_names[pid]]
+        self._process_names[pid] = None
+        self._free_processes.append(pid)
+
+    def _count_original(self, tid, title, sign):
+        """Add (sign 1) or remove (sign -1) the original of `tid` from the running sizes."""
+        stored = self._originals.get(tid)
+        if stored is not None:
+            self._stored_original_bytes += sign * sys.getsizeof(stored)
+        self._original_bytes += sign * sys.getsizeof(stored if stored is not None else title)
+
+    def memory_usage(self):
+        """Approximate bytes held, by component, next to an estimate for the plain dicts it replaces.
+
+        String sizes are kept as running totals, so this doesn't walk the titles.
+        """
+        strings = self._title_bytes
+        usage = {
+            "titles": len(self._ids),
+            "ids_dict": sys.getsizeof(self._ids),
+            "title_list": sys.getsizeof(self._titles),
+            "title_strings": strings,
+            "durations_array": sys.getsizeof(self._seconds),
+            "group_ids_array": sys.getsizeof(self._group_ids),
+            "flags_array": sys.getsizeof(self._flags),
+            "last_seen_array": sys.getsizeof(self._last_seen),
+            "process_ids_array": sys.getsizeof(self._process_ids),
+            "originals": sys.getsizeof(self._originals) + self._stored_original_bytes,
+        }
+        usage["total"] = sum(v for k, v in usage.items() if k != "titles")
+        # window_times (boxed floats) + window_original_titles (a string per title) + key -> group dict
+        usage["plain_dicts_estimate"] = (strings + self._original_bytes + 3 * sys.getsizeof(self._ids)
+                                         + self.times._count * sys.getsizeof(0.0))
+        return usage
+
+
+class _View(MutableMapping):
+    flag = 0
+
+    def __init__(self, store):
+        self._store = store
+        self._count = 0
+        # Keys added or removed since a watcher last emptied this list (None while nobody watches);
+        # `resets` counts clears, bulk loads and log overflows, after which a watcher starts over.
+        # A watcher that sets on_full is called to empty a full log instead of it overflowing.
+        self.changes = None
+        self.resets = 0
+        self.on_full = None
+
+    def _log(self, key):
+        if len(self.changes) >= CHANGE_LOG_SIZE:
+            if self.on_full is None:
+                self.changes = None
+                self.resets += 1
+                return
+            self.on_full()
+        self.changes.append(key)
+
+    def __contains__(self, key):
+        tid = self._store._ids.get(key)
+        return tid is not None and bool(self._store._flags[tid] & self.flag)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for _, title in self._store._live(self.flag):
+            yield title
+
+    def _add(self, key):
+        store = self._store
+        tid = store.intern(key)
+        if store._set_flag(tid, self.flag):
+            self._count += 1
+            if self.changes is not None:
+                self._log(key)
+        return tid
+
+    def __delitem__(self, key):
+        store = self._store
+        tid = store._ids.get(key)
+        if tid is None or not store._flags[tid] & self.flag:
+            raise KeyError(key)
+        self._count -= 1
+        self._forget(tid)
+        store._clear_flag(tid, self.flag)
+        if self.changes is not None:
+            self._log(key)
+
+    def _forget(self, tid):
+        pass
+
+    def pop(self, key, default=_MISSING):
+        if key not in self:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        value = self[key]
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        store = self._store
+        for tid, _ in list(store._live(self.flag)):
+            self._forget(tid)
+            store._clear_flag(tid, self.flag)
+        self._count = 0
+        self.resets += 1
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class TimesView(_View):
+    """canonical title -> seconds; reading a missing title adds it with 0.0, like defaultdict(float)."""
+    flag = IN_TIMES
+
+    def __getitem__(self, key):
+        tid = self._add(key)
+        return self._store._seconds[tid]
+
+    def get(self, key, default=None):
+        store = self._store
+        tid = store._ids.get(key)
+        if tid is None or not store._flags[tid] & IN_TIMES:
+            return default
+        return store._seconds[tid]
+
+    def __setitem__(self, key, seconds):
+        tid = self._add(key)
+        self._store._seconds[tid] = seconds
+
+    def _forget(self, tid):
+        self._store._seconds[tid] = 0.0
+
+    def items(self):
+        seconds = self._store._seconds
+        return [(title, seconds[tid]) for tid, title in self._store._live(IN_TIMES)]
+
+    def values(self):
+        seconds = self._store._seconds
+        return [seconds[tid] for tid, _ in self._store._live(IN_TIMES)]
+
+
+class OriginalsView(_View):
+    """canonical title -> original title; only originals that differ from the key are stored."""
+    flag = HAS_ORIGINAL
+
+    def __getitem__(self, key):
+        store = self._store
+        tid = store._ids.get(key)
+        if tid is None:
+            raise KeyError(key)
+        if not store._flags[tid] & HAS_ORIGINAL:
+            if store.original_fallback is not None and store._flags[tid] & IN_TIMES:
+                original = store.original_fallback(tid, key)
+                if original is not None:
+                    return original
+            raise KeyError(key)
+        return store._originals.get(tid, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, original):
+        store = self._store
+        tid = store._ids.get(key)
+        if tid is not None and store._flags[tid] & HAS_ORIGINAL:
+            store._count_original(tid, key, -1)
+        tid = self._add(key)
+        if original == key:
+            store._originals.pop(tid, None)
+        else:
+            store._originals[tid] = original
+        store._count_original(tid, key, 1)
+
+    def _forget(self, tid):
+        store = self._store
+        store._count_original(tid, store._titles[tid], -1)
+        store._originals.pop(tid, None)
+
+
+class GroupsView(_View):
+    """canonical title -> group name, stored as a small int per title."""
+    flag = HAS_GROUP
+
+    def __getitem__(self, key):
+        store = self._store
+        tid = store._ids.get(key)
+        if tid is None or not store._flags[tid] & HAS_GROUP:
+            raise KeyError(key)
+        return store._group_names[store._group_ids[tid]]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, group):
+        tid = self._add(key)
+        self._store._group_ids[tid] = self._store._group_id(group)
+
+    def _forget(self, tid):
+        self._store._group_ids[tid] = -1
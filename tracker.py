@@ -0,0 +1,347 @@
+"""Headless tracking core: who has focus, for how long, and whether the user is AFK.
+
+Tracker owns the tracking state (window_times, AFK time, current window, last switch
+time) and the tick/credit logic. It has no Tk dependency: it can be ticked by hand
+(tests, replay benchmarks), run on its own background thread, and have a UI attach
+to it and detach again through subscribe()/unsubscribe(). Time is always credited
+from clock timestamps, so irregular or late ticks do not lose accuracy.
+
+Two ways to drive it: polling (tick() every interval, start()) or event-driven
+(start_events()), where the window source pushes focus and idle changes and time is
+credited exactly at those boundaries, so there are no wakeups while nothing changes.
+Event-driven mode falls back to polling for sources that can't push events.
+
+Run `python tracker.py` to track headless and save to the usual files.
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timezone
+
+from aggregates import AggregateIndex
+from bucket_history import BucketHistory
+from classifier import Classifier
+from reclassify import Reclassifier
+from title_store import TitleStore
+
+# Groups whose windows keep counting as active time even when the user is idle
+AFK_EXEMPT_GROUPS = ("Unimportant",)  # Unimportant implies watching a video, so AFK is irrelevant
+
+
+class Tracker:
+    """Credits focus time to canonical window titles.
+
+    source: a window_sources.WindowSource.
+    clock: callable returning the current time in seconds (defaults to the source's clock).
+    Listeners registered with subscribe() are called as listener(event, tracker) after
+    every tick, where event is "switch" (focused title changed), "afk" (user went
+    idle), "active" (user came back) or "tick". They run on whatever thread ticked.
+    """
+
+    def __init__(self, source, classifier=None, clock=None, afk_timeout=60, min_display_time=60):
+        self.source = source
+        self.classifier = classifier if classifier is not None else Classifier()
+        self.clock = clock if clock is not None else source.time
+        self.afk_timeout = afk_timeout
+        self.lock = threading.RLock()  # held while state changes; readers on other threads take it too
+
+        # Titles are interned once; durations and group IDs are array-backed (see title_store)
+        self.titles = TitleStore()
+        self.window_times = self.titles.times  # key: canonical_title, value: seconds
+        self.window_original_titles = self.titles.originals  # canonical_title -> representative original title (for nicer display)
+        if self.classifier.process_of is None:
+            self.classifier.process_of = self.titles.process_of  # for "process" group rules
+        self.rollups = {}  # group -> [seconds, entries] folded out of window_times by retention
+        self.current_window = None
+        self.last_switch_time = self.clock()
+        self.AFK_time = 0.0
+        self.reset_date = datetime.now(timezone.utc).isoformat()
+        self.afk = False
+        self.user_idle = False  # raw idle state from the source, before AFK_EXEMPT_GROUPS applies
+        self.ticks = 0
+        self.events_handled = 0
+        self.event_driven = False
+
+        # Live totals/top-N over window_times; time is credited through this so they stay in sync
+        self.aggregates = AggregateIndex(self.window_times, self.classifier.group_of, min_display_time,
+                                         groups=self.titles.groups, rollups=self.rollups)
+        # Hourly/daily/monthly time for range views
+        self.buckets = BucketHistory(self.group_of)
+        # Rule edits move only the affected titles between groups
+        self.reclassifier = Reclassifier(self)
+        self.aggregates.on_rebuild = self.reclassifier.reset
+        # optional sinks, set by the owner: journal.Journal and history_db.HistoryDB
+        self.journal = None
+        self.history_db = None
+
+        self._listeners = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    # region listeners
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event):
+        for listener in list(self._listeners):
+            try:
+                listener(event, self)
+            except Exception as e:
+                print("Error in tracker listener:", e)
+    # endregion
+
+    def is_afk(self):
+        return self.source.idle_seconds() > self.afk_timeout
+
+    def tick(self):
+        """Sample the window source once and credit the time since the last tick."""
+        raw_title = self.source.active_title()
+        canonical = self.classifier.normalize(raw_title)
+        # the executable only needs asking for when the title changes
+        process = self.source.active_process() if canonical != self.current_window else None
+
+        # Determine group early for AFK logic
+        group = self.classifier.group_of(canonical, process)
+        user_idle = self.is_afk()
+        afk = user_idle and group not in AFK_EXEMPT_GROUPS
+
+        with self.lock:
+            now = self.clock()
+            previous = self.current_window
+            was_afk = self.afk
+            self.user_idle = user_idle
+            self.afk = afk
+            # a polled interval is attributed according to what this sample sees
+            self._advance(now, afk, canonical)
+            # When window changed, ensure canonical key exists in mapping (ignored while AFK)
+            if not afk and canonical and canonical != self.current_window:
+                self._switch_to(canonical, raw_title, process)
+            self.ticks += 1
+
+        self._notify_changes(previous, was_afk)
+        self._notify("tick")
+
+    def handle_event(self, kind, timestamp, value):
+        """Apply a pushed "focus" (value = raw title) or "idle" (value = bool) change that happened at `timestamp`.
+
+        Everything up to `timestamp` is credited to the state before the change.
+        """
+        with self.lock:
+            # under the lock: events arrive on the source's thread while the UI reads current_window
+            canonical = self.classifier.normalize(value) if kind == "focus" else None
+            process = self.source.active_process() if canonical and canonical != self.current_window else None
+            now = max(timestamp, self.last_switch_time)
+            previous = self.current_window
+            was_afk = self.afk
+            self._advance(now, was_afk, canonical)
+            if kind == "focus":
+                if canonical and canonical != self.current_window:
+                    self._switch_to(canonical, value, process)
+            elif kind == "idle":
+                self.user_idle = bool(value)
+            group = self.classifier.group_of(self.current_window) if self.current_window else None
+            self.afk = self.user_idle and group not in AFK_EXEMPT_GROUPS
+            self.events_handled += 1
+
+        self._notify_changes(previous, was_afk)
+
+    def settle(self, now=None):
+        """Credit the time since the last tick/event to the current state without sampling the source.
+
+        Readers call this before showing totals in event-driven mode, where nothing else
+        moves the clock between events.
+        """
+        with self.lock:
+            now = self.clock() if now is None else now
+            if now > self.last_switch_time:
+                self._advance(now, self.afk, self.current_window)
+
+    def _notify_changes(self, previous, was_afk):
+        if self.afk != was_afk:
+            self._notify("afk" if self.afk else "active")
+        if self.current_window != previous:
+            self._notify("switch")
+
+    # region state changes (callers hold self.lock)
+    def _advance(self, now, afk, fallback_title=None):
+        """Credit [last_switch_time, now) to AFK or the current window."""
+        if afk:
+            self._credit_afk(self.current_window or fallback_title or "Unknown", self.last_switch_time, now)
+        elif self.current_window:
+            self._credit(self.current_window, self.last_switch_time, now)
+        self.last_switch_time = now
+
+    def _credit(self, canonical, start, end):
+        self.aggregates.credit(canonical, end - start)
+        self.titles.set_last_seen(canonical, end)
+        self.buckets.credit(canonical, start, end, self.aggregates.group_of_key(canonical))
+        if self.journal is not None:
+            self.journal.record_interval(canonical, start, end)
+        if self.history_db is not None:
+            self.history_db.record(start, end, canonical, self.classifier.group_of(canonical))
+
+    def _credit_afk(self, canonical, start, end):
+        self.AFK_time += end - start
+        if self.journal is not None:
+            self.journal.record_afk(end - start)
+        if self.history_db is not None:
+            self.history_db.record(start, end, canonical, self.classifier.group_of(canonical), afk=True)
+
+    def _switch_to(self, canonical, raw_title, process=None):
+        self.current_window = canonical
+        if process and process != self.titles.process_of(canonical):
+            # before touch(): classifying the new entry may depend on it
+            self.titles.set_process(canonical, process)
+            if self.journal is not None:
+                self.journal.record_process(canonical, process)
+        known = self.window_original_titles.get(canonical)
+        if known is None or (raw_title and len(raw_title) < len(known)):
+            self.window_original_titles[canonical] = raw_title or canonical
+            if self.journal is not None:
+                self.journal.record_title(canonical, self.window_original_titles[canonical])
+        # ensure key exists in window_times (so it appears in grouped lists even with 0 time)
+        self.aggregates.touch(canonical)
+        self.titles.set_last_seen(canonical, self.last_switch_time)
+    # endregion
+
+    def group_of(self, canonical):
+        """Group of a canonical title; the aggregates' stored assignment when there is one (no classify call)."""
+        return self.aggregates.group_of_key(canonical) or self.classifier.group_of(canonical)
+
+    def reclassify(self):
+        """Apply edits to the classifier's rules to the stored groups. Returns how many entries moved (None if no edits)."""
+        with self.lock:
+            return self.reclassifier.apply()
+
+    def total_tracked_time(self):
+        return self.aggregates.total
+
+    def remove(self, keys):
+        """Forget the given canonical titles entirely (e.g. purge)."""
+        with self.lock:
+            for k in keys:
+                self.aggregates.remove(k)
+                self.window_original_titles.pop(k, None)
+            self.buckets.remove(keys)
+
+    def fold(self, key):
+        """Move `key`'s time into its group's rollup and forget the entry (retention). Returns seconds folded."""
+        with self.lock:
+            if key == self.current_window:
+                return None
+            group = self.aggregates.group_of_key(key) or self.classifier.group_of(key)
+            seconds = self.aggregates.remove(key)
+            if seconds is None:
+                return None
+            self.window_original_titles.pop(key, None)
+            self.aggregates.add_rollup(group, seconds)
+            if self.journal is not None:
+                self.journal.record_fold(key, group)
+            return seconds
+
+    def clear(self):
+        """Reset all tracked data and the reset date."""
+        with self.lock:
+            self.window_times.clear()
+            self.window_original_titles.clear()
+            self.titles.original_fallback = None
+            self.rollups.clear()
+            self.buckets.clear()
+            self.aggregates.rebuild()
+            self.AFK_time = 0.0
+            self.reset_date = datetime.now(timezone.utc).isoformat()
+
+    # region background thread
+    def start(self, interval=0.5):
+        """Tick every `interval` seconds on a daemon thread until stop()."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.interval = interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tracker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print("Error in tracker tick:", e)
+            self._stop.wait(self.interval)
+
+    def start_events(self, fallback_interval=0.5):
+        """Let the source push focus/idle changes; poll every `fallback_interval` if it can't.
+
+        Pass fallback_interval=None to leave polling to the caller. Returns True if event-driven.
+        """
+        if self.source.start_events(self.handle_event, lambda: self.afk_timeout):
+            self.event_driven = True
+            # pick up whatever is focused right now; later changes arrive as events
+            self.handle_event("focus", self.clock(), self.source.active_title())
+        elif fallback_interval is not None:
+            self.start(fallback_interval)
+        return self.event_driven
+
+    def stop(self):
+        if self.event_driven:
+            self.source.stop_events()
+            self.event_driven = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wakeups(self):
+        """How many times the tracker woke up to do work (polls + pushed events)."""
+        return self.ticks + self.events_handled
+    # endregion
+
+
+def main(argv=None):
+    """Track headless (no Tk), saving to the same files the UI uses."""
+    from persistence import TrackerStore
+    from retention import RetentionPolicy
+    from window_sources import Win32WindowSource, ReplayWindowSource, load_events
+
+    parser = argparse.ArgumentParser(description="Run the TimeKeeper tracker without the UI.")
+    parser.add_argument("--save-file", default="window_times.json")
+    parser.add_argument("--journal-file", default="window_times.journal")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between ticks")
+    parser.add_argument("--save-time", type=float, default=60, help="seconds between saves")
+    parser.add_argument("--afk-timeout", type=float, default=60)
+    parser.add_argument("--replay", help="replay a recorded events file instead of reading Win32")
+    parser.add_argument("--retention-days", type=float, default=0,
+                        help="fold entries unseen this long into group rollups (default 0 = off)")
+    parser.add_argument("--retention-threshold", type=float, default=60, help="only fold entries below this many seconds")
+    parser.add_argument("--poll", action="store_true", help="poll every --interval instead of using focus/idle events")
+    parser.add_argument("--snapshot-format", choices=("json", "binary"), default="json",
+                        help="snapshot file format; a snapshot in the other format is migrated on load")
+    args = parser.parse_args(argv)
+
+    source = ReplayWindowSource(load_events(args.replay), realtime=True) if args.replay else Win32WindowSource()
+    tracker = Tracker(source, afk_timeout=args.afk_timeout)
+    store = TrackerStore(tracker, args.save_file, args.journal_file, snapshot_format=args.snapshot_format)
+    retention = RetentionPolicy(tracker, args.retention_threshold, args.retention_days * 86400)
+    store.load()
+    if args.poll:
+        tracker.start(args.interval)
+    else:
+        tracker.start_events(args.interval)
+    try:
+        while True:
+            time.sleep(args.save_time)
+            retention.sweep()
+            store.save()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracker.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
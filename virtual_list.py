@@ -0,0 +1,116 @@
+"""Virtualized list of one-line rows for Tk.
+
+Only the rows inside the viewport get a label. VirtualList keeps one label per
+visible slot and, on scroll, resize or new data, re-points the slots at other rows
+(reconfiguring a label only when what it shows changed). Widget count and layout
+work depend on the window height, not on how many rows there are.
+"""
+import tkinter as tk
+
+
+class VirtualList:
+    """Scrollable list of rows [(row_id, text, bg), ...] where row_id[0] is the row's kind.
+
+    kinds: kind -> dict(font=..., indent=px, relief=..., bd=..., cursor=...) styling.
+    on_click(row_id) is called when a row is clicked.
+    """
+
+    def __init__(self, parent, kinds, row_height=28, on_click=None, bg="gray20", fg="white"):
+        self.kinds = kinds
+        self.row_height = row_height
+        self.on_click = on_click
+        self.fg = fg
+        self.rows = []
+        self.offset = 0  # index of the first visible row
+        self.slots = []  # labels, one per visible row position
+        self.slot_state = []  # per slot: (kind, text, bg) last applied, or None when hidden
+        self.ops = 0  # Tk widget operations in the last render
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.scrollbar = tk.Scrollbar(parent, orient="vertical", command=self.scroll)
+        self.frame.bind("<Configure>", lambda e: self._resize(e.height))
+
+    def pack(self):
+        self.frame.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+    # region data and scrolling
+    def set_rows(self, rows):
+        """Show `rows`, keeping the scroll position. Returns the number of Tk widget operations."""
+        self.rows = rows
+        return self._render()
+
+    def scroll(self, action, amount, unit=None):
+        """Scrollbar command protocol: ("moveto", fraction) or ("scroll", n, "units"|"pages")."""
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.rows))
+        elif unit == "pages":
+            self.offset += int(amount) * max(1, len(self.slots) - 1)
+        else:
+            self.offset += int(amount)
+        self._render()
+
+    def visible_count(self):
+        return len(self.slots)
+    # endregion
+
+    # region slots
+    def _resize(self, height):
+        wanted = max(1, height // self.row_height + 1)
+        while len(self.slots) < wanted:
+            self.slots.append(self._make_slot(len(self.slots)))
+            self.slot_state.append(None)
+        while len(self.slots) > wanted:
+            self.slots.pop().destroy()
+            self.slot_state.pop()
+        self._render()
+
+    def _make_slot(self, index):
+        label = tk.Label(self.frame, text="", fg=self.fg, anchor="w")
+        label.bind("<Button-1>", lambda e, i=index: self._clicked(i))
+        return label
+
+    def _clicked(self, slot):
+        i = self.offset + slot
+        if self.on_click is not None and i < len(self.rows):
+            self.on_click(self.rows[i][0])
+
+    def _render(self):
+        ops = 0
+        total = len(self.rows)
+        visible = len(self.slots)
+        # with a partially visible last slot, the last full page starts at total - (visible - 1)
+        self.offset = max(0, min(self.offset, total - max(1, visible - 1)))
+        for j, label in enumerate(self.slots):
+            i = self.offset + j
+            if i >= total:
+                if self.slot_state[j] is not None:
+                    label.place_forget()
+                    self.slot_state[j] = None
+                    ops += 1
+                continue
+            row_id, text, bg = self.rows[i]
+            state = (row_id[0], text, bg)
+            previous = self.slot_state[j]
+            if previous == state:
+                continue
+            if previous is None or previous[0] != state[0]:
+                # kind changed (or slot was hidden): restyle and lay it out for this kind
+                style = self.kinds[state[0]]
+                label.config(text=text, bg=bg, font=style["font"], relief=style.get("relief", "flat"),
+                             bd=style.get("bd", 0), cursor=style.get("cursor", ""))
+                indent = style.get("indent", 0)
+                label.place(x=indent, y=j * self.row_height, relwidth=1.0, width=-2 * indent,
+                            height=self.row_height - style.get("gap", 1))
+                ops += 2
+            else:
+                label.config(text=text, bg=bg)
+                ops += 1
+            self.slot_state[j] = state
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.ops = ops
+        return ops
+    # endregion
@@ -0,0 +1,404 @@
+"""Where the tracker gets the foreground window title and user idle time from.
+
+Win32WindowSource is what runs on the desktop. ReplayWindowSource plays back a
+recorded or generated stream of (timestamp, title, idle_seconds[, process]) events
+against a simulated clock, so the tracking logic can run headless (and much faster than real
+time) for tests and load tests on any platform.
+
+active_process() gives the foreground window's executable (for "process" group
+rules); sources that can't tell return "".
+
+Sources can be polled (active_title/idle_seconds) or, if they support it, push
+changes: start_events(callback, idle_threshold) makes the source call
+callback(kind, timestamp, value) with kind "focus" (value = new raw title) or
+"idle" (value = True once idle passes idle_threshold(), False on the next input).
+SimulatedEventSource does this for recorded/generated streams.
+"""
+import bisect
+import json
+import random
+import threading
+import time
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+
+class WindowSource:
+    """Interface: the foreground title, seconds since last user input, and the current time."""
+
+    def active_title(self) -> str:
+        raise NotImplementedError
+
+    def idle_seconds(self) -> float:
+        raise NotImplementedError
+
+    def active_process(self) -> str:
+        return ""
+
+    def time(self) -> float:
+        return time.time()
+
+    def start_events(self, callback, idle_threshold) -> bool:
+        """Start pushing focus/idle changes to `callback`. Returns False if this source can only be polled."""
+        return False
+
+    def stop_events(self):
+        pass
+
+    def prepare(self):
+        """Do any slow setup (imports, handles) now rather than on first use."""
+        pass
+
+
+class Win32WindowSource(WindowSource):
+    """Foreground window via win32gui, idle time via GetLastInputInfo. Windows only.
+
+    The win32 modules are imported on first use (or by prepare()), so creating the
+    source costs nothing while the window is coming up.
+    """
+
+    def __getattr__(self, name):
+        # only reached while the attributes prepare() sets are still missing
+        if name in ("_ctypes", "_win32api", "_win32gui", "_LASTINPUTINFO"):
+            self.prepare()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def prepare(self):
+        if "_LASTINPUTINFO" in self.__dict__:
+            return
+        # imported here so the rest of the app can load on other platforms
+        import ctypes
+        import win32api
+        import win32gui
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+        self._ctypes = ctypes
+        self._win32api = win32api
+        self._win32gui = win32gui
+        self._LASTINPUTINFO = LASTINPUTINFO
+
+    def active_title(self):
+        hwnd = self._win32gui.GetForegroundWindow()
+        return self._win32gui.GetWindowText(hwnd)
+
+    def active_process(self):
+        """Executable path of the foreground window's process, or "" if it can't be read."""
+        ctypes = self._ctypes
+        kernel32 = ctypes.windll.kernel32
+        pid = ctypes.c_ulong()
+        ctypes.windll.user32.GetWindowThreadProcessId(self._win32gui.GetForegroundWindow(), ctypes.byref(pid))
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+        if not handle:
+            return ""
+        try:
+            buf = ctypes.create_unicode_buffer(1024)
+            size = ctypes.c_ulong(len(buf))
+            if kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+                return buf.value
+            return ""
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def idle_seconds(self):
+        # a buffer per call: the event thread and the UI thread both ask
+        ctypes = self._ctypes
+        lii = self._LASTINPUTINFO()
+        lii.cbSize = ctypes.sizeof(lii)
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(lii)):
+            return (self._win32api.GetTickCount() - lii.dwTime) / 1000.0
+        return 0.0
+
+    def start_events(self, callback, idle_threshold):
+        """Foreground/title changes via SetWinEventHook; idle via a timer armed for the next possible crossing."""
+        kernel32 = self._ctypes.windll.kernel32
+        self._stop_events = threading.Event()
+        # a Win32 event the loop's wait also wakes on, so stop_events() doesn't wait out the idle timer
+        self._wake = kernel32.CreateEventW(None, True, False, None)
+        self._hooks_ready = threading.Event()
+        self._hooks_ok = False
+        self._event_thread = threading.Thread(target=self._event_loop, args=(callback, idle_threshold),
+                                              name="win32-events", daemon=True)
+        self._event_thread.start()
+        # hooks must be installed on the thread that pumps messages; wait to hear whether that worked
+        self._hooks_ready.wait(2.0)
+        if not self._hooks_ok:
+            self.stop_events()
+        return self._hooks_ok
+
+    def stop_events(self, timeout=2.0):
+        thread = getattr(self, "_event_thread", None)
+        if thread is None:
+            return
+        kernel32 = self._ctypes.windll.kernel32
+        self._stop_events.set()
+        kernel32.SetEvent(self._wake)
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+        if not thread.is_alive():
+            kernel32.CloseHandle(self._wake)
+        self._event_thread = None
+
+    def _event_loop(self, callback, idle_threshold):
+        try:
+            self._pump_events(callback, idle_threshold)
+        except Exception as e:
+            print("Error in Win32 event loop:", e)
+        finally:
+            self._hooks_ready.set()
+
+    def _pump_events(self, callback, idle_threshold):
+        ctypes = self._ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        EVENT_SYSTEM_FOREGROUND = 0x0003
+        EVENT_OBJECT_NAMECHANGE = 0x800C
+        WINEVENT_OUTOFCONTEXT = 0x0000
+        OBJID_WINDOW = 0
+        QS_ALLINPUT = 0x04FF
+        PM_REMOVE = 0x0001
+        IDLE_POLL = 1.0  # seconds between checks for input while idle (there is no "input resumed" event)
+
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND, wintypes.LONG,
+                                          wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+        def on_event(_hook, event, hwnd, id_object, _id_child, _thread, _time):
+            if event == EVENT_OBJECT_NAMECHANGE and (id_object != OBJID_WINDOW or hwnd != self._win32gui.GetForegroundWindow()):
+                return  # title changes of background windows and child objects don't matter
+            callback("focus", time.time(), self._win32gui.GetWindowText(hwnd))
+
+        proc = WinEventProc(on_event)  # keep a reference for as long as the hooks live
+        hooks = [user32.SetWinEventHook(event, event, 0, proc, 0, 0, WINEVENT_OUTOFCONTEXT)
+                 for event in (EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE)]
+        self._hooks_ok = all(hooks)
+        self._hooks_ready.set()
+        msg = wintypes.MSG()
+        wake = (wintypes.HANDLE * 1)(self._wake)
+        idle = False
+        try:
+            while not self._stop_events.is_set():
+                threshold = idle_threshold()
+                idle_s = self.idle_seconds()
+                # while active, nothing can change before the idle threshold is reached; stop_events() wakes it early
+                timeout = IDLE_POLL if idle else max(0.05, threshold - idle_s)
+                user32.MsgWaitForMultipleObjects(1, wake, False, int(timeout * 1000), QS_ALLINPUT)
+                if self._stop_events.is_set():
+                    break
+                while user32.PeekMessageW(ctypes.byref(msg), 0, 0, 0, PM_REMOVE):
+                    user32.TranslateMessage(ctypes.byref(msg))
+                    user32.DispatchMessageW(ctypes.byref(msg))
+                idle_s = self.idle_seconds()
+                now = time.time()
+                if not idle and idle_s > threshold:
+                    idle = True
+                    callback("idle", now - (idle_s - threshold), True)
+                elif idle and idle_s <= threshold:
+                    idle = False
+                    callback("idle", now - idle_s, False)
+        finally:
+            for hook in hooks:
+                user32.UnhookWinEvent(hook)
+
+
+class ReplayWindowSource(WindowSource):
+    """Plays back [(timestamp, title, idle_seconds), ...] sorted by timestamp.
+
+    Events may carry a fourth element, the process name reported by active_process().
+
+    The state at any moment is the last event at or before the current time. Time is
+    simulated: call advance()/advance_to() between ticks, or pass realtime=True to
+    replay against the wall clock (optionally sped up).
+    """
+
+    def __init__(self, events, realtime=False, speed=1.0):
+        self.events = sorted(events, key=lambda e: e[0])
+        self._stamps = [e[0] for e in self.events]
+        self.now = self._stamps[0] if self._stamps else 0.0
+        self.realtime = realtime
+        self.speed = speed
+        self._wall_start = time.time()
+        self._replay_start = self.now
+
+    def time(self):
+        if self.realtime:
+            self.now = self._replay_start + (time.time() - self._wall_start) * self.speed
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.now
+
+    def advance_to(self, timestamp):
+        self.now = max(self.now, timestamp)
+        return self.now
+
+    def finished(self):
+        return not self._stamps or self.now >= self._stamps[-1]
+
+    def _current(self):
+        i = bisect.bisect_right(self._stamps, self.time()) - 1
+        return self.events[i] if i >= 0 else None
+
+    def active_title(self):
+        event = self._current()
+        return event[1] if event else ""
+
+    def active_process(self):
+        event = self._current()
+        return event[3] if event and len(event) > 3 else ""
+
+    def idle_seconds(self):
+        event = self._current()
+        if event is None:
+            return 0.0
+        # idle keeps growing between events until the next one reports input again
+        return event[2] + (self.now - event[0]) if event[2] else 0.0
+
+
+class SimulatedEventSource(ReplayWindowSource):
+    """Replay stream that pushes focus/idle events instead of waiting to be polled.
+
+    Events are delivered with their exact timestamps as the simulated clock passes
+    them (advance()/advance_to()/run()), so event-driven tracking can be tested on
+    any platform. Polling (active_title/idle_seconds) still works as well.
+    """
+
+    def __init__(self, events):
+        super().__init__(events)
+        self._callback = None
+        self._schedule = []
+        self._next = 0
+
+    def start_events(self, callback, idle_threshold):
+        self._callback = callback
+        self._schedule = self._build_schedule(idle_threshold())
+        self._next = 0
+        return True
+
+    def stop_events(self):
+        self._callback = None
+
+    def _build_schedule(self, threshold):
+        """Turn (timestamp, title, idle_seconds[, process]) samples into focus changes and idle threshold crossings.
+
+        The process isn't part of the schedule: handlers ask active_process(), which
+        answers for the event being delivered.
+        """
+        schedule = []
+        title = None
+        idle = False
+        for i, event in enumerate(self.events):
+            t, event_title, idle_s = event[:3]
+            if idle and not idle_s:
+                idle = False
+                schedule.append((t, "idle", False))
+            if event_title != title:
+                title = event_title
+                schedule.append((t, "focus", title))
+            if idle_s and not idle:
+                crossing = max(t, t - idle_s + threshold)
+                end = self.events[i + 1][0] if i + 1 < len(self.events) else float("inf")
+                if crossing < end:
+                    idle = True
+                    schedule.append((crossing, "idle", True))
+        return schedule
+
+    def advance(self, seconds):
+        return self.advance_to(self.now + seconds)
+
+    def advance_to(self, timestamp):
+        """Move the clock forward, delivering every event up to `timestamp` in order."""
+        while (self._callback is not None and self._next < len(self._schedule)
+               and self._schedule[self._next][0] <= timestamp):
+            t, kind, value = self._schedule[self._next]
+            self._next += 1
+            self.now = max(self.now, t)
+            self._callback(kind, t, value)
+        self.now = max(self.now, timestamp)
+        return self.now
+
+    def run(self):
+        """Deliver every remaining event."""
+        if self._schedule:
+            self.advance_to(self._schedule[-1][0])
+        return self.now
+
+
+class RecordingWindowSource(WindowSource):
+    """Wraps another source and keeps every change it reports, for later replay."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.events = []
+        self._last = None
+
+    def time(self):
+        return self.inner.time()
+
+    def active_title(self):
+        title = self.inner.active_title()
+        self._note(title=title)
+        return title
+
+    def idle_seconds(self):
+        idle = self.inner.idle_seconds()
+        self._note(idle=idle)
+        return idle
+
+    def active_process(self):
+        return self.inner.active_process()
+
+    def _note(self, title=None, idle=None):
+        prev_title, prev_idle = self._last[1:3] if self._last else ("", 0.0)
+        title = prev_title if title is None else title
+        idle = prev_idle if idle is None else idle
+        # only record when the title changes or the user goes idle / comes back
+        if self._last is None or title != prev_title or (idle > 0) != (prev_idle > 0):
+            if self._last is None or title != prev_title:
+                # the executable only needs asking for when the title changes
+                process = self.inner.active_process()
+            else:
+                process = self._last[3] if len(self._last) > 3 else ""
+            self._last = (self.inner.time(), title, idle) + ((process,) if process else ())
+            self.events.append(self._last)
+        else:
+            self._last = (self._last[0], title, idle) + self._last[3:]
+
+
+def load_events(path):
+    """Read events written by save_events (JSON lines of [timestamp, title, idle_seconds] or [..., process])."""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                t, title, idle, *process = json.loads(line)
+                events.append((float(t), title, float(idle)) + tuple(process[:1]))
+    return events
+
+
+def save_events(path, events):
+    """Write events as JSON lines; the process is only written for events that have one."""
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            t, title, idle = event[:3]
+            record = [t, title, idle] + ([event[3]] if len(event) > 3 and event[3] else [])
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def generate_events(count, titles, start=0.0, mean_dwell=30.0, idle_chance=0.05, seed=0):
+    """Synthetic focus stream: `count` switches between `titles` with exponential dwell times.
+
+    Every so often the user goes idle for a while (idle_seconds starts counting at 1s).
+    """
+    rng = random.Random(seed)
+    events = []
+    t = start
+    for _ in range(count):
+        events.append((t, rng.choice(titles), 0.0))
+        t += rng.expovariate(1.0 / mean_dwell)
+        if rng.random() < idle_chance:
+            events.append((t, events[-1][1], 1.0))
+            t += rng.expovariate(1.0 / (mean_dwell * 10))
+    return events